@@ -0,0 +1,38 @@
+'''Cost of the event stream to the walk.
+
+Runs a linear chain (graphs.linear_chain) with no instrumentation, with
+the do-nothing Instrumentation base class and with an
+events.EventStream feeding a PrometheusExporter, and reports the time
+per executed task of each.  The stream's exporters work on a background
+thread; the walk only pays for buffering the events.
+
+Usage:
+
+PYTHONPATH=. python benchmarks/bench_events.py
+'''
+import sys
+
+import graphs
+from run_benchmarks import best_time
+from workflow_manager.events import EventStream, PrometheusExporter
+from workflow_manager.instrumentation import Instrumentation
+from workflow_manager.manager import Manager
+
+
+def main():
+    sys.setrecursionlimit(100000)
+    head, _, _ = graphs.linear_chain(1000)
+    stream = EventStream([PrometheusExporter()])
+    ways = (('none', None), ('instrumentation', Instrumentation()),
+            ('event stream', stream))
+    print('%-16s %12s' % ('instrumentation', 'ns/task'))
+    for label, instrumentation in ways:
+        manager = Manager(head, instrumentation=instrumentation)
+        executed = len(manager.run().flow_path)
+        print('%-16s %12.1f' % (
+            label, best_time(manager.run, 5) * 1e9 / executed))
+    stream.close()
+
+
+if __name__ == '__main__':
+    main()
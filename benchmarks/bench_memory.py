@@ -0,0 +1,120 @@
+'''Memory held by the structure of large workflows.
+
+Builds the same graph, a chain where every step also shares one cleanup
+task on failure, four ways and reports the bytes per task that stay
+allocated (tracemalloc), for the tasks alone and with their compiled
+plan:
+
+original tasks  OriginalTask, the layout of Task before it had
+                __slots__: a __dict__ holding the name and a list each
+                of success and failure tasks (nothing was compiled then)
+dict tasks      Task subclasses without __slots__ of their own, so they
+                get a __dict__ next to Task's slots
+slotted tasks   Task subclasses declaring __slots__ = (), wired with
+                on_success/on_failure
+builder         slotted tasks added to a builder.FlowBuilder, which keeps
+                the edges in arrays of node ids
+
+Usage:
+
+PYTHONPATH=. python benchmarks/bench_memory.py
+'''
+import gc
+import tracemalloc
+
+from workflow_manager.builder import FlowBuilder
+from workflow_manager.plan import Plan
+from workflow_manager.task import Task
+
+
+class OriginalTask(object):
+    ''' Task as it was laid out before it had __slots__. '''
+
+    def __init__(self, name='task'):
+        self._name = name
+        self._success_list = []
+        self._failure_list = []
+
+    def on_success(self, *tasks):
+        for task in tasks:
+            self._success_list.append(task)
+
+    def on_failure(self, *tasks):
+        for task in tasks:
+            self._failure_list.append(task)
+
+
+class DictTask(Task):
+
+    def execute(self, **kwargs):
+        return (Task.success_state(),)
+
+
+class SlotTask(Task):
+    __slots__ = ()
+
+    def execute(self, **kwargs):
+        return (Task.success_state(),)
+
+
+def wired(task_type, compiled=True):
+    def build(size):
+        cleanup = task_type('cleanup')
+        tasks = [task_type('step %d' % index) for index in range(size)]
+        for task, successor in zip(tasks, tasks[1:]):
+            task.on_success(successor)
+            task.on_failure(cleanup)
+        if not compiled:
+            return tasks, None
+        return tasks, lambda: Plan.compile(tasks[0])
+    return build
+
+
+def built(size):
+    builder = FlowBuilder()
+    for index in range(size):
+        builder.add(SlotTask('step %d' % index))
+    cleanup = builder.add(SlotTask('cleanup'))
+    for node in range(size - 1):
+        builder.on_success(node, node + 1)
+        builder.on_failure(node, cleanup)
+    return builder, builder.compile
+
+
+WAYS = (('original tasks', wired(OriginalTask, compiled=False)),
+        ('dict tasks', wired(DictTask)),
+        ('slotted tasks', wired(SlotTask)),
+        ('builder', built))
+
+
+def measure(build, size):
+    gc.collect()
+    tracemalloc.start()
+    graph, compile_plan = build(size)
+    graph_bytes = tracemalloc.get_traced_memory()[0]
+    plan = plan_bytes = None
+    if compile_plan is not None:
+        plan = compile_plan()
+        plan_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del graph, plan
+    return graph_bytes, plan_bytes
+
+
+def main():
+    print('%8s %-14s %14s %16s %14s' % ('tasks', 'graph', 'bytes/task',
+                                        'with plan/task', 'vs original'))
+    for size in (10000, 50000):
+        original = None
+        for label, build in WAYS:
+            graph_bytes, plan_bytes = measure(build, size)
+            if original is None:
+                original = graph_bytes
+            print('%8d %-14s %14.1f %16s %13.0f%%' % (
+                size, label, graph_bytes / size,
+                '-' if plan_bytes is None else '%.1f' % (plan_bytes / size),
+                100.0 * graph_bytes / original))
+
+
+if __name__ == '__main__':
+    main()
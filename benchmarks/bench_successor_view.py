@@ -0,0 +1,59 @@
+'''Per-run overhead of walking the successor lists.
+
+Builds linear chains where every step shares one cleanup task on
+failure (the common "diamond" shape) and times Manager.run() against
+the number of edges.  Time per edge should stay flat as the chain
+grows; copying the downstream graph on every visit made it grow with
+the length of the chain instead.
+
+Usage:
+
+python benchmarks/bench_successor_view.py
+'''
+import sys
+import timeit
+
+from workflow_manager.manager import Manager
+from workflow_manager.task import Task
+
+
+class NoopTask(Task):
+
+    def execute(self, **kwargs):
+        return (Task.success_state(),)
+
+
+def build_chain(length):
+    cleanup = NoopTask('cleanup')
+    head = previous = NoopTask('step 0')
+    for index in range(1, length):
+        current = NoopTask('step %d' % index)
+        previous.on_success(current)
+        previous.on_failure(cleanup)
+        previous = current
+    return head, 2 * (length - 1)
+
+
+def measure(length, repeat=5):
+    head, edges = build_chain(length)
+    manager = Manager(head)
+    manager.compile()
+
+    def run():
+        manager.run()
+
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    return edges, best
+
+
+def main():
+    sys.setrecursionlimit(10000)
+    print('%8s %12s %14s' % ('edges', 'run (ms)', 'per edge (us)'))
+    for length in (50, 100, 200, 400, 800):
+        edges, seconds = measure(length)
+        print('%8d %12.3f %14.3f' % (
+            edges, seconds * 1e3, seconds * 1e6 / edges))
+
+
+if __name__ == '__main__':
+    main()
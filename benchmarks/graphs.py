@@ -0,0 +1,83 @@
+'''Synthetic workflows for the benchmarks.
+
+Every generator returns (initial task, number of tasks, number of edges).
+Tasks do no work, so timings measure the manager alone.
+'''
+from workflow_manager.task import Task
+
+
+class NoopTask(Task):
+
+    def execute(self, **kwargs):
+        return (Task.success_state(),)
+
+
+class FailingTask(Task):
+
+    def execute(self, **kwargs):
+        return (Task.failure_state(),)
+
+
+def linear_chain(length):
+    ''' task 0 -> task 1 -> ... -> task length - 1 on success. '''
+    head = previous = NoopTask('task 0')
+    for index in range(1, length):
+        current = NoopTask('task %d' % index)
+        previous.on_success(current)
+        previous = current
+    return head, length, length - 1
+
+
+def fan_out(width):
+    ''' One task whose success list has width tasks. '''
+    head = NoopTask('root')
+    head.on_success(*[NoopTask('leaf %d' % index) for index in range(width)])
+    return head, width + 1, width
+
+
+def diamonds(depth):
+    ''' depth diamonds in a row: every top task succeeds into a left and
+    a right task which both succeed into the next top task.
+
+    Tasks are shared, so the number of paths, and of tasks executed,
+    doubles with every diamond.
+    '''
+    head = top = NoopTask('top 0')
+    for index in range(depth):
+        left = NoopTask('left %d' % index)
+        right = NoopTask('right %d' % index)
+        bottom = NoopTask('top %d' % (index + 1))
+        top.on_success(left, right)
+        left.on_success(bottom)
+        right.on_success(bottom)
+        top = bottom
+    return head, 3 * depth + 1, 4 * depth
+
+
+def failure_heavy(length, handlers=10):
+    ''' A chain of failing tasks; each one's failure list runs handlers
+    shared cleanup tasks and then the next failing task.
+    '''
+    cleanups = [NoopTask('cleanup %d' % index) for index in range(handlers)]
+    head = previous = FailingTask('step 0')
+    for index in range(1, length):
+        current = FailingTask('step %d' % index)
+        previous.on_failure(*(cleanups + [current]))
+        previous = current
+    previous.on_failure(*cleanups)
+    return head, length + handlers, length * (handlers + 1) - 1
+
+
+SHAPES = {
+    'linear_chain': (linear_chain, (100, 1000, 10000)),
+    'fan_out': (fan_out, (100, 1000, 10000)),
+    'diamonds': (diamonds, (4, 8, 12)),
+    'failure_heavy': (failure_heavy, (10, 100, 1000)),
+}
+
+QUICK_SHAPES = {
+    'linear_chain': (linear_chain, (10, 100)),
+    'fan_out': (fan_out, (10, 100)),
+    'diamonds': (diamonds, (2, 4)),
+    'failure_heavy': (failure_heavy, (5, 10)),
+}
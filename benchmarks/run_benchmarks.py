@@ -0,0 +1,135 @@
+'''Benchmark suite for Manager.run, Task serialization and show_flow.
+
+Runs every graph shape of graphs.py at growing sizes and reports, per
+shape and size:
+
+runs_per_sec       Manager.run() calls per second on a compiled manager
+ns_per_task        run time divided by the number of tasks executed
+peak_bytes         peak memory allocated during one run (tracemalloc)
+to_dict_sec        time of one Task.to_dict() of the initial task
+to_graph_sec       time of one Task.to_graph() of the initial task
+show_flow_sec      time of one Manager.show_flow()
+
+Results are written as JSON.  Pass a previous result file to --compare
+to fail when any timing got slower by more than --tolerance.
+
+Usage:
+
+PYTHONPATH=. python benchmarks/run_benchmarks.py --output bench.json
+PYTHONPATH=. python benchmarks/run_benchmarks.py --compare bench.json
+'''
+import argparse
+import json
+import platform
+import sys
+import time
+import timeit
+import tracemalloc
+
+import graphs
+from workflow_manager.manager import Manager
+
+
+TIMINGS = ('ns_per_task', 'to_dict_sec', 'to_graph_sec', 'show_flow_sec')
+
+
+def best_time(function, repeat, budget=0.2):
+    ''' Best time of one call, repeating for about budget seconds. '''
+    elapsed = timeit.timeit(function, number=1)
+    number = max(1, int(budget / max(elapsed, 1e-9) / repeat))
+    times = timeit.repeat(function, number=number, repeat=repeat)
+    return min(min(times) / number, elapsed)
+
+
+def measure(build, size, repeat):
+    head, tasks, edges = build(size)
+    manager = Manager(head)
+    manager.compile()
+    executed = len(manager.run().flow_path)
+
+    run_sec = best_time(manager.run, repeat)
+
+    tracemalloc.start()
+    manager.run()
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'size': size,
+        'tasks': tasks,
+        'edges': edges,
+        'executed': executed,
+        'runs_per_sec': 1 / run_sec,
+        'ns_per_task': run_sec * 1e9 / executed,
+        'peak_bytes': peak_bytes,
+        'to_dict_sec': best_time(head.to_dict, repeat),
+        'to_graph_sec': best_time(head.to_graph, repeat),
+        'show_flow_sec': best_time(manager.show_flow, repeat)
+        }
+
+
+def run_suite(shapes, repeat):
+    results = {}
+    for shape, (build, sizes) in sorted(shapes.items()):
+        results[shape] = [measure(build, size, repeat) for size in sizes]
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'timestamp': time.time(),
+        'results': results
+        }
+
+
+def compare(baseline, current, tolerance):
+    ''' Timings in current slower than baseline by more than tolerance. '''
+    regressions = []
+    for shape, measurements in current['results'].items():
+        previous = {entry['size']: entry
+                    for entry in baseline['results'].get(shape, [])}
+        for entry in measurements:
+            before = previous.get(entry['size'])
+            if before is None:
+                continue
+            for key in TIMINGS:
+                if entry[key] > before[key] * (1 + tolerance):
+                    regressions.append((shape, entry['size'], key,
+                                        before[key], entry[key]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help='write the results to this file')
+    parser.add_argument('--compare', help='results of an earlier run')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed slowdown, 0.2 is 20%% (default)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--quick', action='store_true',
+                        help='small sizes only, to check the suite runs')
+    args = parser.parse_args(argv)
+
+    sys.setrecursionlimit(100000)
+    shapes = graphs.QUICK_SHAPES if args.quick else graphs.SHAPES
+    current = run_suite(shapes, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(current, output, indent=2, sort_keys=True)
+    else:
+        json.dump(current, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+    if args.compare:
+        with open(args.compare) as previous:
+            regressions = compare(json.load(previous), current,
+                                  args.tolerance)
+        for shape, size, key, before, after in regressions:
+            print('%s[%d] %s: %.3g -> %.3g' % (shape, size, key, before,
+                                               after), file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -18,3 +18,20 @@ class FailureTask(Task):
 
     def execute(self, **kwargs):
         return Task.failure_state(), 'failure message from ', self.name
+
+
+class OutcomeTask(Task):
+
+    def __init__(self, name, outcome='approve'):
+        super().__init__(name)
+        self._outcome = outcome
+
+    def execute(self, **kwargs):
+        return self._outcome, 'outcome from ', self.name
+
+
+def names(flow):
+    ''' Names of the tasks of an executed flow, e.g.
+    manager.show_executed_flow(), or of the flow a RunContext executed.
+    '''
+    return [step['name'] for step in getattr(flow, 'flow_path', flow)]
@@ -0,0 +1,102 @@
+import time
+
+import example_task
+from workflow_manager.analysis import analyze, mean_durations
+from workflow_manager.instrumentation import TimingInstrumentation
+from workflow_manager.manager import Manager
+
+
+class ContextTask(example_task.SuccessTask):
+    pass_context = True
+
+    def execute(self, context, **kwargs):
+        return super().execute(**kwargs)
+
+
+def build_flow(shared=True):
+    '''
+    task 1 -> success -> task 2, task 3
+    task 1 -> failure -> task 6
+    task 2 -> success -> task 4
+    task 3 -> success -> task 5, task 7 (parallel)
+    task 4 -> failure -> task 6
+    '''
+    tasks = [example_task.SuccessTask('task %d' % number)
+             for number in range(1, 8)]
+    one, two, three, four, five, six, seven = tasks
+    one.on_success(two, three)
+    one.on_failure(six)
+    two.on_success(four)
+    three.on_success(five, seven, parallel=True)
+    if shared:
+        four.on_failure(six)
+    return one, tasks
+
+
+DURATIONS = {'task 1': 1, 'task 2': 2, 'task 3': 1, 'task 4': 4,
+             'task 5': 3, 'task 6': 10, 'task 7': 1}
+
+
+def test_analyze_estimates_latencies():
+    one, _ = build_flow()
+
+    report = analyze(one, DURATIONS)
+
+    assert report.critical_path == ['task 1', 'task 2', 'task 4']
+    assert report.critical_path_latency == 7
+    # 1 + (2 + 4) + (1 + max(3, 1))
+    assert report.success_latency == 11
+    assert report.failure_latency == 11
+    # task 4 fails: 1 + 2 + 4 + 10
+    assert report.worst_failure_latency == 17
+    assert report.width == 2
+    assert report.to_dict()['success_latency'] == 11
+
+
+def test_analyze_suggests_independent_success_lists():
+    '''
+    Given:
+    task 1 -> success -> task 2, task 3
+    Then:
+    the list is safe unless task 4 shares task 6 with task 1's failure
+    list or a branch uses the run's context
+    '''
+    one, _ = build_flow()
+    assert analyze(one, DURATIONS).suggestions == []
+
+    one, tasks = build_flow(shared=False)
+    [suggestion] = analyze(one, DURATIONS).suggestions
+    assert suggestion.name == 'task 1'
+    assert suggestion.branches == ('task 2', 'task 3')
+    assert (suggestion.sequential, suggestion.parallel) == (10, 6)
+    assert suggestion.saving == 4
+
+    tasks[4].on_success(ContextTask('task 8'))
+    assert analyze(one, DURATIONS).suggestions == []
+
+
+def test_mean_durations_of_earlier_runs():
+    one, _ = build_flow()
+    manager = Manager(one, instrumentation=TimingInstrumentation())
+
+    durations = mean_durations(manager.run().metrics for _ in range(3))
+
+    assert set(durations) == {'task 1', 'task 2', 'task 3', 'task 4',
+                              'task 5', 'task 7'}
+    assert all(seconds >= 0 for seconds in durations.values())
+
+
+def test_analyze_is_linear_on_large_graphs():
+    tasks = [example_task.SuccessTask('task %d' % number)
+             for number in range(10000)]
+    for number, task in enumerate(tasks[:len(tasks) // 2]):
+        task.on_success(tasks[2 * number + 1], *tasks[2 * number + 2:
+                                                      2 * number + 3])
+
+    start = time.perf_counter()
+    report = analyze(tasks[0], default=1)
+
+    assert time.perf_counter() - start < 2
+    assert report.success_latency == 10000
+    assert len(report.critical_path) == 14
+    assert len(report.suggestions) == 4999
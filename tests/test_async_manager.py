@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+
+import example_task
+from example_task import names
+from workflow_manager.async_manager import AsyncManager
+from workflow_manager.task import Task
+
+
+class AsyncSuccessTask(Task):
+
+    def __init__(self, name, seconds=0):
+        super().__init__(name)
+        self._seconds = seconds
+
+    async def execute(self, **kwargs):
+        await asyncio.sleep(self._seconds)
+        return Task.success_state(), 'async', self.name
+
+
+class AsyncFailureTask(Task):
+
+    async def execute(self, **kwargs):
+        return Task.failure_state(), 'async failure', self.name
+
+
+def test_async_manager_awaits_async_tasks():
+    '''
+    Given:
+    task 1 -> success -> task 2, task 3
+    task 2 -> failure -> task 4
+
+    When:
+    task 1 succeeds
+    task 2 fails
+
+    Then workflow is:
+    task 1 -> task 2 -> task 4
+    '''
+    task_one = AsyncSuccessTask('task 1')
+    task_two = AsyncFailureTask('task 2')
+    task_three = AsyncSuccessTask('task 3')
+    task_four = AsyncSuccessTask('task 4')
+    task_one.on_success(task_two, task_three)
+    task_two.on_failure(task_four)
+
+    manager = AsyncManager(task_one)
+    asyncio.run(manager.run())
+
+    assert manager.show_executed_flow() == [
+        {'name': 'task 1', 'parameters': ()},
+        {'name': 'task 2', 'parameters': (['async', 'task 1'],)},
+        {'name': 'task 4', 'parameters': (['async failure', 'task 2'],)}
+    ]
+
+
+def test_async_manager_offloads_sync_tasks():
+    loop_thread = []
+
+    class ThreadTask(example_task.SuccessTask):
+
+        def execute(self, **kwargs):
+            loop_thread.append(threading.current_thread())
+            return super().execute(**kwargs)
+
+    task_one = AsyncSuccessTask('task 1')
+    task_one.on_success(ThreadTask('task 2'))
+
+    with AsyncManager(task_one) as manager:
+        asyncio.run(manager.run())
+
+    assert names(manager.show_executed_flow()) == ['task 1', 'task 2']
+    assert loop_thread[0] is not threading.main_thread()
+
+
+def test_async_manager_gathers_parallel_branches():
+    task_one = AsyncSuccessTask('task 1')
+    task_one.on_success(AsyncSuccessTask('task 2', 0.2),
+                        AsyncSuccessTask('task 3', 0.2),
+                        AsyncSuccessTask('task 4', 0.2), parallel=True)
+
+    manager = AsyncManager(task_one)
+    start = time.monotonic()
+    asyncio.run(manager.run())
+
+    assert time.monotonic() - start < 0.5
+    assert names(manager.show_executed_flow()) == [
+        'task 1', 'task 2', 'task 3', 'task 4']
+
+
+def test_async_manager_runs_many_workflows_on_one_loop():
+    task_one = AsyncSuccessTask('task 1', 0.1)
+    task_one.on_success(AsyncSuccessTask('task 2', 0.1))
+    managers = [AsyncManager(task_one) for _ in range(1000)]
+
+    async def run_all():
+        await asyncio.gather(*[manager.run() for manager in managers])
+
+    start = time.monotonic()
+    asyncio.run(run_all())
+
+    assert time.monotonic() - start < 2
+    assert all(names(manager.show_executed_flow()) == ['task 1', 'task 2']
+               for manager in managers)
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import queue
+import threading
+
+import pytest
+
+import example_task
+from example_task import names
+from workflow_manager.async_manager import AsyncManager
+from workflow_manager.backends import ProcessBackend, QueueBackend, work
+from workflow_manager.manager import Manager
+from workflow_manager.task import Task
+
+
+class PidTask(Task):
+
+    def execute(self, **kwargs):
+        return Task.success_state(), {'pid': os.getpid()}
+
+
+class ReportingTask(Task):
+
+    def execute(self, pid=None, **kwargs):
+        return Task.success_state(), 'ran in', pid
+
+
+class LocalTask(Task):
+    pass_context = True
+
+    def execute(self, context, **kwargs):
+        context.data['pid'] = os.getpid()
+        return Task.success_state(),
+
+
+class BrokenTask(Task):
+
+    def execute(self, **kwargs):
+        raise ValueError('broken in %s' % self.name)
+
+
+@pytest.fixture(scope='module')
+def backend():
+    with ProcessBackend(processes=2) as backend:
+        yield backend
+
+
+def test_process_backend_keeps_the_flow(backend):
+    '''
+    Given:
+    task 1 -> success -> task 2, task 3
+    task 2 -> failure -> task 4
+    task 4 -> success -> task 5
+
+    When:
+    tasks execute on worker processes
+
+    Then:
+    the executed flow is the same as in process
+    '''
+    task_one = PidTask('task one')
+    task_two = example_task.FailureTask('task two')
+    task_three = example_task.SuccessTask('task three')
+    task_four = ReportingTask('task four')
+    task_five = example_task.SuccessTask('task five')
+    task_one.on_success(task_two, task_three)
+    task_two.on_failure(task_four)
+    task_four.on_success(task_five)
+
+    expected = Manager(task_one).run()
+    context = Manager(task_one, backend=backend).run()
+
+    assert names(context) == names(expected) == [
+        'task one', 'task two', 'task four', 'task five']
+    assert context.flow_path[2:] == expected.flow_path[2:]
+    assert context.result == expected.result
+    assert context.flow_path[1]['parameters'] != (
+        [{'pid': os.getpid()}],)
+    assert expected.flow_path[1]['parameters'] == ([{'pid': os.getpid()}],)
+
+
+def test_process_backend_runs_parallel_branches_on_workers(backend):
+    task_one = example_task.SuccessTask('task one')
+    task_two = PidTask('task two')
+    task_three = LocalTask('task three')
+    task_two.on_success(ReportingTask('task four'))
+    task_one.on_success(task_two, task_three, parallel=True)
+
+    context = Manager(task_one, backend=backend).run()
+
+    assert context.succeeded
+    assert names(context) == ['task one', 'task two', 'task four',
+                              'task three']
+    assert context.data['pid'] == os.getpid()
+    assert context.flow_path[2]['parameters'][0][-1] != os.getpid()
+
+
+def test_process_backend_raises_task_errors(backend):
+    with pytest.raises(ValueError, match='broken in task one'):
+        Manager(BrokenTask('task one'), backend=backend).run()
+
+
+def test_queue_backend_fits_any_queue_pair():
+    jobs = queue.Queue()
+    results = queue.Queue()
+    worker = threading.Thread(target=work, args=(jobs, results))
+    worker.start()
+    task_one = example_task.SuccessTask('task one')
+    task_one.on_success(example_task.FailureTask('task two'))
+
+    with QueueBackend(jobs, results) as backend:
+        context = Manager(task_one, backend=backend).run()
+        async_context = asyncio.run(
+            AsyncManager(task_one, backend=backend).run())
+    jobs.put(None)
+    worker.join()
+
+    assert not context.succeeded and not async_context.succeeded
+    assert names(context) == names(async_context) == [
+        'task one', 'task two']
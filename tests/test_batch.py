@@ -0,0 +1,135 @@
+import time
+
+import pytest
+
+import example_task
+from example_task import names
+from workflow_manager.batch import BatchManager
+from workflow_manager.exceptions import WorkflowError
+from workflow_manager.manager import Manager
+from workflow_manager.task import Task
+
+
+class ParityTask(Task):
+    ''' Succeeds for even numbers, handling a batch at a time. '''
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.batches = []
+
+    def execute(self, number, **kwargs):
+        return self.execute_batch([{'number': number}])[0]
+
+    def execute_batch(self, batch):
+        numbers = [kwargs['number'] for kwargs in batch]
+        self.batches.append(numbers)
+        return [(Task.success_state() if number % 2 == 0 else
+                 Task.failure_state(), {'number': number})
+                for number in numbers]
+
+
+class CountingTask(example_task.SuccessTask):
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.batches = []
+
+    def execute_batch(self, batch):
+        self.batches.append(len(batch))
+        return super().execute_batch(batch)
+
+
+class ShortBatchTask(Task):
+
+    def execute_batch(self, batch):
+        return []
+
+
+def build_flow():
+    '''
+    task 1 -> success -> task 2, task 3
+    task 1 -> failure -> task 4
+    task 2 -> success -> task 5
+    '''
+    task_one = ParityTask('task 1')
+    task_two = ParityTask('task 2')
+    task_three = CountingTask('task 3')
+    task_four = CountingTask('task 4')
+    task_one.on_success(task_two, task_three)
+    task_one.on_failure(task_four)
+    task_two.on_success(CountingTask('task 5'))
+    return task_one, task_two, task_three, task_four
+
+
+def test_cohort_splits_by_outcome():
+    '''
+    Given:
+    runs for the numbers 0 to 5
+    Then:
+    every task executes once for every run that reaches it, and every
+    run walks the flow Manager.run walks for it
+    '''
+    task_one, task_two, task_three, task_four = build_flow()
+    inputs = [{'number': number} for number in range(6)]
+
+    stats = BatchManager(task_one).run_batch(inputs)
+    expected = [Manager(task_one).run(**kwargs) for kwargs in inputs]
+
+    assert task_one.batches[0] == [0, 1, 2, 3, 4, 5]
+    assert task_two.batches[0] == [0, 2, 4]
+    assert task_three.batches == [3]
+    assert task_four.batches == [3]
+    assert [names(run) for run in stats.runs] == [
+        names(run) for run in expected]
+    assert [run.flow_path[1:] for run in stats.runs] == [
+        run.flow_path[1:] for run in expected]
+    assert stats.succeeded == 3
+    assert [run.inputs for run in stats.runs] == inputs
+
+
+def test_batch_size_bounds_every_call():
+    task_one, _, task_three, _ = build_flow()
+
+    BatchManager(task_one).run_batch(
+        [{'number': number * 2} for number in range(5)], batch_size=2)
+
+    assert task_one.batches == [[0, 2], [4, 6], [8]]
+    assert task_three.batches == [2, 2, 1]
+
+
+def test_parallel_branches_join_per_run():
+    task_one = ParityTask('task 1')
+    task_two = CountingTask('task 2')
+    task_three = ParityTask('task 3')
+    task_one.on_success(task_two, task_three, parallel=True)
+    task_three.on_success(CountingTask('task 4'))
+    inputs = [{'number': 0}, {'number': 2}]
+
+    stats = BatchManager(task_one).run_batch(inputs)
+
+    assert stats.succeeded == 2
+    assert task_two.batches == [2]
+    assert [names(run) for run in stats.runs] == [
+        names(Manager(task_one).run(**kwargs)) for kwargs in inputs]
+
+
+def test_outputs_must_match_the_batch():
+    task_one = ShortBatchTask('task 1')
+
+    with pytest.raises(WorkflowError):
+        BatchManager(task_one).run_batch([{}, {}])
+
+
+def test_every_run_is_timed_from_its_own_start():
+    def inputs():
+        for number in range(3):
+            time.sleep(0.05)
+            yield {'number': number}
+
+    stats = BatchManager(example_task.SuccessTask('task 1')).run_batch(
+        inputs())
+
+    first, _, last = stats.runs
+    assert last.elapsed < 0.05 < first.elapsed
+    assert stats.elapsed > first.elapsed
+    assert stats.started <= first.started < last.started
@@ -0,0 +1,113 @@
+import tracemalloc
+
+import pytest
+
+import example_task
+from example_task import names
+from workflow_manager.builder import FlowBuilder
+from workflow_manager.exceptions import InvalidWorkflowError
+from workflow_manager.manager import Manager
+from workflow_manager.task import Task
+
+
+class SlotTask(Task):
+    __slots__ = ()
+
+    def execute(self, **kwargs):
+        return Task.success_state(), 'from', self.name
+
+
+class DictTask(Task):
+
+    def execute(self, **kwargs):
+        return Task.success_state(), 'from', self.name
+
+
+def test_builder_plan_runs_like_wired_tasks():
+    '''
+    Given:
+    task 1 -> success -> task 2, task 3 (parallel)
+    task 1 -> failure -> task 5
+    task 2 -> failure -> task 4
+    task 3 -> success -> task 5
+    '''
+    wired = [example_task.SuccessTask('task 1'),
+             example_task.FailureTask('task 2'),
+             example_task.SuccessTask('task 3'),
+             example_task.SuccessTask('task 4'),
+             example_task.SuccessTask('task 5')]
+    wired[0].on_success(wired[1], wired[2], parallel=True)
+    wired[0].on_failure(wired[4])
+    wired[1].on_failure(wired[3])
+    wired[2].on_success(wired[4])
+
+    builder = FlowBuilder()
+    one, two, three, four, five = [
+        builder.add(type(task)(task.name)) for task in wired]
+    builder.on_success(one, two, three, parallel=True)
+    builder.on_failure(one, five)
+    builder.on_failure(two, four)
+    builder.on_success(three, five)
+    plan = builder.compile()
+    manager = Manager()
+    manager.register_plan(plan)
+
+    expected = Manager(wired[0]).run()
+    context = manager.run()
+
+    assert names(context) == names(expected) == [
+        'task 1', 'task 2', 'task 4', 'task 3', 'task 5']
+    assert context.flow_path == expected.flow_path
+    assert plan.parallel[one] and not plan.tasks[one].parallel_success
+    assert plan.success(0) == (1, 2) and plan.failure(0) == (4,)
+
+    # plans of a builder do not follow the (empty) flows of their tasks
+    example_task.SuccessTask('task 6').on_success(wired[0])
+    assert not plan.is_stale()
+    assert names(manager.run()) == names(expected)
+
+
+def test_builder_validates_the_graph():
+    builder = FlowBuilder()
+    with pytest.raises(InvalidWorkflowError):
+        builder.compile()
+    with pytest.raises(InvalidWorkflowError):
+        builder.add('task 1')
+
+    one = builder.add(SlotTask('task 1'))
+    two = builder.add(SlotTask('task 2'))
+    with pytest.raises(InvalidWorkflowError):
+        builder.on_success(one, 2)
+    builder.on_success(one, two)
+    builder.on_failure(two, one)
+    with pytest.raises(InvalidWorkflowError):
+        builder.compile()
+
+
+def test_slotted_tasks_and_builder_save_memory():
+    count = 10000
+
+    def wired_tasks():
+        tasks = [DictTask('task %d' % number) for number in range(count)]
+        for task, successor in zip(tasks, tasks[1:]):
+            task.on_success(successor)
+        return tasks
+
+    def built_tasks():
+        builder = FlowBuilder()
+        for number in range(count):
+            builder.add(SlotTask('task %d' % number))
+        for node in range(count - 1):
+            builder.on_success(node, node + 1)
+        return builder
+
+    sizes = []
+    for build in (wired_tasks, built_tasks):
+        tracemalloc.start()
+        graph = build()
+        sizes.append(tracemalloc.get_traced_memory()[0])
+        tracemalloc.stop()
+        del graph
+
+    assert not hasattr(SlotTask('task'), '__dict__')
+    assert sizes[1] < sizes[0] * 0.75
@@ -0,0 +1,136 @@
+import example_task
+from workflow_manager.cache import MISSING, ResultCache
+from workflow_manager.manager import Manager
+from workflow_manager.task import Task
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingTask(Task):
+    memoize = True
+
+    def __init__(self, name, result=True):
+        super().__init__(name)
+        self.calls = 0
+        self._result = result
+
+    def execute(self, **kwargs):
+        self.calls += 1
+        return self._result, {'from': self.name}
+
+
+def test_result_cache_evicts_least_recently_used():
+    cache = ResultCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+
+    assert cache.get('b') is MISSING
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert len(cache) == 2
+    assert cache.hits == 3 and cache.misses == 1
+
+
+def test_result_cache_expires_entries():
+    clock = Clock()
+    cache = ResultCache(ttl=10, clock=clock)
+    cache.put('a', 1)
+
+    clock.now = 9
+    assert cache.get('a') == 1
+    clock.now = 10
+    assert cache.get('a', None) is None
+    assert len(cache) == 0
+
+
+def test_memoized_task_executes_once_per_run():
+    '''
+    Given:
+    task 1 -> success -> task 2, task 3
+    task 2 -> success -> task 4
+    task 3 -> success -> task 4
+
+    When:
+    task 4 is memoized
+
+    Then task 4 shows up twice in the flow but executes once per run
+    '''
+    task_one = example_task.SuccessTask('task 1')
+    task_two = example_task.SuccessTask('task 2')
+    task_three = example_task.SuccessTask('task 3')
+    task_four = CountingTask('task 4')
+    task_one.on_success(task_two, task_three)
+    task_two.on_success(task_four)
+    task_three.on_success(task_four)
+    manager = Manager(task_one)
+
+    context = manager.run()
+    assert [step['name'] for step in context.flow_path] == [
+        'task 1', 'task 2', 'task 4', 'task 3', 'task 4']
+    assert task_four.calls == 1
+
+    manager.run()
+    assert task_four.calls == 2
+
+
+def test_memoized_failures_execute_again():
+    '''
+    Given:
+    task 1 -> failure -> task 2, task 3, task 2
+
+    When:
+    task 2 is memoized and fails
+
+    Then task 2 executes both times
+    '''
+    task_one = example_task.FailureTask('task 1')
+    task_two = CountingTask('task 2', result=False)
+    task_three = example_task.SuccessTask('task 3')
+    task_one.on_failure(task_two, task_three, task_two)
+
+    Manager(task_one).run()
+
+    assert task_two.calls == 2
+
+
+def test_memoized_per_input():
+    class LookupTask(CountingTask):
+
+        def memo_key(self, kwargs):
+            return kwargs.get('user')
+
+    lookup = LookupTask('lookup')
+    manager = Manager(lookup, result_cache=ResultCache())
+
+    manager.run(user='a')
+    manager.run(user='b')
+    manager.run(user='a')
+
+    assert lookup.calls == 2
+
+
+def test_result_cache_spans_runs_until_expired():
+    clock = Clock()
+    task_one = CountingTask('task 1')
+    task_two = CountingTask('task 2')
+    task_one.on_success(task_two)
+    manager = Manager(task_one, result_cache=ResultCache(ttl=60,
+                                                         clock=clock))
+
+    first = manager.run()
+    second = manager.run()
+    assert task_one.calls == 1 and task_two.calls == 1
+    assert first.flow_path == second.flow_path
+
+    clock.now = 60
+    manager.run()
+    assert task_one.calls == 2 and task_two.calls == 2
@@ -0,0 +1,272 @@
+import asyncio
+import time
+
+import pytest
+
+import example_task
+from workflow_manager.async_manager import AsyncManager
+from workflow_manager.checkpoint import (
+    Checkpointer, FileStore, MemoryStore, SQLiteStore)
+from workflow_manager.exceptions import WorkflowError
+from workflow_manager.manager import Manager
+from workflow_manager.task import Task
+
+
+class CountingTask(Task):
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.calls = 0
+
+    def execute(self, **kwargs):
+        self.calls += 1
+        return Task.success_state(), {'seen': self.name}
+
+
+class CrashingTask(Task):
+    ''' Dies the first time it executes, like a worker going away. '''
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.crashed = False
+
+    def execute(self, seen=None, **kwargs):
+        if not self.crashed:
+            self.crashed = True
+            raise RuntimeError('worker died')
+        return Task.success_state(), 'after', seen
+
+
+def build_flow(parallel=False):
+    task_one = CountingTask('task one')
+    task_two = CountingTask('task two')
+    task_three = CrashingTask('task three')
+    task_four = example_task.FailureTask('task four')
+    task_five = example_task.SuccessTask('task five')
+    task_one.on_success(task_two, task_three, parallel=parallel)
+    task_three.on_success(task_four)
+    task_four.on_failure(task_five)
+    return task_one, task_two, task_three
+
+
+@pytest.fixture(params=['memory', 'file', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryStore()
+    if request.param == 'file':
+        return FileStore(str(tmp_path / 'checkpoints'))
+    return SQLiteStore(str(tmp_path / 'checkpoints.db'))
+
+
+def test_resume_continues_after_the_last_checkpoint(store):
+    '''
+    Given:
+    task 1 -> success -> task 2, task 3
+    task 3 -> success -> task 4
+    task 4 -> failure -> task 5
+    When:
+    task 3 dies the first time and the run is resumed from another
+    manager sharing the checkpoint store
+    Then:
+    task 1 and task 2 execute once and the resumed run ends as an
+    uninterrupted one would
+    '''
+    task_one, task_two, task_three = build_flow()
+    manager = Manager(task_one, checkpointer=Checkpointer(store, 60))
+    with pytest.raises(RuntimeError):
+        manager.run(user=1)
+    [run_id] = store.run_ids()
+
+    checkpointer = Checkpointer(store)
+    context = Manager(task_one, checkpointer=checkpointer).resume(run_id)
+
+    assert task_one.calls == 1 and task_two.calls == 1
+    assert context.run_id == run_id
+    assert context.inputs == {'user': 1}
+    assert not context.succeeded
+    assert [entry['name'] for entry in context.flow_path] == [
+        'task one', 'task two', 'task three', 'task four', 'task five']
+    assert context.flow_path[3]['parameters'] == (
+        ['after', 'task one'],)
+    assert store.run_ids() == []
+    checkpointer.close()
+
+
+def test_resume_continues_parallel_branches():
+    '''
+    Given:
+    task 1 -> success -> task 2, task 3 in parallel
+    When:
+    task 3 dies the first time and the run is resumed
+    Then:
+    only task 3 executes again
+    '''
+    task_one, task_two, task_three = build_flow(parallel=True)
+    store = MemoryStore()
+    checkpointer = Checkpointer(store, 60)
+    manager = Manager(task_one, checkpointer=checkpointer)
+    with pytest.raises(RuntimeError):
+        manager.run()
+
+    context = manager.resume(store.run_ids()[0])
+    manager.close()
+
+    assert task_one.calls == 1 and task_two.calls == 1
+    assert [entry['name'] for entry in context.flow_path] == [
+        'task one', 'task two', 'task three', 'task four', 'task five']
+
+
+class WaitingTask(Task):
+    ''' Waits for the checkpoint of its run to show up in store. '''
+
+    def __init__(self, name, store):
+        super().__init__(name)
+        self.store = store
+
+    def execute(self, **kwargs):
+        deadline = time.monotonic() + 5
+        while not self.store.run_ids() and time.monotonic() < deadline:
+            time.sleep(0.001)
+        return Task.success_state(), self.store.run_ids()
+
+
+def test_checkpoints_are_written_in_the_background():
+    store = MemoryStore()
+    task_one = CountingTask('task one')
+    task_one.on_success(WaitingTask('task two', store))
+    checkpointer = Checkpointer(store, interval=0.001)
+
+    context = Manager(task_one, checkpointer=checkpointer).run()
+    checkpointer.close()
+
+    assert context.params == [[context.run_id]]
+    assert store.run_ids() == []
+
+
+def test_resume_rejects_unknown_runs_and_other_workflows():
+    task_one, _, _ = build_flow()
+    store = MemoryStore()
+    manager = Manager(task_one, checkpointer=Checkpointer(store, 60))
+    with pytest.raises(RuntimeError):
+        manager.run()
+
+    with pytest.raises(WorkflowError):
+        manager.resume('unknown')
+    with pytest.raises(WorkflowError):
+        Manager(example_task.SuccessTask('other')).resume(
+            store.run_ids()[0])
+    other = Manager(example_task.SuccessTask('other'),
+                    checkpointer=Checkpointer(store))
+    with pytest.raises(WorkflowError):
+        other.resume(store.run_ids()[0])
+
+
+def test_async_manager_resumes_runs():
+    task_one, task_two, task_three = build_flow(parallel=True)
+    store = MemoryStore()
+    manager = AsyncManager(task_one, checkpointer=Checkpointer(store, 60))
+    with pytest.raises(RuntimeError):
+        asyncio.run(manager.run())
+
+    context = asyncio.run(manager.resume(store.run_ids()[0]))
+    manager.close()
+
+    assert task_one.calls == 1 and task_two.calls == 1
+    assert [entry['name'] for entry in context.flow_path] == [
+        'task one', 'task two', 'task three', 'task four', 'task five']
+
+
+class AppendCountingStore(MemoryStore):
+
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+
+    def save(self, run_id, data):
+        self.writes.append(('save', len(data)))
+        super().save(run_id, data)
+
+    def append(self, run_id, data):
+        self.writes.append(('append', len(data)))
+        super().append(run_id, data)
+
+
+class FlushingTask(Task):
+    ''' Writes the checkpoints of its run before returning. '''
+
+    def __init__(self, name, checkpointer):
+        super().__init__(name)
+        self.checkpointer = checkpointer
+
+    def execute(self, **kwargs):
+        self.checkpointer.flush()
+        return Task.success_state(),
+
+
+def test_flush_appends_only_what_was_recorded_since():
+    store = AppendCountingStore()
+    checkpointer = Checkpointer(store, 60)
+    tasks = [FlushingTask('task %d' % index, checkpointer)
+             for index in range(20)]
+    for task, successor in zip(tasks, tasks[1:]):
+        task.on_success(successor)
+    tasks[-1].on_success(CrashingTask('crash'))
+    manager = Manager(tasks[0], checkpointer=checkpointer)
+    with pytest.raises(RuntimeError):
+        manager.run()
+
+    kinds = [kind for kind, _ in store.writes]
+    assert kinds == ['save'] + ['append'] * (len(kinds) - 1)
+    # every append holds the one output recorded since the flush before
+    assert len(set(size for _, size in store.writes[2:])) == 1
+
+    context = manager.resume(store.run_ids()[0])
+    assert context.succeeded
+    assert len(context.flow_path) == 21
+
+
+def test_resume_ignores_a_partly_appended_tail(tmp_path):
+    task_one, task_two, task_three = build_flow()
+    store = FileStore(str(tmp_path / 'checkpoints'))
+    manager = Manager(task_one, checkpointer=Checkpointer(store, 60))
+    with pytest.raises(RuntimeError):
+        manager.run()
+    [run_id] = store.run_ids()
+    store.append(run_id, b'\x80\x05\x95')
+
+    context = manager.resume(run_id)
+
+    assert task_one.calls == 1 and task_two.calls == 1
+    assert [entry['name'] for entry in context.flow_path] == [
+        'task one', 'task two', 'task three', 'task four', 'task five']
+
+
+class WritingTask(Task):
+    pass_context = True
+
+    def execute(self, context, **kwargs):
+        context.data['token'] = 'secret'
+        return Task.success_state(),
+
+
+class ReadingTask(CrashingTask):
+    pass_context = True
+
+    def execute(self, context, **kwargs):
+        super().execute()
+        return Task.success_state(), context.data.get('token')
+
+
+def test_resume_restores_context_data():
+    writer = WritingTask('writer')
+    reader = ReadingTask('reader')
+    writer.on_success(reader)
+    store = MemoryStore()
+    manager = Manager(writer, checkpointer=Checkpointer(store, 60))
+    with pytest.raises(RuntimeError):
+        manager.run()
+
+    context = manager.resume(store.run_ids()[0])
+
+    assert context.params == ['secret']
+    assert context.data == {'token': 'secret'}
@@ -0,0 +1,184 @@
+import asyncio
+import time
+
+import example_task
+from workflow_manager.async_manager import AsyncManager
+from workflow_manager.manager import Manager
+from workflow_manager.task import Task
+
+
+class EchoTask(Task):
+
+    def execute(self, **kwargs):
+        time.sleep(kwargs.get('delay', 0))
+        return Task.success_state(), kwargs.get('record')
+
+
+def test_run_returns_its_context():
+    task_one = example_task.SuccessTask('task 1')
+    task_two = example_task.FailureTask('task 2')
+    task_one.on_success(task_two)
+
+    context = Manager(task_one).run()
+
+    assert context.result == Task.failure_state()
+    assert not context.succeeded
+    assert context.elapsed >= 0
+    assert context.params == ['failure message from ', 'task 2']
+    assert [step['name'] for step in context.flow_path] == [
+        'task 1', 'task 2']
+
+
+def test_run_passes_inputs_to_initial_task():
+    task_one = EchoTask('task 1')
+    task_two = example_task.SuccessTask('task 2')
+    task_one.on_success(task_two)
+
+    context = Manager(task_one).run(record=42)
+
+    assert context.inputs == {'record': 42}
+    assert context.flow_path[1]['parameters'] == ([42],)
+
+
+def test_run_many_shares_one_graph():
+    '''
+    Given:
+    task 1 -> success -> task 2
+
+    When:
+    20 instances run on 4 workers, each taking 0.05 seconds
+
+    Then every instance has its own flow, in the order of the inputs,
+    and instances overlap
+    '''
+    task_one = EchoTask('task 1')
+    task_one.on_success(example_task.SuccessTask('task 2'))
+    manager = Manager(task_one)
+
+    stats = manager.run_many(
+        ({'record': index, 'delay': 0.05} for index in range(20)),
+        workers=4)
+
+    assert len(stats.runs) == 20
+    assert stats.succeeded == 20 and stats.failed == 0
+    assert stats.elapsed < 20 * 0.05
+    assert stats.throughput > 0
+    assert stats.started <= min(run.started for run in stats.runs)
+    for index, run in enumerate(stats.runs):
+        assert run.inputs['record'] == index
+        assert run.flow_path[1]['parameters'] == ([index],)
+    assert len(set(run.run_id for run in stats.runs)) == 20
+    assert stats.to_dict()['runs'] == 20
+
+
+def test_async_run_many():
+    class AsyncEchoTask(Task):
+
+        async def execute(self, **kwargs):
+            await asyncio.sleep(0.05)
+            return Task.success_state(), kwargs['record']
+
+    manager = AsyncManager(AsyncEchoTask('task 1'))
+
+    stats = asyncio.run(manager.run_many(
+        [{'record': index} for index in range(100)], workers=50))
+
+    assert [run.params for run in stats.runs] == [
+        [index] for index in range(100)]
+    assert stats.elapsed < 100 * 0.05
+
+
+class RecordingTask(Task):
+
+    def __init__(self, name, received, result=True, output=None):
+        super().__init__(name)
+        self._received = received
+        self._result = result
+        self._output = output
+
+    def execute(self, **kwargs):
+        self._received[self.name] = kwargs
+        if self._output is None:
+            return self._result, 'positional', self.name
+        return self._result, self._output
+
+
+def test_mapping_output_becomes_successor_kwargs():
+    '''
+    Given:
+    task 1 -> success -> task 2, task 3
+    task 2 -> failure -> task 4
+
+    When:
+    task 1 returns {'user': 'u1'}
+    task 2 fails returning {'error': 'boom'}
+
+    Then task 2 and task 3 both get task 1's output and task 4 gets
+    task 2's output
+    '''
+    received = {}
+    task_one = RecordingTask('task 1', received, output={'user': 'u1'})
+    task_two = RecordingTask('task 2', received, result=False,
+                             output={'error': 'boom'})
+    task_three = RecordingTask('task 3', received)
+    task_four = RecordingTask('task 4', received)
+    task_one.on_success(task_two, task_three)
+    task_one.on_failure(task_four)
+    task_two.on_failure(task_four)
+    task_two.on_success(task_three)
+
+    Manager(task_one).run(start=1)
+
+    assert received == {
+        'task 1': {'start': 1},
+        'task 2': {'user': 'u1'},
+        'task 4': {'error': 'boom'}
+    }
+
+
+def test_positional_output_passes_no_kwargs():
+    received = {}
+    task_one = RecordingTask('task 1', received)
+    task_one.on_success(RecordingTask('task 2', received))
+
+    Manager(task_one).run()
+
+    assert received['task 2'] == {}
+
+
+def test_large_payloads_are_passed_by_reference():
+    payload = bytearray(10 * 1024 * 1024)
+    received = {}
+    task_one = RecordingTask('task 1', received, output={'blob': payload})
+    task_two = RecordingTask('task 2', received, output={'blob': payload})
+    task_three = RecordingTask('task 3', received)
+    task_one.on_success(task_two)
+    task_two.on_success(task_three)
+
+    Manager(task_one).run()
+
+    assert received['task 2']['blob'] is payload
+    assert received['task 3']['blob'] is payload
+
+
+def test_pass_context_shares_run_data():
+    class ProducerTask(Task):
+        pass_context = True
+
+        def execute(self, context, **kwargs):
+            context.data['total'] = 41
+            return (Task.success_state(),)
+
+    class ConsumerTask(Task):
+        pass_context = True
+
+        def execute(self, context, **kwargs):
+            context.data['total'] += 1
+            return (Task.success_state(),)
+
+    task_one = ProducerTask('task 1')
+    task_one.on_success(ConsumerTask('task 2'))
+
+    context = Manager(task_one).run()
+
+    assert context.data == {'total': 42}
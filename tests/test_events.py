@@ -0,0 +1,120 @@
+import io
+import json
+import time
+import urllib.request
+
+import pytest
+
+import example_task
+from workflow_manager.events import (EventStream, JsonLinesExporter,
+                                     PrometheusExporter)
+from workflow_manager.manager import Manager
+
+
+def build_flow():
+    '''
+    task 1 -> success -> task 2, task 3, task 4
+    task 2 -> success -> task 3
+    task 3 -> failure -> task 5
+    '''
+    task_one = example_task.SuccessTask('task 1')
+    task_two = example_task.SuccessTask('task 2')
+    task_three = example_task.FailureTask('task 3')
+    task_one.on_success(task_two, task_three,
+                        example_task.SuccessTask('task 4'))
+    task_two.on_success(task_three)
+    task_three.on_failure(example_task.SuccessTask('task 5'))
+    return task_one
+
+
+def test_events_follow_the_run():
+    '''
+    Then:
+    task 3 and task 4 are short circuited after task 3 failed, and the
+    events reach the exporter once flushed
+    '''
+    log = io.StringIO()
+    events = EventStream([JsonLinesExporter(log)], interval=60)
+
+    context = Manager(build_flow(), instrumentation=events).run()
+    assert log.getvalue() == ''
+    events.flush()
+
+    lines = [json.loads(line) for line in log.getvalue().splitlines()]
+    assert {line['run_id'] for line in lines} == {context.run_id}
+    assert [(line['event'], line.get('task'), line.get('result'))
+            for line in lines] == [
+        ('run_started', None, None),
+        ('task_started', 'task 1', None),
+        ('task_finished', 'task 1', 'success'),
+        ('task_started', 'task 2', None),
+        ('task_finished', 'task 2', 'success'),
+        ('task_started', 'task 3', None),
+        ('task_finished', 'task 3', 'failure'),
+        ('task_started', 'task 5', None),
+        ('task_finished', 'task 5', 'success'),
+        ('task_short_circuited', 'task 3', None),
+        ('task_short_circuited', 'task 4', None),
+        ('run_finished', None, 'failure')]
+    assert lines[-1]['duration'] == pytest.approx(context.elapsed, abs=1e-6)
+    events.close()
+
+
+def test_events_are_dated_from_the_walk_timings():
+    log = io.StringIO()
+    events = EventStream([JsonLinesExporter(log)], interval=60)
+    start = time.time()
+
+    Manager(build_flow(), instrumentation=events).run()
+    events.close()
+
+    lines = [json.loads(line) for line in log.getvalue().splitlines()]
+    timestamps = [line['timestamp'] for line in lines]
+    assert timestamps == sorted(timestamps)
+    assert start - 1 < timestamps[0] and timestamps[-1] < time.time() + 1
+    started, finished = lines[1], lines[2]
+    assert finished['timestamp'] - started['timestamp'] == pytest.approx(
+        finished['duration'], abs=1e-3)
+
+
+def test_prometheus_counts_and_histograms(tmp_path):
+    path = str(tmp_path / 'workflow.prom')
+    prometheus = PrometheusExporter(path=path, buckets=(0.5, 60))
+    events = EventStream([prometheus], interval=60)
+    manager = Manager(build_flow(), instrumentation=events)
+
+    manager.run_many([{}, {}, {}], workers=2)
+    events.close()
+
+    text = prometheus.render()
+    with open(path) as fp:
+        assert fp.read() == text
+    assert 'workflow_runs_total{result="failure"} 3\n' in text
+    assert ('workflow_task_runs_total{task="task 3",result="failure"} 3\n'
+            in text)
+    assert 'workflow_task_short_circuited_total{task="task 3"} 3\n' in text
+    assert 'workflow_task_short_circuited_total{task="task 4"} 3\n' in text
+    assert ('workflow_task_duration_seconds_bucket{task="task 1",le="0.5"} '
+            '3\n' in text)
+    assert ('workflow_task_duration_seconds_bucket{task="task 1",le="+Inf"} '
+            '3\n' in text)
+    assert 'workflow_task_duration_seconds_count{task="task 1"} 3\n' in text
+    assert '# TYPE workflow_run_duration_seconds histogram\n' in text
+
+
+def test_prometheus_serves_scrapes():
+    prometheus = PrometheusExporter()
+    events = EventStream([prometheus])
+    Manager(build_flow(), instrumentation=events).run()
+    events.flush()
+    server = prometheus.serve(0)
+    try:
+        url = 'http://127.0.0.1:%d/metrics' % server.server_address[1]
+        with urllib.request.urlopen(url) as response:
+            body = response.read().decode('utf-8')
+    finally:
+        server.shutdown()
+        events.close()
+
+    assert body == prometheus.render()
+    assert 'workflow_runs_total{result="failure"} 1' in body
@@ -0,0 +1,123 @@
+import asyncio
+
+import example_task
+from example_task import names
+from workflow_manager.async_manager import AsyncManager
+from workflow_manager.batch import BatchManager
+from workflow_manager.manager import Manager
+from workflow_manager.task import Task
+
+
+class SplitTask(Task):
+    ''' Splits its input into shards and generates a task per shard. '''
+
+    def __init__(self, name, shards, failing=()):
+        super().__init__(name)
+        self._shards = shards
+        self._failing = failing
+        self.generated = []
+
+    def execute(self, **kwargs):
+        return Task.success_state(), {'shards': self._shards}
+
+    def generate_success(self, shards, **kwargs):
+        for shard in shards:
+            if shard in self._failing:
+                task = example_task.FailureTask('shard %s' % shard)
+            else:
+                task = example_task.SuccessTask('shard %s' % shard)
+            task.on_success(example_task.SuccessTask('report %s' % shard))
+            self.generated.append(task.name)
+            yield task
+
+
+class NestedSplitTask(SplitTask):
+
+    def generate_success(self, shards, **kwargs):
+        for shard in shards:
+            self.generated.append(shard)
+            yield SplitTask('split %s' % shard, ['%s.%d' % (shard, part)
+                                                 for part in (1, 2)])
+
+
+def test_generated_tasks_follow_the_success_list():
+    '''
+    Given:
+    split -> success -> audit
+    split generates shard 1, shard 2, each with a report on success
+    Then:
+    the generated tasks run after audit, with their own flows
+    '''
+    split = SplitTask('split', [1, 2])
+    split.on_success(example_task.SuccessTask('audit'))
+
+    context = Manager(split).run()
+
+    assert context.succeeded
+    assert names(context) == ['split', 'audit', 'shard 1', 'report 1',
+                              'shard 2', 'report 2']
+
+
+def test_generating_tasks_keeps_the_run_plan():
+    split = SplitTask('split', [1, 2])
+    split.on_success(example_task.SuccessTask('audit'))
+    manager = Manager(split)
+    plan = manager.compile()
+
+    for _ in range(5):
+        assert manager.run().succeeded
+
+    assert manager._plan is plan
+    assert not plan.is_stale()
+
+
+def test_failure_stops_generating():
+    '''
+    Given:
+    start -> success -> split, after
+    split generates shard 1, shard 2 (fails), shard 3
+    Then:
+    shard 3 is never built and the rest of start's list short circuits
+    '''
+    start = example_task.SuccessTask('start')
+    split = SplitTask('split', [1, 2, 3], failing=(2,))
+    start.on_success(split, example_task.SuccessTask('after'))
+
+    context = Manager(start).run()
+
+    assert not context.succeeded
+    assert names(context) == ['start', 'split', 'shard 1', 'report 1',
+                              'shard 2']
+    assert split.generated == ['shard 1', 'shard 2']
+
+
+def test_nothing_is_generated_on_failure():
+    task_one = example_task.FailureTask('task one')
+    split = SplitTask('split', [1])
+    task_one.on_success(split)
+
+    Manager(task_one).run()
+
+    assert split.generated == []
+
+
+def test_generated_tasks_generate_in_turn():
+    split = NestedSplitTask('split', ['a', 'b'])
+
+    context = Manager(split).run()
+
+    assert names(context) == [
+        'split', 'split a', 'shard a.1', 'report a.1', 'shard a.2',
+        'report a.2', 'split b', 'shard b.1', 'report b.1', 'shard b.2',
+        'report b.2']
+
+
+def test_every_manager_walks_generated_tasks_alike():
+    split = SplitTask('split', [1, 2, 3], failing=(3,))
+    expected = names(Manager(split).run())
+
+    context = asyncio.run(AsyncManager(split).run())
+    stats = BatchManager(split).run_batch([{}, {}])
+
+    assert names(context) == expected
+    assert [names(run) for run in stats.runs] == [expected, expected]
@@ -0,0 +1,107 @@
+import example_task
+from example_task import names
+from workflow_manager.history import NullHistory, RingHistory, StreamHistory
+from workflow_manager.manager import Manager
+import pytest
+
+
+def chain(length):
+    head = previous = example_task.SuccessTask('task 1')
+    for index in range(2, length + 1):
+        current = example_task.SuccessTask('task %d' % index)
+        previous.on_success(current)
+        previous = current
+    return head
+
+
+def test_history_does_not_grow_across_runs():
+    manager = Manager(chain(3))
+
+    manager.run()
+    manager.run()
+
+    assert names(manager.show_executed_flow()) == [
+        'task 1', 'task 2', 'task 3']
+
+
+def test_executed_flow_is_read_only_view():
+    manager = Manager(chain(2))
+    assert manager.show_executed_flow() == []
+
+    manager.run()
+    flow = manager.show_executed_flow()
+
+    assert flow[0] == {'name': 'task 1', 'parameters': ()}
+    assert flow[-1:] == [flow[1]]
+    with pytest.raises(TypeError):
+        flow[0] = None
+    assert not hasattr(flow, 'append')
+
+
+def test_ring_history_keeps_last_entries():
+    manager = Manager(chain(10), history=lambda: RingHistory(3))
+
+    manager.run()
+
+    assert names(manager.show_executed_flow()) == [
+        'task 8', 'task 9', 'task 10']
+
+
+def test_null_history_keeps_nothing_but_still_skips_repeats():
+    '''
+    Given:
+    task 1 -> success -> task 2, task 3
+    task 2 -> success -> task 3
+
+    Then task 3 runs once, as with a recorded history
+    '''
+    executed = []
+
+    class RecordingTask(example_task.SuccessTask):
+
+        def execute(self, **kwargs):
+            executed.append(self.name)
+            return super().execute(**kwargs)
+
+    task_one = RecordingTask('task 1')
+    task_two = RecordingTask('task 2')
+    task_three = RecordingTask('task 3')
+    task_one.on_success(task_two, task_three)
+    task_two.on_success(task_three)
+    manager = Manager(task_one, history=NullHistory)
+
+    manager.run()
+
+    assert executed == ['task 1', 'task 2', 'task 3']
+    assert manager.show_executed_flow() == []
+
+
+def test_stream_history_hands_out_entries():
+    streamed = []
+    manager = Manager(chain(3),
+                      history=lambda: StreamHistory(streamed.append))
+
+    manager.run()
+
+    assert names(streamed) == ['task 1', 'task 2', 'task 3']
+    assert manager.show_executed_flow() == []
+
+
+def test_stream_history_feeds_generator_in_branch_order():
+    streamed = []
+
+    def consumer():
+        while True:
+            streamed.append((yield)['name'])
+
+    generator = consumer()
+    next(generator)
+    task_one = example_task.SuccessTask('task 1')
+    task_one.on_success(example_task.SuccessTask('task 2'),
+                        example_task.SuccessTask('task 3'), parallel=True)
+
+    with Manager(task_one,
+                 history=lambda: StreamHistory(generator)) as manager:
+        manager.run()
+
+    assert streamed == ['task 1', 'task 2', 'task 3']
@@ -0,0 +1,124 @@
+from workflow_manager.checkpoint import SQLiteStore
+from workflow_manager.incremental import OutputStore
+from workflow_manager.manager import Manager
+from workflow_manager.task import Task
+
+
+class StepTask(Task):
+    ''' Applies function to value, failing while broken is set. '''
+
+    def __init__(self, name, function=None):
+        super().__init__(name)
+        self.calls = 0
+        self.broken = False
+        self._function = function or (lambda value: value)
+
+    def execute(self, value=0, **kwargs):
+        self.calls += 1
+        if self.broken:
+            return Task.failure_state(), 'broken'
+        return Task.success_state(), {'value': self._function(value)}
+
+
+class ClockTask(StepTask):
+    incremental = False
+
+
+def build_flow():
+    '''
+    task 1 -> success -> task 2 -> success -> task 3
+    task 1 takes the absolute value, task 2 doubles it
+    '''
+    tasks = [StepTask('task 1', abs), StepTask('task 2', lambda x: x * 2),
+             StepTask('task 3')]
+    tasks[0].on_success(tasks[1])
+    tasks[1].on_success(tasks[2])
+    return tasks
+
+
+def calls(tasks):
+    return [task.calls for task in tasks]
+
+
+def test_unchanged_run_executes_nothing():
+    tasks = build_flow()
+    outputs = OutputStore()
+    manager = Manager(tasks[0], incremental=outputs)
+
+    first = manager.run(value=2)
+    second = manager.run(value=2)
+
+    assert calls(tasks) == [1, 1, 1]
+    assert second.succeeded
+    assert second.flow_path == first.flow_path
+    assert second.params == [{'value': 4}]
+    assert (outputs.hits, outputs.misses) == (3, 3)
+
+
+def test_only_tasks_with_changed_inputs_execute():
+    '''
+    Given:
+    a run with value 2
+    When:
+    the flow runs with -2, then with 3
+    Then:
+    with -2 task 1 executes again but returns what it did before, so
+    task 2 and task 3 are reused; with 3 every task executes
+    '''
+    tasks = build_flow()
+    manager = Manager(tasks[0], incremental=OutputStore())
+    manager.run(value=2)
+
+    manager.run(value=-2)
+    assert calls(tasks) == [2, 1, 1]
+
+    context = manager.run(value=3)
+    assert calls(tasks) == [3, 2, 2]
+    assert context.params == [{'value': 6}]
+
+
+def test_failed_tasks_execute_again():
+    tasks = build_flow()
+    tasks[1].broken = True
+    manager = Manager(tasks[0], incremental=OutputStore())
+    assert not manager.run(value=1).succeeded
+
+    tasks[1].broken = False
+    context = manager.run(value=1)
+
+    assert context.succeeded
+    assert calls(tasks) == [1, 2, 1]
+
+
+def test_opted_out_tasks_always_execute():
+    task_one = StepTask('task 1')
+    clock = ClockTask('clock')
+    task_one.on_success(clock)
+    manager = Manager(task_one, incremental=OutputStore())
+
+    manager.run()
+    manager.run()
+
+    assert calls([task_one, clock]) == [1, 2]
+
+
+def test_outputs_persist_until_invalidated(tmp_path):
+    path = str(tmp_path / 'outputs.db')
+    tasks = build_flow()
+    outputs = OutputStore(SQLiteStore(path))
+    Manager(tasks[0], incremental=outputs).run(value=5)
+    outputs.close()
+
+    outputs = OutputStore(SQLiteStore(path))
+    manager = Manager(tasks[0], incremental=outputs)
+    manager.run(value=5)
+    assert calls(tasks) == [1, 1, 1]
+
+    outputs.invalidate('task 2')
+    manager.run(value=5)
+    assert calls(tasks) == [1, 2, 1]
+
+    outputs.invalidate()
+    manager.run(value=5)
+    assert calls(tasks) == [2, 3, 2]
+    outputs.close()
@@ -0,0 +1,138 @@
+import time
+
+import example_task
+from workflow_manager.instrumentation import (Instrumentation,
+                                              TimingInstrumentation)
+from workflow_manager.manager import Manager
+
+
+class SleepTask(example_task.SuccessTask):
+
+    def __init__(self, name, seconds):
+        super().__init__(name)
+        self._seconds = seconds
+
+    def execute(self, **kwargs):
+        time.sleep(self._seconds)
+        return super().execute(**kwargs)
+
+
+class RecordingInstrumentation(Instrumentation):
+
+    def __init__(self):
+        self.events = []
+
+    def before_run(self, context):
+        self.events.append('run')
+
+    def after_run(self, context):
+        self.events.append('done')
+
+    def before_task(self, context, node, parent):
+        self.events.append(('start', context.plan.names[node], parent))
+        return context.plan.names[node]
+
+    def after_task(self, context, node, output, wall_ns, cpu_ns, token):
+        assert wall_ns >= 0 and cpu_ns >= 0
+        self.events.append(('finish', token, output[0]))
+
+    def on_skip(self, context, node):
+        self.events.append(('skip', context.plan.names[node]))
+
+    def on_short_circuit(self, context, nodes):
+        self.events.append(
+            ('short circuit', [context.plan.names[node] for node in nodes]))
+
+
+def test_hooks_follow_the_flow():
+    '''
+    Given:
+    task 1 -> success -> task 2, task 3, task 4
+    task 2 -> success -> task 3
+    task 3 -> failure -> task 5
+
+    When:
+    task 3 fails
+
+    Then task 3 is skipped once and task 4 short circuited
+    '''
+    task_one = example_task.SuccessTask('task 1')
+    task_two = example_task.SuccessTask('task 2')
+    task_three = example_task.FailureTask('task 3')
+    task_four = example_task.SuccessTask('task 4')
+    task_five = example_task.SuccessTask('task 5')
+    task_one.on_success(task_two, task_three, task_four)
+    task_two.on_success(task_three)
+    task_three.on_failure(task_five)
+    instrumentation = RecordingInstrumentation()
+
+    Manager(task_one, instrumentation=instrumentation).run()
+
+    assert instrumentation.events == [
+        'run',
+        ('start', 'task 1', None),
+        ('finish', 'task 1', True),
+        ('start', 'task 2', 'task 1'),
+        ('finish', 'task 2', True),
+        ('start', 'task 3', 'task 2'),
+        ('finish', 'task 3', False),
+        ('start', 'task 5', 'task 3'),
+        ('finish', 'task 5', True),
+        ('short circuit', ['task 3', 'task 4']),
+        'done'
+    ]
+
+
+def test_timing_summary():
+    '''
+    Given:
+    task 1 -> success (parallel) -> task 2, task 3
+    task 3 -> success -> task 4, task 4 (skipped)
+
+    Then the critical path runs through the slow branch
+    '''
+    task_one = SleepTask('task 1', 0)
+    task_two = SleepTask('task 2', 0.05)
+    task_three = SleepTask('task 3', 0.04)
+    task_four = SleepTask('task 4', 0.04)
+    task_one.on_success(task_two, task_three, parallel=True)
+    task_three.on_success(task_four, task_four)
+
+    with Manager(task_one,
+                 instrumentation=TimingInstrumentation()) as manager:
+        summary = manager.run().metrics.summary(count=2)
+
+    assert summary['tasks'] == 4
+    assert summary['skipped'] == 1
+    assert summary['short_circuited'] == 0
+    assert summary['critical_path'] == ['task 1', 'task 3', 'task 4']
+    assert summary['critical_path_ns'] >= 80000000
+    assert summary['total_ns'] < summary['task_wall_ns']
+    assert len(summary['slowest']) == 2
+    assert summary['slowest'][0][0] == 'task 2'
+
+
+class WallTimeOnly(Instrumentation):
+    cpu_time = False
+
+    def __init__(self):
+        self.timings = []
+
+    def after_task(self, context, node, output, wall_ns, cpu_ns, token):
+        self.timings.append((wall_ns, cpu_ns))
+
+
+def test_instrumentation_can_skip_cpu_time():
+    task_one = example_task.SuccessTask('task 1')
+    task_one.on_success(example_task.SuccessTask('task 2'))
+    instrumentation = WallTimeOnly()
+
+    Manager(task_one, instrumentation=instrumentation).run()
+
+    assert len(instrumentation.timings) == 2
+    assert all(wall_ns >= 0 and cpu_ns is None
+               for wall_ns, cpu_ns in instrumentation.timings)
+
+
+def test_uninstrumented_run_has_no_metrics():
+    assert Manager(example_task.SuccessTask('task 1')).run().metrics is None
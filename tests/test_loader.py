@@ -0,0 +1,155 @@
+import json
+import os
+
+from example_task import names
+from workflow_manager import loader
+from workflow_manager.exceptions import InvalidWorkflowError
+from workflow_manager.manager import Manager
+import pytest
+
+
+DEFINITION = {
+    'initial': 'task 1',
+    'tasks': {
+        'task 1': {'type': 'example_task:SuccessTask',
+                   'on_success': ['task 2', 'task 3'],
+                   'on_failure': ['task 4']},
+        'task 2': {'type': 'example_task:FailureTask',
+                   'on_failure': ['task 4']},
+        'task 3': {'type': 'example_task:SuccessTask'},
+        'task 4': {'type': 'example_task:SuccessTask', 'args': ['cleanup']}
+    }
+}
+
+
+def write(tmp_path, definition, name='workflow.json'):
+    path = str(tmp_path / name)
+    with open(path, 'w') as output:
+        json.dump(definition, output)
+    return path
+
+
+def test_load_definition_runs():
+    '''
+    Given:
+    task 1 -> success -> task 2, task 3
+    task 1 -> failure -> task 4 (named cleanup)
+    task 2 -> failure -> task 4
+
+    Then workflow is:
+    task 1 -> task 2 -> cleanup
+    '''
+    manager = Manager()
+    manager.register_plan(loader.load_definition(DEFINITION))
+
+    context = manager.run()
+
+    assert [step['name'] for step in context.flow_path] == [
+        'task 1', 'task 2', 'cleanup']
+
+
+def test_load_caches_compiled_definition(tmp_path, monkeypatch):
+    path = write(tmp_path, DEFINITION)
+    cache_dir = str(tmp_path / 'cache')
+
+    first = loader.load(path, cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+
+    def fail(definition):
+        raise AssertionError('definition compiled again')
+
+    monkeypatch.setattr(loader, 'compile_definition', fail)
+    second = loader.load(path, cache_dir=cache_dir)
+
+    assert second.tasks[0] is not first.tasks[0]
+    assert second.names == first.names
+    assert list(second.topological_order) == list(first.topological_order)
+    assert second.tasks[0].to_dict() == first.tasks[0].to_dict()
+    manager = Manager()
+    manager.register_plan(second)
+    assert not manager.run().succeeded
+
+
+def test_changed_definition_misses_cache(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    loader.load(write(tmp_path, DEFINITION), cache_dir=cache_dir)
+
+    changed = json.loads(json.dumps(DEFINITION))
+    changed['tasks']['task 2']['type'] = 'example_task:SuccessTask'
+    plan = loader.load(write(tmp_path, changed), cache_dir=cache_dir)
+
+    assert len(os.listdir(cache_dir)) == 2
+    manager = Manager()
+    manager.register_plan(plan)
+    assert manager.run().succeeded
+
+
+def test_loading_another_definition_keeps_registered_plans():
+    manager = Manager()
+    plan = loader.load_definition(DEFINITION)
+    manager.register_plan(plan)
+
+    loader.load_definition(DEFINITION)
+    manager.run()
+
+    assert manager._plan is plan
+
+
+def test_load_yaml(tmp_path):
+    path = str(tmp_path / 'workflow.yaml')
+    with open(path, 'w') as output:
+        output.write('initial: start\n'
+                     'tasks:\n'
+                     '  start:\n'
+                     '    type: example_task:SuccessTask\n'
+                     '    on_success: [finish]\n'
+                     '  finish:\n'
+                     '    type: example_task:SuccessTask\n')
+
+    plan = loader.load(path)
+
+    assert plan.names == ('start', 'finish')
+
+
+def test_load_yaml_routes(tmp_path):
+    path = str(tmp_path / 'workflow.yaml')
+    with open(path, 'w') as output:
+        output.write('initial: start\n'
+                     'tasks:\n'
+                     '  start:\n'
+                     '    type: example_task:OutcomeTask\n'
+                     '    args: [start, \'off\']\n'
+                     '    routes:\n'
+                     '      approve: [finish]\n'
+                     '      \'off\': [cleanup]\n'
+                     '  finish:\n'
+                     '    type: example_task:SuccessTask\n'
+                     '  cleanup:\n'
+                     '    type: example_task:SuccessTask\n')
+    manager = Manager()
+    manager.register_plan(loader.load(path))
+
+    assert names(manager.run()) == ['start', 'cleanup']
+
+    with open(path, 'a') as output:
+        output.write('  unquoted:\n'
+                     '    type: example_task:SuccessTask\n'
+                     '    routes: {off: [cleanup]}\n')
+    with pytest.raises(InvalidWorkflowError):
+        loader.load(path)
+
+
+@pytest.mark.parametrize('definition', [
+    {'tasks': {}},
+    {'initial': 'a', 'tasks': {'b': {'type': 'example_task:SuccessTask'}}},
+    {'initial': 'a', 'tasks': {'a': {'type': 'example_task:SuccessTask',
+                                     'on_success': ['b']}}},
+    {'initial': 'a', 'tasks': {'a': {'type': 'example_task:SuccessTask'},
+                               'b': {'type': 'example_task:SuccessTask'}}},
+    {'initial': 'a', 'tasks': {'a': {'type': 'json:JSONDecoder'}}},
+    {'initial': 'a', 'tasks': {'a': {'type': 'example_task:SuccessTask',
+                                     'on_sucess': ['a']}}},
+])
+def test_load_rejects_bad_definitions(definition):
+    with pytest.raises(InvalidWorkflowError):
+        loader.load_definition(definition)
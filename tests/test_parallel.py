@@ -0,0 +1,116 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import example_task
+from example_task import names
+from workflow_manager.manager import Manager
+
+
+class SleepTask(example_task.SuccessTask):
+
+    def __init__(self, name, seconds):
+        super().__init__(name)
+        self._seconds = seconds
+
+    def execute(self, **kwargs):
+        time.sleep(self._seconds)
+        return super().execute(**kwargs)
+
+
+def test_parallel_branches_run_concurrently():
+    '''
+    Given:
+    task 1 -> success (parallel) -> task 2, task 3, task 4
+
+    When:
+    every branch takes 0.2 seconds
+
+    Then the branches overlap and the flow keeps declaration order:
+    task 1 -> task 2 -> task 3 -> task 4
+    '''
+    task_one = example_task.SuccessTask('task 1')
+    task_one.on_success(SleepTask('task 2', 0.2), SleepTask('task 3', 0.2),
+                        SleepTask('task 4', 0.2), parallel=True)
+
+    with Manager(task_one) as manager:
+        start = time.monotonic()
+        manager.run()
+        elapsed = time.monotonic() - start
+
+    assert elapsed < 0.5
+    assert names(manager.show_executed_flow()) == [
+        'task 1', 'task 2', 'task 3', 'task 4']
+
+
+def test_parallel_branch_failure_short_circuits():
+    '''
+    Given:
+    task 1 -> success -> task 2, task 5
+    task 2 -> success (parallel) -> task 3, task 4
+    task 4 -> failure -> task 6
+
+    When:
+    task 4 fails
+
+    Then both branches run, task 4 cleans up and task 5 is skipped:
+    task 1 -> task 2 -> task 3 -> task 4 -> task 6
+    '''
+    task_one = example_task.SuccessTask('task 1')
+    task_two = example_task.SuccessTask('task 2')
+    task_three = example_task.SuccessTask('task 3')
+    task_four = example_task.FailureTask('task 4')
+    task_five = example_task.SuccessTask('task 5')
+    task_six = example_task.SuccessTask('task 6')
+    task_one.on_success(task_two, task_five)
+    task_two.on_success(task_three, task_four, parallel=True)
+    task_four.on_failure(task_six)
+
+    with Manager(task_one) as manager:
+        manager.run()
+
+    assert names(manager.show_executed_flow()) == [
+        'task 1', 'task 2', 'task 3', 'task 4', 'task 6']
+
+
+def test_nested_parallel_branches_with_single_worker():
+    '''
+    Given:
+    task 1 -> success (parallel) -> task 2, task 3
+    task 2 -> success (parallel) -> task 4, task 5
+    task 3 -> success (parallel) -> task 6, task 7
+
+    When:
+    the manager has a single worker thread
+
+    Then the flow still completes
+    '''
+    task_one = example_task.SuccessTask('task 1')
+    task_two = example_task.SuccessTask('task 2')
+    task_three = example_task.SuccessTask('task 3')
+    task_one.on_success(task_two, task_three, parallel=True)
+    task_two.on_success(example_task.SuccessTask('task 4'),
+                        example_task.SuccessTask('task 5'), parallel=True)
+    task_three.on_success(example_task.SuccessTask('task 6'),
+                          example_task.SuccessTask('task 7'), parallel=True)
+
+    with Manager(task_one, max_workers=1) as manager:
+        manager.run()
+
+    assert names(manager.show_executed_flow()) == [
+        'task 1', 'task 2', 'task 4', 'task 5', 'task 3', 'task 6', 'task 7']
+
+
+def test_close_leaves_caller_executor_running():
+    task_one = example_task.SuccessTask('task 1')
+    task_one.on_success(example_task.SuccessTask('task 2'),
+                        example_task.SuccessTask('task 3'), parallel=True)
+
+    with ThreadPoolExecutor(2) as executor:
+        manager = Manager(task_one, executor=executor)
+        manager.run()
+        manager.close()
+
+        assert executor.submit(lambda: 'still running').result() == \
+            'still running'
+    assert names(manager.show_executed_flow()) == [
+        'task 1', 'task 2', 'task 3']
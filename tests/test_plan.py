@@ -0,0 +1,213 @@
+from array import array
+
+import example_task
+from example_task import names
+from workflow_manager.exceptions import InvalidWorkflowError
+from workflow_manager.manager import Manager
+from workflow_manager.plan import Plan
+import pytest
+
+
+def test_compile_assigns_node_ids():
+    '''
+    Given:
+    task 1 -> success -> task 2, task 3
+    task 1 -> failure -> task 4
+    task 2 -> success -> task 4
+    task 3 -> failure -> task 4
+
+    Then task 4 gets a single node id shared by every edge
+    '''
+    task_one = example_task.SuccessTask('task 1')
+    task_two = example_task.SuccessTask('task 2')
+    task_three = example_task.SuccessTask('task 3')
+    task_four = example_task.SuccessTask('task 4')
+    task_one.on_success(task_two, task_three)
+    task_one.on_failure(task_four)
+    task_two.on_success(task_four)
+    task_three.on_failure(task_four)
+
+    plan = Plan.compile(task_one)
+
+    assert len(plan) == 4
+    assert plan.names == ('task 1', 'task 2', 'task 3', 'task 4')
+    assert plan.tasks[0] is task_one
+    assert plan.success(0) == (1, 2)
+    assert plan.failure(0) == (3,)
+    assert plan.success(1) == (3,)
+    assert plan.failure(1) == ()
+    assert plan.failure(2) == (3,)
+    assert plan.success(3) == () and plan.failure(3) == ()
+
+
+def test_compile_without_initial_task():
+    with pytest.raises(InvalidWorkflowError):
+        Manager().compile()
+
+
+def test_compile_rejects_non_task_successor():
+    task_one = example_task.SuccessTask('task 1')
+    task_one.on_success('task 2')
+
+    with pytest.raises(InvalidWorkflowError):
+        Manager(task_one).compile()
+
+
+def test_run_reuses_compiled_plan():
+    task_one = example_task.SuccessTask('task 1')
+    task_one.on_success(example_task.SuccessTask('task 2'))
+    manager = Manager(task_one)
+
+    plan = manager.compile()
+    manager.run()
+    manager.run()
+
+    assert manager._plan is plan
+    assert not plan.is_stale()
+
+
+def test_run_recompiles_after_graph_changes():
+    task_one = example_task.SuccessTask('task 1')
+    manager = Manager(task_one)
+    plan = manager.compile()
+
+    task_one.on_success(example_task.SuccessTask('task 2'))
+    assert plan.is_stale()
+
+    manager.run()
+
+    assert manager._plan is not plan
+    assert [step['name'] for step in manager.show_executed_flow()] == [
+        'task 1', 'task 2']
+
+
+def test_changes_to_other_graphs_keep_the_plan():
+    task_one = example_task.SuccessTask('task 1')
+    task_one.on_success(example_task.SuccessTask('task 2'))
+    manager = Manager(task_one)
+    plan = manager.compile()
+
+    other = example_task.SuccessTask('other 1')
+    other.on_success(example_task.SuccessTask('other 2'))
+    Manager(other).run()
+    manager.run()
+
+    assert not plan.is_stale()
+    assert manager._plan is plan
+
+
+def test_graphs_sharing_a_task_follow_its_changes():
+    shared = example_task.SuccessTask('cleanup')
+    task_one = example_task.FailureTask('task 1')
+    task_one.on_failure(shared)
+    other = example_task.FailureTask('other 1')
+    other.on_failure(shared)
+    first = Manager(task_one)
+    second = Manager(other)
+    first_plan = first.compile()
+    second_plan = second.compile()
+
+    assert not first_plan.is_stale() and not second_plan.is_stale()
+    first.run()
+    second.run()
+    assert first._plan is first_plan and second._plan is second_plan
+
+    shared.on_success(example_task.SuccessTask('task 2'))
+
+    assert first_plan.is_stale() and second_plan.is_stale()
+    assert names(first.run())[1:] == names(second.run())[1:] == [
+        'cleanup', 'task 2']
+
+
+def test_compiling_graphs_together_merges_their_revisions():
+    task_one = example_task.SuccessTask('task 1')
+    other = example_task.SuccessTask('other 1')
+    first = Manager(task_one)
+    second = Manager(other)
+    first_plan = first.compile()
+    second_plan = second.compile()
+
+    joined = example_task.SuccessTask('joined')
+    joined.on_success(task_one, other)
+    Manager(joined).compile()
+
+    # the second graph was merged into the first: its plan compiles once
+    # more and then follows changes to either graph
+    assert not first_plan.is_stale() and second_plan.is_stale()
+    second_plan = second.compile()
+    task_one.on_success(example_task.SuccessTask('task 2'))
+    assert first_plan.is_stale() and second_plan.is_stale()
+
+
+def test_register_rejects_cycle():
+    '''
+    Given:
+    task 1 -> success -> task 2
+    task 2 -> failure -> task 3
+    task 3 -> success -> task 2
+    '''
+    task_one = example_task.SuccessTask('task 1')
+    task_two = example_task.SuccessTask('task 2')
+    task_three = example_task.SuccessTask('task 3')
+    task_one.on_success(task_two)
+    task_two.on_failure(task_three)
+    task_three.on_success(task_two)
+
+    with pytest.raises(InvalidWorkflowError) as error:
+        Manager().register_initial_task(task_one)
+    assert 'cycle' in str(error.value)
+    with pytest.raises(InvalidWorkflowError):
+        task_one.to_dict()
+
+
+def test_register_rejects_cycle_through_initial_task():
+    task_one = example_task.SuccessTask('task 1')
+    task_two = example_task.SuccessTask('task 2')
+    task_one.on_success(task_two)
+    task_two.on_failure(task_one)
+
+    with pytest.raises(InvalidWorkflowError):
+        Manager(task_one)
+
+
+def test_register_rejects_duplicate_names():
+    task_one = example_task.SuccessTask('task 1')
+    task_one.on_success(example_task.SuccessTask('task 2'),
+                        example_task.SuccessTask('task 2'))
+
+    with pytest.raises(InvalidWorkflowError) as error:
+        Manager(task_one)
+    assert "'task 2'" in str(error.value)
+
+
+def test_validate_rejects_unreachable_tasks():
+    task_one = example_task.SuccessTask('task 1')
+    task_two = example_task.SuccessTask('task 2')
+    plan = Plan([task_one, task_two], array('l', [0, 0, 0]), array('l'),
+                array('l', [0, 0, 0]), array('l'))
+
+    with pytest.raises(InvalidWorkflowError) as error:
+        plan.validate()
+    assert "'task 2'" in str(error.value)
+
+
+def test_plan_caches_topology():
+    '''
+    Given:
+    task 1 -> success -> task 2, task 3
+    task 2 -> success -> task 4
+    task 3 -> failure -> task 4
+    '''
+    task_one = example_task.SuccessTask('task 1')
+    task_two = example_task.SuccessTask('task 2')
+    task_three = example_task.SuccessTask('task 3')
+    task_four = example_task.SuccessTask('task 4')
+    task_one.on_success(task_two, task_three)
+    task_two.on_success(task_four)
+    task_three.on_failure(task_four)
+
+    plan = Manager(task_one).compile()
+    order = list(plan.topological_order)
+
+    assert sorted(order) == [0, 1, 2, 3]
+    assert order[0] == 0 and order[-1] == 3
@@ -0,0 +1,219 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import example_task
+from example_task import names
+from workflow_manager.async_manager import AsyncManager
+from workflow_manager.exceptions import TaskCancelledError, TaskTimeoutError
+from workflow_manager.instrumentation import Instrumentation
+from workflow_manager.manager import Manager
+from workflow_manager.policy import Policy
+from workflow_manager.task import Task
+
+
+class FlakyTask(Task):
+    ''' Raises error the first failures times it executes. '''
+
+    def __init__(self, name, failures, error=ConnectionError):
+        super().__init__(name)
+        self.calls = 0
+        self._failures = failures
+        self._error = error
+
+    def execute(self, **kwargs):
+        self.calls += 1
+        if self.calls <= self._failures:
+            raise self._error('attempt %d' % self.calls)
+        return Task.success_state(), 'attempt', self.calls
+
+
+class StuckTask(Task):
+
+    def __init__(self, name, seconds):
+        super().__init__(name)
+        self._seconds = seconds
+
+    def execute(self, **kwargs):
+        time.sleep(self._seconds)
+        return Task.success_state(),
+
+
+class AsyncStuckTask(StuckTask):
+
+    async def execute(self, **kwargs):
+        await asyncio.sleep(self._seconds)
+        return Task.success_state(),
+
+
+class CancellingTask(Task):
+    pass_context = True
+
+    def execute(self, context, **kwargs):
+        context.cancel()
+        return Task.success_state(),
+
+
+def test_delay_backs_off_exponentially_with_jitter():
+    policy = Policy(backoff=0.1, max_backoff=1, jitter=0.5)
+
+    assert policy.delay(0, random=lambda: 0) == 0.1
+    assert policy.delay(2, random=lambda: 0) == 0.4
+    assert policy.delay(2, random=lambda: 1) == 0.2
+    assert policy.delay(10, random=lambda: 0) == 1
+
+
+def test_timeout_fails_the_task():
+    '''
+    Given:
+    task 1 -> failure -> task 2
+    When:
+    task 1 takes longer than its timeout
+    Then:
+    the run goes on with task 2 without waiting for task 1
+    '''
+    task_one = StuckTask('task one', 1)
+    task_one.policy = Policy(timeout=0.05)
+    task_one.on_failure(example_task.SuccessTask('task two'))
+
+    start = time.perf_counter()
+    context = Manager(task_one).run()
+
+    assert time.perf_counter() - start < 0.5
+    assert not context.succeeded
+    assert names(context) == ['task one', 'task two']
+    [error] = context.flow_path[1]['parameters'][0]
+    assert isinstance(error, TaskTimeoutError)
+
+
+def test_retries_transient_errors():
+    task_one = FlakyTask('task one', failures=2)
+    task_one.policy = Policy(retries=2, backoff=0)
+
+    context = Manager(task_one).run()
+
+    assert context.succeeded
+    assert context.params == ['attempt', 3]
+
+
+def test_exhausted_retries_run_the_failure_flow():
+    task_one = example_task.FailureTask('task one')
+    task_one.policy = Policy(retries=2, backoff=0)
+    flaky = FlakyTask('task two', failures=5)
+    flaky.policy = Policy(retries=1, backoff=0)
+    task_one.on_failure(flaky)
+    flaky.on_failure(example_task.SuccessTask('task three'))
+
+    context = Manager(task_one).run()
+
+    assert names(context) == ['task one', 'task two', 'task three']
+    assert flaky.calls == 2
+    [error] = context.flow_path[2]['parameters'][0]
+    assert isinstance(error, ConnectionError)
+
+
+def test_errors_not_retried_are_raised():
+    task_one = FlakyTask('task one', failures=1, error=KeyError)
+    task_one.policy = Policy(retries=3, backoff=0,
+                             retry_on=(ConnectionError,))
+
+    with pytest.raises(KeyError):
+        Manager(task_one).run()
+    assert task_one.calls == 1
+
+
+def test_cancel_stops_success_lists_and_runs_failure_lists():
+    '''
+    Given:
+    task 1 -> success -> task 2, task 3
+    task 2 -> failure -> task 4
+    task 4 -> success -> task 5
+    When:
+    task 2 cancels the run
+    Then:
+    task 2 fails, task 4 cleans up, task 3 and task 5 do not start
+    '''
+    task_one = example_task.SuccessTask('task one')
+    task_two = CancellingTask('task two')
+    task_four = example_task.SuccessTask('task four')
+    task_one.on_success(task_two, example_task.SuccessTask('task three'))
+    task_two.on_failure(task_four)
+    task_four.on_success(example_task.SuccessTask('task five'))
+
+    context = Manager(task_one).run()
+
+    assert context.cancelled and not context.succeeded
+    assert names(context) == ['task one', 'task two', 'task four']
+    [error] = context.flow_path[2]['parameters'][0]
+    assert isinstance(error, TaskCancelledError)
+
+
+class CancelLater(Instrumentation):
+    ''' Cancels every run from another thread after seconds. '''
+
+    def __init__(self, seconds):
+        self._seconds = seconds
+
+    def before_run(self, context):
+        threading.Timer(self._seconds, context.cancel).start()
+
+
+def test_cancel_interrupts_a_task_with_a_timeout():
+    task_one = StuckTask('task one', 1)
+    task_one.policy = Policy(timeout=5)
+    task_one.on_failure(example_task.SuccessTask('task two'))
+
+    start = time.perf_counter()
+    context = Manager(task_one, instrumentation=CancelLater(0.05)).run()
+
+    assert time.perf_counter() - start < 0.5
+    assert names(context) == ['task one', 'task two']
+    [error] = context.flow_path[1]['parameters'][0]
+    assert isinstance(error, TaskCancelledError)
+
+
+def test_async_manager_enforces_policies():
+    flaky = FlakyTask('task one', failures=1)
+    flaky.policy = Policy(retries=1, backoff=0)
+    stuck = AsyncStuckTask('task two', 1)
+    stuck.policy = Policy(timeout=0.05, retries=1, backoff=0)
+    flaky.on_success(stuck)
+    stuck.on_failure(example_task.SuccessTask('task three'))
+
+    context = asyncio.run(AsyncManager(flaky).run())
+
+    assert flaky.calls == 2
+    assert names(context) == ['task one', 'task two', 'task three']
+    [error] = context.flow_path[2]['parameters'][0]
+    assert isinstance(error, TaskTimeoutError)
+
+
+def test_timeout_fails_the_task_whatever_retry_on_says():
+    task_one = StuckTask('task one', 1)
+    task_one.policy = Policy(timeout=0.05, retries=1, backoff=0,
+                             retry_on=(IOError,))
+    task_one.on_failure(example_task.SuccessTask('task two'))
+
+    for run in (Manager(task_one).run,
+                lambda: asyncio.run(AsyncManager(task_one).run())):
+        context = run()
+
+        assert names(context) == ['task one', 'task two']
+        [error] = context.flow_path[1]['parameters'][0]
+        assert isinstance(error, TaskTimeoutError)
+
+
+def test_async_cancel_interrupts_the_backoff():
+    task_one = FlakyTask('task one', failures=5)
+    task_one.policy = Policy(retries=3, backoff=2, jitter=0)
+    task_one.on_failure(example_task.SuccessTask('task two'))
+    manager = AsyncManager(task_one, instrumentation=CancelLater(0.1))
+
+    start = time.perf_counter()
+    context = asyncio.run(manager.run())
+
+    assert time.perf_counter() - start < 1
+    assert task_one.calls == 1
+    assert names(context) == ['task one', 'task two']
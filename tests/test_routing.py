@@ -0,0 +1,116 @@
+import example_task
+from example_task import names
+from workflow_manager import loader, serialization
+from workflow_manager.builder import FlowBuilder
+from workflow_manager.exceptions import InvalidWorkflowError
+from workflow_manager.manager import Manager
+from workflow_manager.plan import Plan
+import pytest
+
+
+def review_flow(outcome):
+    '''
+    task 1 -> success -> task 2
+    task 1 -> approve -> task 3, task 4
+    task 1 -> reject -> task 5
+    task 1 -> failure -> task 6
+    '''
+    task_one = example_task.OutcomeTask('task 1', outcome)
+    task_one.on_success(example_task.SuccessTask('task 2'))
+    task_one.on('approve', example_task.SuccessTask('task 3'),
+                example_task.SuccessTask('task 4'))
+    task_one.on('reject', example_task.FailureTask('task 5'))
+    task_one.on_failure(example_task.SuccessTask('task 6'))
+    return task_one
+
+
+def test_outcome_takes_its_route():
+    context = Manager(review_flow('approve')).run()
+
+    assert names(context) == ['task 1', 'task 3', 'task 4']
+    assert context.succeeded
+
+
+def test_failing_route_fails_the_run():
+    context = Manager(review_flow('reject')).run()
+
+    assert names(context) == ['task 1', 'task 5']
+    assert not context.succeeded
+
+
+def test_outcome_without_route_is_a_failure():
+    '''
+    Given:
+    task 1 returns an outcome without a route
+    Then:
+    the failure list runs, as for any result other than success
+    '''
+    context = Manager(review_flow('escalate')).run()
+
+    assert names(context) == ['task 1', 'task 6']
+    assert not context.succeeded
+
+
+def test_plan_dispatches_routes():
+    plan = Plan.compile(review_flow('approve'))
+
+    assert plan.names[1:] == ('task 2', 'task 6', 'task 3', 'task 4',
+                              'task 5')
+    assert plan.route(0, 'approve') == (3, 4)
+    assert plan.route(0, 'reject') == (5,)
+    assert plan.route(0, 'escalate') is None
+    assert sorted(plan.routed(0)) == [3, 4, 5]
+
+
+def test_route_back_to_the_start_is_a_cycle():
+    task_one = example_task.OutcomeTask('task 1')
+    task_two = example_task.SuccessTask('task 2')
+    task_one.on('approve', task_two)
+    task_two.on('again', task_one)
+
+    with pytest.raises(InvalidWorkflowError):
+        Manager(task_one)
+
+
+def test_routes_survive_serialization_and_loading():
+    task_one = review_flow('approve')
+    graph = serialization.to_graph(task_one)
+
+    assert graph['nodes'][0]['routes'] == {'approve': [3, 4],
+                                           'reject': [5]}
+    assert task_one.to_dict()['routes']['reject'][0]['name'] == 'task 5'
+    assert names(Manager(serialization.loads(
+        serialization.dumps(task_one))).run()) == [
+        'task 1', 'task 3', 'task 4']
+
+    plan = loader.load_definition({
+        'initial': 'task 1',
+        'tasks': {
+            'task 1': {'type': 'example_task:OutcomeTask',
+                       'routes': {'approve': ['task 2']}},
+            'task 2': {'type': 'example_task:SuccessTask'}}})
+    manager = Manager()
+    manager.register_plan(plan)
+    assert names(manager.run()) == ['task 1', 'task 2']
+
+
+def test_outcomes_must_be_strings_to_serialize():
+    task_one = example_task.OutcomeTask('task 1', 3)
+    task_one.on(3, example_task.SuccessTask('task 2'))
+
+    assert names(Manager(task_one).run()) == ['task 1', 'task 2']
+    with pytest.raises(InvalidWorkflowError):
+        serialization.to_graph(task_one)
+
+
+def test_builder_routes():
+    builder = FlowBuilder()
+    one = builder.add(example_task.OutcomeTask('task 1', 'reject'))
+    two = builder.add(example_task.SuccessTask('task 2'))
+    three = builder.add(example_task.SuccessTask('task 3'))
+    builder.on(one, 'approve', two)
+    builder.on(one, 'reject', three)
+    manager = Manager()
+    manager.register_plan(builder.compile())
+
+    assert names(manager.run()) == ['task 1', 'task 3']
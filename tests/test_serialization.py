@@ -0,0 +1,111 @@
+import io
+import json
+
+import example_task
+from workflow_manager import serialization
+from workflow_manager.exceptions import InvalidWorkflowError
+from workflow_manager.manager import Manager
+import pytest
+
+
+def diamonds(depth):
+    head = top = example_task.SuccessTask('top 0')
+    for index in range(depth):
+        left = example_task.SuccessTask('left %d' % index)
+        right = example_task.FailureTask('right %d' % index)
+        bottom = example_task.SuccessTask('top %d' % (index + 1))
+        top.on_success(left, right, parallel=True)
+        left.on_success(bottom)
+        right.on_failure(bottom)
+        top = bottom
+    return head
+
+
+def test_to_graph_lists_shared_tasks_once():
+    '''
+    Given:
+    task 1 -> success -> task 2, task 3
+    task 2 -> success -> task 4
+    task 3 -> failure -> task 4
+    '''
+    task_one = example_task.SuccessTask('task 1')
+    task_two = example_task.SuccessTask('task 2')
+    task_three = example_task.FailureTask('task 3')
+    task_four = example_task.SuccessTask('task 4')
+    task_one.on_success(task_two, task_three)
+    task_two.on_success(task_four)
+    task_three.on_failure(task_four)
+
+    assert task_one.to_graph() == {
+        'format': 'workflow-graph',
+        'version': 1,
+        'nodes': [
+            {'name': 'task 1', 'type': 'example_task:SuccessTask'},
+            {'name': 'task 2', 'type': 'example_task:SuccessTask'},
+            {'name': 'task 3', 'type': 'example_task:FailureTask'},
+            {'name': 'task 4', 'type': 'example_task:SuccessTask'}
+        ],
+        'success': [[1, 2], [3], [], []],
+        'failure': [[], [], [3], []]
+    }
+
+
+def test_graph_grows_linearly():
+    small = serialization.dumps(diamonds(10))
+    large = serialization.dumps(diamonds(20))
+
+    assert len(large) < 2.5 * len(small)
+    assert len(str(diamonds(10))) > 10 * len(small)
+
+
+def test_dump_streams_the_graph():
+    head = diamonds(3)
+    output = io.StringIO()
+
+    serialization.dump(Manager(head).compile(), output)
+
+    assert json.loads(output.getvalue()) == head.to_graph()
+
+
+def test_round_trip():
+    head = diamonds(5)
+
+    loaded = serialization.loads(serialization.dumps(head))
+
+    assert loaded is not head
+    assert loaded.to_dict() == head.to_dict()
+    assert loaded.to_graph() == head.to_graph()
+    assert isinstance(loaded.success_flow()[1], example_task.FailureTask)
+    assert loaded.parallel_success
+
+
+def test_load_with_factory():
+    made = []
+
+    def factory(name, task_type):
+        made.append((name, task_type))
+        return example_task.SuccessTask(name.upper())
+
+    head = example_task.SuccessTask('task 1')
+    head.on_failure(example_task.FailureTask('task 2'))
+
+    loaded = serialization.loads(serialization.dumps(head), factory)
+
+    assert made == [('task 1', 'example_task:SuccessTask'),
+                    ('task 2', 'example_task:FailureTask')]
+    assert loaded.failure_flow()[0].name == 'TASK 2'
+
+
+def test_load_rejects_bad_graphs():
+    graph = diamonds(1).to_graph()
+    graph['success'][0].append(42)
+    with pytest.raises(InvalidWorkflowError):
+        serialization.from_graph(graph)
+
+    graph = diamonds(1).to_graph()
+    graph['nodes'][0]['type'] = 'example_task:MissingTask'
+    with pytest.raises(InvalidWorkflowError):
+        serialization.from_graph(graph)
+
+    with pytest.raises(InvalidWorkflowError):
+        serialization.from_graph({'format': 'something else'})
@@ -21,3 +21,16 @@ def test_to_string():
     assert str(Task('task 1')) == '{"name": "task 1", ' \
                                   '"success_flow": [], ' \
                                   '"failure_flow": []}'
+
+
+def test_flows_are_shared_immutable_views():
+    task_one = example_task.SuccessTask('task 1')
+    task_two = example_task.SuccessTask('task 2')
+    task_three = example_task.FailureTask('task 3')
+    task_one.on_success(task_two)
+    task_one.on_failure(task_three)
+
+    assert task_one.success_flow() == (task_two,)
+    assert task_one.success_flow()[0] is task_two
+    assert task_one.failure_flow()[0] is task_three
+    assert task_one.success_flow() is task_one.success_flow()
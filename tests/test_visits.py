@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+
+import example_task
+from example_task import names
+from workflow_manager.async_manager import AsyncManager
+from workflow_manager.exceptions import WorkflowError
+from workflow_manager.manager import (ALWAYS, ONCE_PER_PATH, ONCE_PER_RUN,
+                                      Manager)
+from workflow_manager.task import Task
+
+
+def shared_cleanup():
+    '''
+    task 1 -> success -> task 2, task 3, cleanup
+    task 2 -> success -> cleanup
+    task 3 -> success -> cleanup
+    '''
+    task_one = example_task.SuccessTask('task 1')
+    task_two = example_task.SuccessTask('task 2')
+    task_three = example_task.SuccessTask('task 3')
+    cleanup = example_task.SuccessTask('cleanup')
+    task_one.on_success(task_two, task_three, cleanup)
+    task_two.on_success(cleanup)
+    task_three.on_success(cleanup)
+    return task_one
+
+
+@pytest.mark.parametrize('visits, expected', [
+    (None, ['task 1', 'task 2', 'cleanup', 'task 3', 'cleanup']),
+    (ONCE_PER_RUN, ['task 1', 'task 2', 'cleanup', 'task 3']),
+    (ONCE_PER_PATH, ['task 1', 'task 2', 'cleanup', 'task 3']),
+    (ALWAYS, ['task 1', 'task 2', 'cleanup', 'task 3', 'cleanup',
+              'cleanup'])])
+def test_visit_policies(visits, expected):
+    manager = (Manager(shared_cleanup()) if visits is None else
+               Manager(shared_cleanup(), visits=visits))
+
+    assert names(manager.run()) == expected
+
+
+def test_parallel_branches_are_paths_of_their_own():
+    '''
+    Given:
+    task 1 -> success (parallel) -> task 2, task 3
+    task 2 -> success -> cleanup
+    task 3 -> success -> cleanup
+    Then:
+    once per run cleanup runs in one branch only, once per path in both
+    '''
+    def build():
+        task_one = example_task.SuccessTask('task 1')
+        task_two = example_task.SuccessTask('task 2')
+        task_three = example_task.SuccessTask('task 3')
+        cleanup = example_task.SuccessTask('cleanup')
+        task_one.on_success(task_two, task_three, parallel=True)
+        task_two.on_success(cleanup)
+        task_three.on_success(cleanup)
+        task_one.on_failure(cleanup)
+        return task_one
+
+    per_run = names(Manager(build(), visits=ONCE_PER_RUN).run())
+    per_path = names(Manager(build(), visits=ONCE_PER_PATH).run())
+    async_per_path = names(asyncio.run(
+        AsyncManager(build(), visits=ONCE_PER_PATH).run()))
+
+    assert sorted(per_run) == ['cleanup', 'task 1', 'task 2', 'task 3']
+    assert per_path == async_per_path == [
+        'task 1', 'task 2', 'cleanup', 'task 3', 'cleanup']
+
+
+class GeneratingTask(example_task.SuccessTask):
+    ''' Generates the same shared task object twice. '''
+
+    def __init__(self, name, shared):
+        super().__init__(name)
+        self._shared = shared
+
+    def generate_success(self, **kwargs):
+        yield self._shared
+        yield example_task.SuccessTask('between')
+        yield self._shared
+
+
+def test_generated_tasks_are_indexed_by_identity():
+    shared = example_task.SuccessTask('shared')
+    other = example_task.SuccessTask('shared')
+    task_one = GeneratingTask('task 1', shared)
+
+    assert names(Manager(task_one, visits=ONCE_PER_RUN).run()) == [
+        'task 1', 'shared', 'between']
+
+    task_one = GeneratingTask('task 1', other)
+    task_one.on_success(shared)
+    assert names(Manager(task_one, visits=ONCE_PER_RUN).run()) == [
+        'task 1', 'shared', 'shared', 'between']
+
+
+def test_consecutive_tells_tasks_sharing_a_name_apart():
+    '''
+    Given:
+    task 1 -> success -> x
+    task 1 generates another task named x
+    Then:
+    both x run, since they are distinct tasks
+    '''
+    task_one = GeneratingTask('task 1', example_task.SuccessTask('x'))
+    task_one.on_success(example_task.SuccessTask('x'))
+
+    assert names(Manager(task_one).run()) == [
+        'task 1', 'x', 'x', 'between', 'x']
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(WorkflowError):
+        Manager(visits='sometimes')
+
+
+class CountingTask(Task):
+    calls = 0
+
+    def execute(self, **kwargs):
+        CountingTask.calls += 1
+        return Task.success_state(),
+
+
+def test_heavily_shared_node_executes_once():
+    '''
+    Given:
+    a chain of 500 tasks, every one with the same task on success
+    Then:
+    once per run the shared task executes once, always 500 times
+    '''
+    shared = CountingTask('shared')
+    tasks = [example_task.SuccessTask('task %d' % index)
+             for index in range(500)]
+    for task, successor in zip(tasks, tasks[1:]):
+        task.on_success(shared, successor)
+    tasks[-1].on_success(shared)
+
+    CountingTask.calls = 0
+    Manager(tasks[0], visits=ONCE_PER_RUN).run()
+    assert CountingTask.calls == 1
+
+    CountingTask.calls = 0
+    Manager(tasks[0], visits=ALWAYS).run()
+    assert CountingTask.calls == 500
@@ -440,3 +440,82 @@ def test_workflow_walking_through_short_circuit_fail():
         {'name': 'task 6', 'parameters': (
             ['failure message from ', 'task 2'],)}
         ]
+
+
+def test_workflow_executes_registered_tasks_not_copies():
+    '''
+    Given:
+    task 1 -> success -> task 2
+    task 2 -> success -> task 3
+
+    When:
+    the workflow runs
+
+    Then the task objects that were registered are the ones executed
+    '''
+    executed = []
+
+    class RecordingTask(example_task.SuccessTask):
+
+        def execute(self, **kwargs):
+            executed.append(self)
+            return super().execute(**kwargs)
+
+    task_one = RecordingTask('task 1')
+    task_two = RecordingTask('task 2')
+    task_three = RecordingTask('task 3')
+    task_one.on_success(task_two)
+    task_two.on_success(task_three)
+
+    Manager(task_one).run()
+
+    assert executed == [task_one, task_two, task_three]
+
+
+def test_workflow_runs_every_failure_handler_even_if_one_fails():
+    '''
+    Given:
+    task 1 -> failure -> task 2, task 3
+    task 2 -> failure -> task 4
+
+    When:
+    task 1 fails
+    task 2 fails
+
+    Then workflow is:
+    task 1 -> task 2 -> task 4 -> task 3
+    '''
+    task_one = example_task.FailureTask('task 1')
+    task_two = example_task.FailureTask('task 2')
+    task_three = example_task.SuccessTask('task 3')
+    task_four = example_task.SuccessTask('task 4')
+    task_one.on_failure(task_two, task_three)
+    task_two.on_failure(task_four)
+
+    manager = Manager(task_one)
+    manager.run()
+
+    assert [step['name'] for step in manager.show_executed_flow()] == [
+        'task 1', 'task 2', 'task 4', 'task 3']
+
+
+def test_workflow_with_deep_chain_does_not_recurse():
+    '''
+    Given:
+    a chain of 100000 tasks, each calling the next on success
+
+    Then every task runs, well past the Python recursion limit
+    '''
+    length = 100000
+    head = previous = example_task.SuccessTask('task 0')
+    for index in range(1, length):
+        current = example_task.SuccessTask('task %d' % index)
+        previous.on_success(current)
+        previous = current
+
+    manager = Manager(head)
+    manager.run()
+
+    flow = manager.show_executed_flow()
+    assert len(flow) == length
+    assert flow[-1]['name'] == 'task %d' % (length - 1)
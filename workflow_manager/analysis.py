@@ -0,0 +1,236 @@
+'''Where the time of a workflow goes, before running it.
+
+analyze() combines the graph of a flow with how long each task usually
+takes (seconds by task name, e.g. mean_durations of earlier runs'
+metrics) and estimates:
+
+critical_path      the chain of tasks, each one started by the one
+                   before it, that takes the longest when every task
+                   succeeds; no scheduling can make a run faster
+success_latency    time of a run in which every task succeeds, with the
+                   success lists as they are declared: one after another
+                   unless registered with parallel=True.  A task with
+                   routed outcomes (Task.on) takes its slowest route.
+failure_latency    time of a run in which the initial task fails
+worst_failure_latency
+                   time of the slowest run in which some task fails
+width              most tasks that run at the same time
+suggestions        sequential success lists whose branches could run in
+                   parallel, with the time that would save, most first
+
+A success list is suggested when none of its branches shares a task
+with anything else (every task in them has a single predecessor) and
+none of them uses the run's context, so the branches can not depend on
+each other through the graph.  Running them in parallel also runs every
+branch when an earlier one fails, which a sequential list would short
+circuit.
+
+Everything is computed in one pass over the compiled plan in reverse
+topological order, in time linear in the number of tasks and edges.
+Tasks shared by several paths are counted on every path, as they run on
+each.
+
+Example:
+
+manager = Manager(task, instrumentation=TimingInstrumentation())
+metrics = [manager.run().metrics for _ in range(100)]
+report = analyze(task, mean_durations(metrics))
+report.critical_path
+report.suggestions
+'''
+from array import array
+from collections import defaultdict
+import heapq
+
+from workflow_manager.plan import Plan
+
+
+class Suggestion(object):
+    ''' A success list that could run its branches in parallel. '''
+
+    __slots__ = ('name', 'branches', 'sequential', 'parallel')
+
+    def __init__(self, name, branches, sequential, parallel):
+        self.name = name
+        self.branches = branches
+        # estimated seconds of the list as declared and in parallel
+        self.sequential = sequential
+        self.parallel = parallel
+
+    @property
+    def saving(self):
+        return self.sequential - self.parallel
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'branches': list(self.branches),
+            'sequential': self.sequential,
+            'parallel': self.parallel,
+            'saving': self.saving
+            }
+
+
+class Analysis(object):
+    ''' Estimates for a flow, see the module documentation. '''
+
+    def __init__(self, critical_path, critical_path_latency,
+                 success_latency, failure_latency, worst_failure_latency,
+                 width, suggestions):
+        self._critical_path = critical_path
+        self._critical_path_latency = critical_path_latency
+        self._success_latency = success_latency
+        self._failure_latency = failure_latency
+        self._worst_failure_latency = worst_failure_latency
+        self._width = width
+        self._suggestions = suggestions
+
+    @property
+    def critical_path(self):
+        ''' Names of the tasks on the critical path, first task first. '''
+        return self._critical_path
+
+    @property
+    def critical_path_latency(self):
+        return self._critical_path_latency
+
+    @property
+    def success_latency(self):
+        return self._success_latency
+
+    @property
+    def failure_latency(self):
+        return self._failure_latency
+
+    @property
+    def worst_failure_latency(self):
+        return self._worst_failure_latency
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def suggestions(self):
+        return self._suggestions
+
+    def to_dict(self):
+        return {
+            'critical_path': list(self._critical_path),
+            'critical_path_latency': self._critical_path_latency,
+            'success_latency': self._success_latency,
+            'failure_latency': self._failure_latency,
+            'worst_failure_latency': self._worst_failure_latency,
+            'width': self._width,
+            'suggestions': [suggestion.to_dict()
+                            for suggestion in self._suggestions]
+            }
+
+
+def mean_durations(metrics):
+    ''' Mean wall clock seconds of every task name in metrics, an
+    iterable of instrumentation.RunMetrics.
+    '''
+    totals = defaultdict(int)
+    counts = defaultdict(int)
+    for run in metrics:
+        for timing in run.timings:
+            totals[timing.name] += timing.wall_ns
+            counts[timing.name] += 1
+    return {name: totals[name] / counts[name] / 1e9 for name in totals}
+
+
+def analyze(flow, durations=None, default=0.0):
+    ''' Analysis of flow, an initial task or a compiled Plan.
+
+    durations maps task names to seconds; tasks missing from it take
+    default seconds.
+    '''
+    plan = flow if isinstance(flow, Plan) else Plan.compile(flow)
+    if plan.topological_order is None:
+        plan.validate()
+    durations = durations or {}
+    names = plan.names
+    count = len(plan)
+    duration = [durations.get(name, default) for name in names]
+    success_offsets = plan.success_offsets
+    success_targets = plan.success_targets
+    failure_offsets = plan.failure_offsets
+    failure_targets = plan.failure_targets
+
+    indegree = [0] * count
+    for targets in (success_targets, failure_targets, plan.route_targets):
+        for target in targets:
+            indegree[target] += 1
+
+    success = [0.0] * count
+    failure = [0.0] * count
+    worst = [0.0] * count
+    critical = [0.0] * count
+    critical_next = [-1] * count
+    width = [1] * count
+    # whether node and everything after it belongs to node's branch alone
+    exclusive = [False] * count
+    suggestions = []
+    for node in reversed(plan.topological_order):
+        children = success_targets[success_offsets[node]:
+                                   success_offsets[node + 1]]
+        handlers = failure_targets[failure_offsets[node]:
+                                   failure_offsets[node + 1]]
+        routed = plan.routed(node)
+        failure[node] = duration[node] + sum(success[handler]
+                                             for handler in handlers)
+        worst[node] = failure[node]
+        critical[node] = duration[node]
+        success[node] = duration[node]
+        if children and plan.parallel[node] and len(children) > 1:
+            slowest, second = heapq.nlargest(
+                2, (success[child] for child in children))
+            success[node] += slowest
+            # a failing branch still waits for the slowest other one
+            worst[node] = max(worst[node], duration[node] + max(
+                max(worst[child],
+                    second if success[child] == slowest else slowest)
+                for child in children))
+            width[node] = sum(width[child] for child in children)
+            sequential = ()
+        else:
+            sequential = (children,) if children else ()
+        if routed:
+            # a routed outcome takes its list instead of the success list
+            sequential += tuple(plan.route(node, outcome)
+                                for outcome in plan.routes[node])
+        for targets in sequential:
+            elapsed = 0.0
+            for child in targets:
+                worst[node] = max(worst[node], duration[node] + elapsed +
+                                  worst[child])
+                elapsed += success[child]
+            success[node] = max(success[node], duration[node] + elapsed)
+            if targets:
+                width[node] = max(width[node],
+                                  max(width[child] for child in targets))
+            if (targets is children and len(children) > 1 and
+                    all(exclusive[child] for child in children)):
+                suggestions.append(Suggestion(
+                    names[node], tuple(names[child] for child in children),
+                    elapsed, max(success[child] for child in children)))
+        if children or routed:
+            longest = max(children + array('l', routed),
+                          key=critical.__getitem__)
+            critical[node] += critical[longest]
+            critical_next[node] = longest
+        exclusive[node] = (indegree[node] == 1 and
+                           not plan.pass_context[node] and
+                           all(exclusive[child] for child in children) and
+                           all(exclusive[handler] for handler in handlers) and
+                           all(exclusive[child] for child in routed))
+
+    path = []
+    node = 0
+    while node != -1:
+        path.append(names[node])
+        node = critical_next[node]
+    suggestions.sort(key=lambda suggestion: -suggestion.saving)
+    return Analysis(path, critical[0], success[0], failure[0], worst[0],
+                    width[0], suggestions)
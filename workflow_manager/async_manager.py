@@ -0,0 +1,198 @@
+'''Manager that runs the workflow on an asyncio event loop.
+
+Tasks may define execute as a coroutine (async def execute); those are
+awaited directly.  Plain synchronous tasks keep working: they are run on
+the manager's thread pool so they never block the event loop.  Parallel
+success lists are joined with asyncio.gather.
+
+Example:
+
+class FetchTask(Task):
+
+    async def execute(self, **kwargs):
+        body = await http.get(URL)
+        return Task.success_state(), body
+
+
+manager = AsyncManager(fetch_task)
+await manager.run()
+'''
+import asyncio
+import functools
+import time
+from workflow_manager.context import RunStats, SubflowContext
+from workflow_manager.exceptions import TaskCancelledError, TaskTimeoutError
+from workflow_manager.manager import Manager, _join
+from workflow_manager.task import Task
+
+
+class AsyncManager(Manager):
+
+    async def run(self, **inputs):
+        ''' Run the flow, awaiting every task.
+
+        Same execution algorithm and return value as Manager.run.
+        '''
+        return await self._run(*self._start_run(inputs))
+
+    async def resume(self, run_id):
+        ''' Continue the run run_id from its last checkpoint.
+
+        Same as Manager.resume.
+        '''
+        return await self._run(*self._resume_run(run_id))
+
+    async def run_many(self, inputs, workers=None):
+        ''' Run one instance of the flow for every item of inputs.
+
+        Same as Manager.run_many, with at most workers instances in
+        flight on the event loop at a time (unbounded by default).
+        '''
+        inputs = list(inputs)
+        if workers is None:
+            workers = max(1, len(inputs))
+        semaphore = asyncio.Semaphore(workers)
+
+        async def work(kwargs):
+            async with semaphore:
+                return await self.run(**kwargs)
+
+        self._current_plan()
+        start = time.perf_counter()
+        runs = await asyncio.gather(*[work(kwargs) for kwargs in inputs])
+        return RunStats(runs, time.perf_counter() - start, start)
+
+    async def _run(self, context, trace):
+        try:
+            # default to success
+            result, params = await self._execute_run(
+                context, 0, Task.success_state(), (), context.history,
+                trace=trace)
+        except BaseException:
+            self._abort_run(context, trace)
+            raise
+        self._finish_run(context, result, params)
+        return context
+
+    async def _execute_task(self, plan, node, kwargs):
+        task = plan.tasks[node]
+        if plan.coroutines[node]:
+            return await task.execute(**kwargs)
+        if self._backend is not None and not plan.pass_context[node]:
+            return await asyncio.wrap_future(
+                self._backend.submit(task, kwargs))
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(), functools.partial(task.execute, **kwargs))
+
+    async def _execute_with_policy(self, context, node, kwargs,
+                                   task_policy):
+        ''' Same as Manager._execute_with_policy, on the event loop. '''
+        failure_state = Task.failure_state()
+        attempt = 0
+        while True:
+            try:
+                output = await self._attempt(context, node, kwargs,
+                                             task_policy.timeout)
+            except TaskCancelledError as error:
+                return failure_state, error
+            except TaskTimeoutError as error:
+                output = (failure_state, error)
+            except task_policy.retry_on as error:
+                output = (failure_state, error)
+            else:
+                if not (task_policy.retry_failures and
+                        output[0] == failure_state):
+                    return output
+            if attempt >= task_policy.retries or context.cancelled:
+                return output
+            if await self._cancelled_within(context,
+                                            task_policy.delay(attempt)):
+                return output
+            attempt += 1
+
+    async def _cancelled_within(self, context, delay):
+        ''' Wait delay seconds; True as soon as the run is cancelled. '''
+        cancelled = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        def cancel():
+            loop.call_soon_threadsafe(cancelled.set)
+
+        context.on_cancel(cancel)
+        try:
+            await asyncio.wait_for(cancelled.wait(), delay)
+        except asyncio.TimeoutError:
+            return context.cancelled
+        finally:
+            context.remove_on_cancel(cancel)
+        return True
+
+    async def _attempt(self, context, node, kwargs, timeout):
+        name = context.plan.names[node]
+        job = asyncio.ensure_future(
+            self._execute_task(context.plan, node, kwargs))
+        loop = asyncio.get_running_loop()
+
+        def cancel():
+            loop.call_soon_threadsafe(job.cancel)
+
+        context.on_cancel(cancel)
+        try:
+            return await asyncio.wait_for(job, timeout)
+        except asyncio.TimeoutError:
+            raise TaskTimeoutError('%r did not finish within %s seconds' % (
+                name, timeout))
+        except asyncio.CancelledError:
+            if not context.cancelled:
+                raise
+            raise TaskCancelledError(
+                'run %s was cancelled while %r executed' % (context.run_id,
+                                                            name))
+        finally:
+            context.remove_on_cancel(cancel)
+
+    async def _execute_parallel(self, context, branches, result, params,
+                                kwargs, parent, traces, visits, history):
+        paths = [history.branch() for _ in branches]
+        if traces is None:
+            traces = [None] * len(branches)
+        if visits is None:
+            visits = [None] * len(branches)
+        outcomes = await asyncio.gather(*[
+            self._execute_run(context, branch, result, (params,), path,
+                              kwargs, parent, trace, visited)
+            for branch, path, trace, visited in zip(branches, paths, traces,
+                                                    visits)])
+        for path in paths:
+            history.merge(path)
+        return _join(outcomes)
+
+    async def _execute_run(self, context, node, result, params, history,
+                           kwargs=None, parent=None, trace=None,
+                           visited=None):
+        plan = context.plan
+        policies = plan.policies
+        walk = self._walk(context, node, result, params, history, kwargs,
+                          parent, trace, visited)
+        try:
+            request = next(walk)
+            while True:
+                if request[0].__class__ is int:
+                    node, kwargs = request
+                    if policies[node] is not None:
+                        output = await self._execute_with_policy(
+                            context, node, kwargs, policies[node])
+                    else:
+                        output = await self._execute_task(plan, node, kwargs)
+                elif request[0].__class__ is SubflowContext:
+                    subflow, result, params = request[:3]
+                    output = await self._execute_run(
+                        subflow, 0, result, (params,), history,
+                        *request[3:])
+                else:
+                    output = await self._execute_parallel(
+                        context, *request, history)
+                request = walk.send(output)
+        except StopIteration as stop:
+            return stop.value
@@ -0,0 +1,187 @@
+'''Where the manager executes tasks.
+
+By default a Manager executes every task in its own process, so CPU
+bound workflows use a single core.  Given a backend, the manager keeps
+walking the flow itself (the order of tasks, short circuits and failure
+flows do not change) but hands every task to the backend and waits for
+its (result, *params) output.  Parallel success lists and run_many keep
+several tasks in flight at a time.
+
+A backend only has to provide submit(task, kwargs), returning a
+concurrent.futures.Future of the task's output.  QueueBackend does so
+over a pair of queues: it publishes jobs to one and reads outputs from
+the other, while workers on the far ends run work(jobs, results).  Any
+pair of objects with put and get carrying bytes fits, e.g. a wrapper
+around a socket; ProcessBackend uses multiprocessing queues and local
+worker processes.
+
+Tasks travel pickled, without their success and failure flows; their
+modules must be importable by the workers.  Changes a task makes to
+itself stay in the worker.  Tasks with pass_context = True always
+execute in the manager's process, as the run's context does not leave
+it.
+
+Example:
+
+with ProcessBackend(processes=4) as backend:
+    manager = Manager(task, backend=backend)
+    manager.run_many(inputs, workers=4)
+'''
+from concurrent.futures import Future
+import copy
+import itertools
+import multiprocessing
+import pickle
+import threading
+
+from workflow_manager.exceptions import WorkflowError
+
+
+class Backend(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, task, kwargs):
+        ''' Future of task.execute(**kwargs), executed by the backend. '''
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class RemoteTaskError(WorkflowError):
+    ''' A task failed in a worker with an error that could not be sent
+    back as it was.
+    '''
+
+
+class QueueBackend(Backend):
+
+    def __init__(self, jobs, results):
+        ''' Publish jobs to the jobs queue and read what the workers put
+        on the results queue.
+        '''
+        self._jobs = jobs
+        self._results = results
+        self._futures = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._reader = None
+
+    def submit(self, task, kwargs):
+        job_id = next(self._ids)
+        # pickle here rather than in the queue so that a task that can
+        # not be sent fails now, in the caller
+        job = pickle.dumps((job_id, _detached(task), kwargs),
+                           pickle.HIGHEST_PROTOCOL)
+        future = Future()
+        with self._lock:
+            self._futures[job_id] = future
+            if self._reader is None:
+                self._reader = threading.Thread(
+                    target=self._read, daemon=True,
+                    name='workflow-backend-reader')
+                self._reader.start()
+        self._jobs.put(job)
+        return future
+
+    def close(self):
+        ''' Stop reading outputs; pending futures are cancelled. '''
+        with self._lock:
+            reader = self._reader
+            self._reader = None
+        if reader is not None:
+            self._results.put(None)
+            reader.join()
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+
+    def _read(self):
+        while True:
+            message = self._results.get()
+            if message is None:
+                return
+            job_id, succeeded, value = pickle.loads(message)
+            with self._lock:
+                future = self._futures.pop(job_id, None)
+            if future is None:
+                continue
+            if succeeded:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+class ProcessBackend(QueueBackend):
+
+    def __init__(self, processes=None, context=None):
+        ''' Execute tasks on processes local worker processes, one per
+        CPU by default.
+
+        context is the multiprocessing context to start the workers
+        with, multiprocessing's default one if not given.
+        '''
+        context = context or multiprocessing.get_context()
+        super().__init__(context.Queue(), context.Queue())
+        self._processes = [
+            context.Process(target=work, args=(self._jobs, self._results),
+                            daemon=True, name='workflow-worker-%d' % index)
+            for index in range(processes or multiprocessing.cpu_count())]
+        for process in self._processes:
+            process.start()
+
+    def close(self):
+        ''' Stop the workers once they are done with the jobs sent. '''
+        for _ in self._processes:
+            self._jobs.put(None)
+        for process in self._processes:
+            process.join()
+        self._processes = []
+        super().close()
+
+
+def work(jobs, results):
+    ''' Worker loop: execute the jobs from the jobs queue and put their
+    outputs on the results queue, until a None job arrives.
+    '''
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        job_id, task, kwargs = pickle.loads(job)
+        try:
+            message = pickle.dumps((job_id, True, task.execute(**kwargs)),
+                                   pickle.HIGHEST_PROTOCOL)
+        except Exception as error:
+            message = _failure(job_id, task, error)
+        results.put(message)
+
+
+def _failure(job_id, task, error):
+    try:
+        message = pickle.dumps((job_id, False, error),
+                               pickle.HIGHEST_PROTOCOL)
+        # some exceptions pickle but can not be built again
+        pickle.loads(message)
+        return message
+    except Exception:
+        return pickle.dumps((job_id, False, RemoteTaskError(
+            'task %r failed: %r' % (task.name, error))))
+
+
+def _detached(task):
+    ''' Copy of task without its flows, so sending it does not send the
+    rest of the graph along.
+    '''
+    task = copy.copy(task)
+    task._success_tasks = ()
+    task._failure_tasks = ()
+    task._routes = None
+    task._graph = None
+    return task
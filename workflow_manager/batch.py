@@ -0,0 +1,216 @@
+'''Manager that moves a cohort of runs through the workflow together.
+
+Manager.run_many runs every instance on its own, executing each task
+once per instance.  BatchManager.run_batch starts a run for every item
+of its inputs and advances them side by side: whenever several runs
+wait on the same task, the task executes all of them with a single
+execute_batch call.  Each run then goes on with its own output, so the
+cohort splits into the runs that succeeded and those that failed, and
+every run walks exactly the flow Manager.run would walk for it, into a
+RunContext of its own.
+
+Of the tasks some run waits on, the one earliest in topological order
+executes next, so runs that fell behind catch up with the others
+before a task executes and batches stay as large as possible.  Tasks
+generated while a run goes on (Task.generate_success) belong to that
+run alone; they execute before the rest, without waiting for others.
+
+Tasks that override Task.execute_batch handle a batch at a time, e.g.
+with one database query or one NumPy operation for the whole cohort;
+others keep executing item by item.  Tasks with a policy execute item
+by item under it, and with a backend every item is submitted on its
+own, so the workers share the batch.  Instrumentation timings of a
+task include the time its run waited for the rest of the cohort.
+
+Example:
+
+class LookupTask(Task):
+
+    def execute_batch(self, batch):
+        rows = db.fetch_many([kwargs['user_id'] for kwargs in batch])
+        return [(Task.success_state(), row) if row else
+                (Task.failure_state(), 'no such user') for row in rows]
+
+
+manager = BatchManager(lookup_task)
+stats = manager.run_batch({'user_id': user_id} for user_id in user_ids)
+'''
+import heapq
+import itertools
+import time
+from workflow_manager.context import RunStats, SubflowContext
+from workflow_manager.exceptions import WorkflowError
+from workflow_manager.manager import Manager, _join
+from workflow_manager.task import Task
+
+
+class BatchManager(Manager):
+
+    def run_batch(self, inputs, batch_size=None):
+        ''' Run one instance of the flow for every item of inputs,
+        advancing all of them together.
+
+        Each item is a mapping of keyword arguments for the initial task.
+        A task executes at most batch_size runs per execute_batch call,
+        every run waiting on it by default.  Returns RunStats with the
+        RunContext of every instance, in the order of inputs.
+
+        An error raised by a task aborts every run of the cohort that
+        has not finished yet and is raised here.
+        '''
+        plan = self._current_plan()
+        if plan.topological_order is None:
+            plan.validate()
+        cohort = _Cohort(plan)
+        runs = []
+        try:
+            for kwargs in inputs:
+                context, trace = self._start_run(kwargs)
+                runs.append((context, trace))
+                self._advance(cohort, _Walk(
+                    self._walk(context, 0, Task.success_state(), (),
+                               context.history, trace=trace),
+                    context, context.history), None)
+            while cohort.ready:
+                key = heapq.heappop(cohort.ready)[2]
+                waiting = cohort.pending.pop(key)
+                outputs = self._execute_batch(*key, waiting, batch_size)
+                for (walk, _), output in zip(waiting, outputs):
+                    self._advance(cohort, walk, output)
+        except BaseException:
+            for context, trace in runs:
+                if context.elapsed is None:
+                    self._abort_run(context, trace)
+            raise
+        return RunStats([context for context, _ in runs],
+                        time.perf_counter() - cohort.start, cohort.start)
+
+    def _execute_batch(self, plan, node, waiting, batch_size):
+        ''' Outputs of node for every (walk, kwargs) waiting on it. '''
+        task = plan.tasks[node]
+        task_policy = plan.policies[node]
+        if task_policy is not None:
+            return [self._execute_with_policy(walk.context, node, kwargs,
+                                              task_policy)
+                    for walk, kwargs in waiting]
+        if self._backend is not None and not plan.pass_context[node]:
+            futures = [self._backend.submit(task, kwargs)
+                       for _, kwargs in waiting]
+            return [future.result() for future in futures]
+        size = batch_size or len(waiting)
+        outputs = []
+        for index in range(0, len(waiting), size):
+            batch = [kwargs for _, kwargs in waiting[index:index + size]]
+            batch_outputs = list(task.execute_batch(batch))
+            if len(batch_outputs) != len(batch):
+                raise WorkflowError(
+                    'execute_batch of %r returned %d outputs for %d '
+                    'items' % (task.name, len(batch_outputs), len(batch)))
+            outputs.extend(batch_outputs)
+        return outputs
+
+    def _advance(self, cohort, walk, output):
+        ''' Send output to walk and follow it until it waits on a task,
+        finishing its run or joining its parallel list on the way.
+        '''
+        while True:
+            try:
+                request = walk.steps.send(output)
+            except StopIteration as stop:
+                join = walk.join
+                if join is None:
+                    result, params = stop.value
+                    self._finish_run(walk.context, result, params)
+                    return
+                join.outcomes[walk.slot] = stop.value
+                join.remaining -= 1
+                if join.remaining:
+                    return
+                if join.paths is None:
+                    walk, output = join.parent, join.outcomes[0]
+                    continue
+                for path in join.paths:
+                    join.parent.history.merge(path)
+                walk, output = join.parent, _join(join.outcomes)
+                continue
+            if request[0].__class__ is int:
+                node, kwargs = request
+                plan = walk.context.plan
+                key = (plan, node)
+                waiting = cohort.pending.get(key)
+                if waiting is None:
+                    waiting = cohort.pending[key] = []
+                    rank = (cohort.rank[node] if plan is cohort.plan
+                            else -1)
+                    heapq.heappush(cohort.ready,
+                                   (rank, next(cohort.sequence), key))
+                waiting.append((walk, kwargs))
+                return
+            if request[0].__class__ is SubflowContext:
+                # a generated task: walk its flow in the run's history
+                subflow, result, params, kwargs, token, trace = request[:6]
+                self._advance(cohort, _Walk(
+                    self._walk(subflow, 0, result, (params,), walk.history,
+                               kwargs, token, trace, request[6]),
+                    subflow, walk.history, _Join(walk), 0), None)
+                return
+            # a parallel success list: every branch walks on its own and
+            # the list resumes once the last one is done
+            branches, result, params, kwargs, token, traces, visits = request
+            if traces is None:
+                traces = [None] * len(branches)
+            if visits is None:
+                visits = [None] * len(branches)
+            join = _Join(walk, [walk.history.branch() for _ in branches])
+            for slot, (branch, path, trace, visited) in enumerate(
+                    zip(branches, join.paths, traces, visits)):
+                self._advance(cohort, _Walk(
+                    self._walk(walk.context, branch, result, (params,), path,
+                               kwargs, token, trace, visited),
+                    walk.context, path, join, slot), None)
+            return
+
+
+class _Cohort(object):
+
+    __slots__ = ('plan', 'rank', 'pending', 'ready', 'sequence', 'start')
+
+    def __init__(self, plan):
+        self.plan = plan
+        self.rank = [0] * len(plan)
+        for position, node in enumerate(plan.topological_order):
+            self.rank[node] = position
+        # (plan, node id) -> [(walk, kwargs)] of the runs waiting on it
+        self.pending = {}
+        # heap of (topological rank, sequence, (plan, node id)) of the
+        # pending nodes; nodes of generated flows rank first
+        self.ready = []
+        self.sequence = itertools.count()
+        self.start = time.perf_counter()
+
+
+class _Walk(object):
+    ''' The walk of one run, or of one branch of a parallel list. '''
+
+    __slots__ = ('steps', 'context', 'history', 'join', 'slot')
+
+    def __init__(self, steps, context, history, join=None, slot=None):
+        self.steps = steps
+        self.context = context
+        self.history = history
+        self.join = join
+        self.slot = slot
+
+
+class _Join(object):
+    ''' Branches of a parallel list, or the flow of a generated task
+    (paths is None), still walking.
+    '''
+
+    __slots__ = ('parent', 'paths', 'outcomes', 'remaining')
+
+    def __init__(self, parent, paths=None):
+        self.parent = parent
+        self.paths = paths
+        self.outcomes = [None] * (1 if paths is None else len(paths))
+        self.remaining = len(self.outcomes)
@@ -0,0 +1,128 @@
+'''Build very large workflows without wiring tasks together.
+
+Task.on_success and on_failure keep a tuple of successors on every
+task.  FlowBuilder keeps the structure of the whole graph in a few
+arrays of node ids instead and compiles it straight into a Plan, so a
+graph of many thousand tasks costs little more than the tasks
+themselves.  Combined with task classes that declare __slots__, this
+holds a graph in a fraction of the memory of wired tasks.
+
+Tasks added to a builder are not wired: their success_flow and
+failure_flow stay empty, so to_dict and show_flow do not show the
+structure.  Use serialization.to_graph on the plan instead.
+
+Example:
+
+builder = FlowBuilder()
+start = builder.add(StartTask('start'))
+steps = [builder.add(StepTask('step %d' % n)) for n in range(50000)]
+builder.on_success(start, *steps)
+builder.on_failure(start, builder.add(CleanupTask('cleanup')))
+
+manager = Manager()
+manager.register_plan(builder.compile())
+'''
+from array import array
+
+from workflow_manager.exceptions import InvalidWorkflowError
+from workflow_manager.plan import Plan, _flatten_routes
+from workflow_manager.task import Task
+
+
+class FlowBuilder(object):
+
+    def __init__(self):
+        self._tasks = []
+        self._parallel = bytearray()
+        # one (source, target) pair of node ids per edge, in the order
+        # the edges were added
+        self._success_edges = array('l')
+        self._failure_edges = array('l')
+        # node id -> {outcome: [node ids]}, for the few nodes with routes
+        self._routes = {}
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def add(self, task):
+        ''' Add task and return its node id; the first task added is the
+        initial task of the flow.
+        '''
+        if not isinstance(task, Task):
+            raise InvalidWorkflowError('%r is not a Task' % (task,))
+        self._tasks.append(task)
+        self._parallel.append(0)
+        return len(self._tasks) - 1
+
+    def on_success(self, node, *nodes, parallel=False):
+        ''' Run nodes, in order, when node succeeds.  See Task.on_success.
+        '''
+        self._add_edges(self._success_edges, node, nodes)
+        if parallel:
+            self._parallel[node] = 1
+
+    def on_failure(self, node, *nodes):
+        ''' Run nodes, in order, when node fails. '''
+        self._add_edges(self._failure_edges, node, nodes)
+
+    def on(self, node, outcome, *nodes):
+        ''' Run nodes, in order, when node returns outcome.  See Task.on.
+        '''
+        if outcome == Task.success_state():
+            return self.on_success(node, *nodes)
+        if outcome == Task.failure_state():
+            return self.on_failure(node, *nodes)
+        self._check_nodes((node,) + nodes)
+        self._routes.setdefault(node, {}).setdefault(outcome, []).extend(
+            nodes)
+
+    def compile(self):
+        ''' Validated Plan of the flow built so far.
+
+        Raises InvalidWorkflowError, as Plan.compile does, for a graph
+        that can not run.
+        '''
+        if not self._tasks:
+            raise InvalidWorkflowError('no initial task added')
+        count = len(self._tasks)
+        success_offsets, success_targets = _csr(self._success_edges, count)
+        failure_offsets, failure_targets = _csr(self._failure_edges, count)
+        routes = route_targets = None
+        if self._routes:
+            routes, route_targets = _flatten_routes(
+                [self._routes.get(node) for node in range(count)])
+        plan = Plan(self._tasks, success_offsets, success_targets,
+                    failure_offsets, failure_targets, routes=routes,
+                    route_targets=route_targets, parallel=self._parallel)
+        plan.validate()
+        return plan
+
+    def _check_nodes(self, nodes):
+        count = len(self._tasks)
+        for node in nodes:
+            if not 0 <= node < count:
+                raise InvalidWorkflowError('no node %r' % (node,))
+
+    def _add_edges(self, edges, node, nodes):
+        self._check_nodes((node,) + nodes)
+        for target in nodes:
+            edges.append(node)
+            edges.append(target)
+
+
+def _csr(edges, count):
+    ''' Offsets and targets of the (source, target) pairs in edges,
+    keeping the order of the edges of every source.
+    '''
+    offsets = array('l', [0]) * (count + 1)
+    for index in range(0, len(edges), 2):
+        offsets[edges[index] + 1] += 1
+    for node in range(count):
+        offsets[node + 1] += offsets[node]
+    targets = array('l', [0]) * (len(edges) // 2)
+    position = array('l', offsets)
+    for index in range(0, len(edges), 2):
+        source = edges[index]
+        targets[position[source]] = edges[index + 1]
+        position[source] += 1
+    return offsets, targets
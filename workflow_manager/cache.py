@@ -0,0 +1,79 @@
+'''Result cache for memoized tasks.
+
+Tasks that set memoize = True execute once per run: later visits reuse
+the recorded output.  Giving the manager a ResultCache extends that to
+repeated runs, bounded by size (least recently used entries go first)
+and by age.
+
+Example:
+
+class LookupTask(Task):
+    memoize = True
+
+    def memo_key(self, kwargs):
+        return kwargs['user']
+
+
+manager = Manager(lookup_task, result_cache=ResultCache(1000, ttl=60))
+'''
+from collections import OrderedDict
+import threading
+import time
+
+
+MISSING = object()
+
+
+class ResultCache(object):
+
+    def __init__(self, maxsize=None, ttl=None, clock=time.monotonic):
+        ''' Keep at most maxsize results, each for at most ttl seconds.
+
+        Both limits are optional; without them the cache only grows.
+        '''
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires is None or expires > self._clock():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+            self._misses += 1
+            return default
+
+    def put(self, key, value):
+        expires = None
+        if self._ttl is not None:
+            expires = self._clock() + self._ttl
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            if self._maxsize is not None:
+                while len(self._entries) > self._maxsize:
+                    self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,422 @@
+'''Checkpoints of running workflows.
+
+A manager given a Checkpointer records the output of every task a run
+executes and keeps a checkpoint of the run in a CheckpointStore.  If the
+worker dies half way, Manager.resume(run_id) continues the run from its
+last checkpoint, in this or any other process sharing the store: tasks
+that already executed are not executed again.
+
+A checkpoint holds the run's inputs and the outputs the run received,
+in the order the walk asked for them (a parallel success list holds
+the outputs of each of its branches), and context.data as every task
+with pass_context = True left it.  The walk is deterministic given
+those outputs, so replaying them restores the exact position in every
+success and failure list, the sticky failure result and the parameters
+the next task gets.  Tasks that execute after the last checkpoint was
+written execute again when the run is resumed.
+
+Checkpoints are written by a background thread every interval seconds,
+so a run never waits for the store; a run that finishes removes its
+checkpoint.  A checkpoint is a log: the first write saves the run's
+inputs, every later one appends the outputs recorded since the one
+before, so writing costs the same however long the run already is.
+Outputs and inputs are pickled; only resume checkpoints from a store
+you trust.
+
+Example:
+
+checkpointer = Checkpointer(SQLiteStore('/var/lib/workflows/runs.db'))
+manager = Manager(task, checkpointer=checkpointer)
+
+for run_id in checkpointer.pending():
+    manager.resume(run_id)
+'''
+import io
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+
+from workflow_manager.cache import MISSING
+from workflow_manager.exceptions import WorkflowError
+
+
+CHECKPOINT_VERSION = 2
+
+# kinds of the records a checkpoint logs after its header
+_OUTPUT = 0
+_BRANCHES = 1
+_DATA = 2
+
+
+class CheckpointStore(object):
+    ''' Keeps the serialized checkpoint of every unfinished run. '''
+
+    def save(self, run_id, data):
+        raise NotImplementedError
+
+    def append(self, run_id, data):
+        ''' Add data to the end of what is saved for run_id.
+
+        The default loads and saves everything again; stores override it
+        to write data alone.
+        '''
+        self.save(run_id, (self.load(run_id) or b'') + data)
+
+    def load(self, run_id):
+        ''' Checkpoint saved for run_id, None if there is none. '''
+        raise NotImplementedError
+
+    def delete(self, run_id):
+        raise NotImplementedError
+
+    def run_ids(self):
+        ''' Ids of every run with a checkpoint. '''
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemoryStore(CheckpointStore):
+    ''' Checkpoints in a dictionary, for tests and single processes. '''
+
+    def __init__(self):
+        self._checkpoints = {}
+        self._lock = threading.Lock()
+
+    def save(self, run_id, data):
+        with self._lock:
+            self._checkpoints[run_id] = [data]
+
+    def append(self, run_id, data):
+        with self._lock:
+            self._checkpoints.setdefault(run_id, []).append(data)
+
+    def load(self, run_id):
+        with self._lock:
+            chunks = self._checkpoints.get(run_id)
+            return None if chunks is None else b''.join(chunks)
+
+    def delete(self, run_id):
+        with self._lock:
+            self._checkpoints.pop(run_id, None)
+
+    def run_ids(self):
+        with self._lock:
+            return list(self._checkpoints)
+
+
+class FileStore(CheckpointStore):
+    ''' One file per run in directory. '''
+
+    suffix = '.checkpoint'
+
+    def __init__(self, directory):
+        self._directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, run_id):
+        return os.path.join(self._directory, run_id + self.suffix)
+
+    def save(self, run_id, data):
+        # write to a temporary file first so a crash while writing never
+        # leaves a half written checkpoint behind
+        descriptor, temporary = tempfile.mkstemp(dir=self._directory,
+                                                 suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as output:
+                output.write(data)
+            os.replace(temporary, self._path(run_id))
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def append(self, run_id, data):
+        with open(self._path(run_id), 'ab') as output:
+            output.write(data)
+
+    def load(self, run_id):
+        try:
+            with open(self._path(run_id), 'rb') as source:
+                return source.read()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, run_id):
+        try:
+            os.unlink(self._path(run_id))
+        except FileNotFoundError:
+            pass
+
+    def run_ids(self):
+        return [name[:-len(self.suffix)]
+                for name in os.listdir(self._directory)
+                if name.endswith(self.suffix)]
+
+
+class SQLiteStore(CheckpointStore):
+    ''' Checkpoints in a table of the SQLite database at path; what is
+    appended to them goes to rows of a second table.
+    '''
+
+    def __init__(self, path):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS checkpoints '
+                '(run_id TEXT PRIMARY KEY, data BLOB NOT NULL)')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS checkpoint_appends '
+                '(run_id TEXT NOT NULL, data BLOB NOT NULL)')
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS checkpoint_appends_run_id '
+                'ON checkpoint_appends (run_id)')
+
+    def save(self, run_id, data):
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO checkpoints VALUES (?, ?)',
+                (run_id, data))
+            self._connection.execute(
+                'DELETE FROM checkpoint_appends WHERE run_id = ?', (run_id,))
+
+    def append(self, run_id, data):
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR IGNORE INTO checkpoints VALUES (?, ?)',
+                (run_id, b''))
+            self._connection.execute(
+                'INSERT INTO checkpoint_appends VALUES (?, ?)',
+                (run_id, data))
+
+    def load(self, run_id):
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT data FROM checkpoints WHERE run_id = ?',
+                (run_id,)).fetchone()
+            if row is None:
+                return None
+            appended = self._connection.execute(
+                'SELECT data FROM checkpoint_appends WHERE run_id = ? '
+                'ORDER BY rowid', (run_id,)).fetchall()
+        return b''.join([row[0]] + [data for data, in appended])
+
+    def delete(self, run_id):
+        with self._lock, self._connection:
+            self._connection.execute(
+                'DELETE FROM checkpoints WHERE run_id = ?', (run_id,))
+            self._connection.execute(
+                'DELETE FROM checkpoint_appends WHERE run_id = ?', (run_id,))
+
+    def run_ids(self):
+        with self._lock:
+            return [row[0] for row in self._connection.execute(
+                'SELECT run_id FROM checkpoints')]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class Trace(object):
+    ''' Outputs one walk received, replayed first and recorded after.
+
+    Every entry is the output of a task or, for a parallel success
+    list, a list with the entries of each branch.  key tells the walk
+    apart from the others of its run: () for the run's own walk, the
+    key of the parent walk plus (position, branch) for a branch.
+    '''
+
+    def __init__(self, checkpointer, run_id, entries, key=()):
+        self._checkpointer = checkpointer
+        self._run_id = run_id
+        self._entries = entries
+        self._key = key
+        self._position = 0
+
+    def replay(self):
+        ''' Next recorded entry, MISSING once the recording ran out. '''
+        if self._position < len(self._entries):
+            self._position += 1
+            return self._entries[self._position - 1]
+        return MISSING
+
+    def record(self, entry):
+        self._checkpointer._record(self._run_id,
+                                   (_OUTPUT, self._key, entry))
+        self._position += 1
+
+    def record_data(self, data):
+        ''' Record the run's context.data as it is now; it is pickled
+        right away, so later changes are not part of this record.
+        '''
+        self._checkpointer._record(self._run_id, (
+            _DATA, None, pickle.dumps(data, pickle.HIGHEST_PROTOCOL)))
+
+    def branch(self, count):
+        ''' Traces of the count branches of a parallel success list. '''
+        position = self._position
+        entry = self.replay()
+        if entry is MISSING:
+            entry = [[] for _ in range(count)]
+            self._checkpointer._record(self._run_id,
+                                       (_BRANCHES, self._key, count))
+            self._position += 1
+        return [Trace(self._checkpointer, self._run_id, entries,
+                      self._key + ((position, branch),))
+                for branch, entries in enumerate(entry)]
+
+
+class Checkpointer(object):
+
+    def __init__(self, store, interval=0.1):
+        ''' Keep checkpoints of running workflows in store.
+
+        Checkpoints of runs that made progress are written every
+        interval seconds by a background thread.
+        '''
+        self._store = store
+        self._interval = interval
+        # run id -> records not written yet
+        self._runs = {}
+        # run id -> header of a checkpoint not started yet
+        self._headers = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._writer = None
+
+    @property
+    def store(self):
+        return self._store
+
+    def pending(self):
+        ''' Ids of the runs that can be resumed. '''
+        return self._store.run_ids()
+
+    def track(self, context, entries=None):
+        ''' Start recording the run of context.
+
+        entries are what a checkpoint of the run recorded before; they
+        are replayed before anything new is recorded, which is appended
+        to that checkpoint.  Returns the Trace of the run's walk.
+        '''
+        with self._lock:
+            self._runs[context.run_id] = []
+            if entries is None:
+                entries = []
+                self._headers[context.run_id] = (
+                    CHECKPOINT_VERSION, context.inputs, context.plan.names)
+                self._dirty.add(context.run_id)
+            if self._writer is None and not self._closed.is_set():
+                self._writer = threading.Thread(
+                    target=self._write_periodically, daemon=True,
+                    name='workflow-checkpointer')
+                self._writer.start()
+        return Trace(self, context.run_id, entries)
+
+    def load(self, run_id, names):
+        ''' Inputs, recorded entries and last recorded context.data of the
+        checkpoint of run_id.
+
+        names are the task names of the plan to resume the run with;
+        they must be those of the plan the run started with.
+        '''
+        data = self._store.load(run_id)
+        if data is None:
+            raise WorkflowError('no checkpoint of run %s' % run_id)
+        source = io.BytesIO(data)
+        header = pickle.load(source)
+        if header[0] != CHECKPOINT_VERSION:
+            raise WorkflowError('checkpoint of run %s has version %r' % (
+                run_id, header[0]))
+        _, inputs, checkpoint_names = header
+        if tuple(checkpoint_names) != tuple(names):
+            raise WorkflowError(
+                'checkpoint of run %s is of a different workflow' % run_id)
+        entries = []
+        run_data = None
+        walks = {(): entries}
+        while source.tell() < len(data):
+            try:
+                records = pickle.load(source)
+            except (EOFError, pickle.UnpicklingError):
+                # the process died while appending; what came before is
+                # complete
+                break
+            for kind, key, value in records:
+                if kind == _DATA:
+                    run_data = value
+                    continue
+                walk = walks[key]
+                if kind == _BRANCHES:
+                    position = len(walk)
+                    value = [[] for _ in range(value)]
+                    for branch, branch_entries in enumerate(value):
+                        walks[key + ((position, branch),)] = branch_entries
+                walk.append(value)
+        if run_data is not None:
+            run_data = pickle.loads(run_data)
+        return inputs, entries, run_data
+
+    def finish(self, run_id):
+        ''' The run is done: forget it and remove its checkpoint. '''
+        with self._write_lock:
+            with self._lock:
+                self._runs.pop(run_id, None)
+                self._headers.pop(run_id, None)
+                self._dirty.discard(run_id)
+            self._store.delete(run_id)
+
+    def release(self, run_id):
+        ''' The run stopped early: write its checkpoint now and forget it.
+        '''
+        self.flush()
+        with self._lock:
+            self._runs.pop(run_id, None)
+
+    def flush(self):
+        ''' Write what every run recorded since the last flush. '''
+        with self._write_lock:
+            with self._lock:
+                # take the records under the lock, pickle them outside
+                # it, so recording never waits for pickling
+                pending = []
+                for run_id in self._dirty:
+                    records = self._runs.get(run_id)
+                    if records is not None:
+                        self._runs[run_id] = []
+                        pending.append((run_id, self._headers.pop(
+                            run_id, None), records))
+                self._dirty.clear()
+            for run_id, header, records in pending:
+                data = pickle.dumps(records, pickle.HIGHEST_PROTOCOL)
+                if header is None:
+                    self._store.append(run_id, data)
+                else:
+                    self._store.save(run_id, pickle.dumps(
+                        header, pickle.HIGHEST_PROTOCOL) + data)
+
+    def close(self):
+        ''' Write what is pending, stop the writer and close the store. '''
+        self._closed.set()
+        if self._writer is not None:
+            self._writer.join()
+        self.flush()
+        self._store.close()
+
+    def _record(self, run_id, record):
+        with self._lock:
+            records = self._runs.get(run_id)
+            # branches of a run that stopped early may still record
+            if records is not None:
+                records.append(record)
+                self._dirty.add(run_id)
+
+    def _write_periodically(self):
+        while not self._closed.wait(self._interval):
+            self.flush()
@@ -0,0 +1,209 @@
+'''Per-run state of a workflow.
+
+A Manager only holds the registered graph and its compiled plan; every
+call to run() gets a RunContext of its own, so one manager can serve
+any number of runs at the same time.
+'''
+import threading
+import time
+import uuid
+from workflow_manager.history import ListHistory
+from workflow_manager.task import Task
+
+
+class RunContext(object):
+
+    def __init__(self, plan, inputs=None, run_id=None, history=None,
+                 data=None):
+        self._run_id = run_id or uuid.uuid4().hex
+        self._plan = plan
+        self._inputs = inputs or {}
+        self._history = ListHistory() if history is None else history
+        self._data = {} if data is None else data
+        self._memoized = {}
+        self._result = None
+        self._params = None
+        self._started = time.perf_counter()
+        self._elapsed = None
+        self._cancelled = False
+        self._on_cancel = []
+        self._lock = threading.Lock()
+        # set by instrumentation that keeps numbers per run
+        self.metrics = None
+
+    @property
+    def run_id(self):
+        return self._run_id
+
+    @property
+    def plan(self):
+        return self._plan
+
+    @property
+    def inputs(self):
+        return self._inputs
+
+    @property
+    def history(self):
+        return self._history
+
+    @property
+    def flow_path(self):
+        ''' Read-only view of the tasks this run executed. '''
+        return self._history.view()
+
+    @property
+    def data(self):
+        ''' Scratch space shared by every task of this run. '''
+        return self._data
+
+    @property
+    def memoized(self):
+        ''' Outputs of memoized tasks executed in this run. '''
+        return self._memoized
+
+    @property
+    def result(self):
+        ''' Result of the whole flow, None until the run finished. '''
+        return self._result
+
+    @property
+    def params(self):
+        return self._params
+
+    @property
+    def started(self):
+        ''' time.perf_counter() when the run started. '''
+        return self._started
+
+    @property
+    def elapsed(self):
+        ''' Wall clock seconds the run took, None until it finished. '''
+        return self._elapsed
+
+    @property
+    def succeeded(self):
+        return self._result == Task.success_state()
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    def cancel(self):
+        ''' Cancel the run, from a task or any other thread.
+
+        No further task of a success list is started.  A task of a
+        success list that is executing fails (tasks with a timeout
+        policy right away, others once they return), so its failure
+        list runs, and failure lists carry on as usual to clean up.
+        The run fails.
+        '''
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            callbacks = list(self._on_cancel)
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback):
+        ''' Call callback when the run is cancelled, right away if it
+        already is.
+        '''
+        with self._lock:
+            if not self._cancelled:
+                self._on_cancel.append(callback)
+                return
+        callback()
+
+    def remove_on_cancel(self, callback):
+        with self._lock:
+            if callback in self._on_cancel:
+                self._on_cancel.remove(callback)
+
+    def finish(self, result, params, elapsed):
+        self._result = result
+        self._params = params
+        self._elapsed = elapsed
+
+
+class SubflowContext(object):
+    ''' The context of a run as seen by a flow generated while the run
+    goes on (see Task.generate_success): plan is the generated flow's,
+    everything else is the run's.
+    '''
+
+    def __init__(self, context, plan):
+        if isinstance(context, SubflowContext):
+            context = context.run
+        self._context = context
+        self._plan = plan
+
+    @property
+    def plan(self):
+        return self._plan
+
+    @property
+    def run(self):
+        ''' RunContext of the run the flow was generated in. '''
+        return self._context
+
+    def __getattr__(self, name):
+        return getattr(self._context, name)
+
+
+class RunStats(object):
+    ''' Outcome of Manager.run_many: every run plus aggregate numbers. '''
+
+    def __init__(self, runs, elapsed, started=None):
+        self._runs = runs
+        self._elapsed = elapsed
+        self._started = started
+
+    @property
+    def runs(self):
+        ''' RunContext of every run, in the order of the inputs. '''
+        return self._runs
+
+    @property
+    def started(self):
+        ''' time.perf_counter() when the first run started, None if not
+        given.
+        '''
+        return self._started
+
+    @property
+    def elapsed(self):
+        return self._elapsed
+
+    @property
+    def succeeded(self):
+        return sum(1 for run in self._runs if run.succeeded)
+
+    @property
+    def failed(self):
+        return len(self._runs) - self.succeeded
+
+    @property
+    def throughput(self):
+        ''' Completed runs per second. '''
+        if not self._elapsed:
+            return 0.0
+        return len(self._runs) / self._elapsed
+
+    @property
+    def mean_latency(self):
+        ''' Average wall clock seconds of a single run. '''
+        if not self._runs:
+            return 0.0
+        return sum(run.elapsed for run in self._runs) / len(self._runs)
+
+    def to_dict(self):
+        return {
+            'runs': len(self._runs),
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'elapsed': self._elapsed,
+            'throughput': self.throughput,
+            'mean_latency': self.mean_latency
+            }
@@ -0,0 +1,379 @@
+'''Live stream of what runs do, and exporters for it.
+
+EventStream is an Instrumentation that turns every hook into an Event:
+
+run_started          a run started
+task_started         a task is about to execute
+task_finished        a task returned, with its result and duration
+task_skipped         a task did not run because it just ran
+task_short_circuited a task of a success list did not run because an
+                     earlier one failed (one event per task)
+run_finished         a run finished, with its result and duration
+
+The hooks only append a tuple to a bounded deque, which needs no lock
+of its own, so emitting an event costs the walk a tuple and an append
+(benchmarks/bench_events.py measures it).  The stream does not ask the
+walk for CPU time, and it dates events with time.perf_counter_ns, the
+clock the walk times tasks with: a task finished when it started plus
+the wall time the walk measured, so that event takes no clock reading
+at all.  A background thread drains
+the buffer every interval seconds, builds the events and hands them to
+the exporters in the order they happened.  If the exporters fall more
+than maxlen events behind, the oldest are dropped.
+
+JsonLinesExporter writes every event as a line of JSON to a file
+object.  PrometheusExporter keeps counters of runs and of task results,
+skips and short circuits, and latency histograms of runs and tasks,
+by task name, in the Prometheus text format: render() returns it,
+write(path) saves it to a file (e.g. for node_exporter's textfile
+collector) and serve(port) answers scrapes over HTTP.
+
+Example:
+
+prometheus = PrometheusExporter()
+server = prometheus.serve(9464)
+with open('events.jsonl', 'a') as log:
+    events = EventStream([JsonLinesExporter(log), prometheus])
+    manager = Manager(task, instrumentation=events)
+    manager.run_many(inputs)
+    events.close()
+'''
+import bisect
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import threading
+import time
+
+from workflow_manager.instrumentation import Instrumentation
+from workflow_manager.task import Task
+
+
+RUN_STARTED = 'run_started'
+TASK_STARTED = 'task_started'
+TASK_FINISHED = 'task_finished'
+TASK_SKIPPED = 'task_skipped'
+TASK_SHORT_CIRCUITED = 'task_short_circuited'
+RUN_FINISHED = 'run_finished'
+
+
+def outcome_name(result):
+    ''' Label of a task or run result: success, failure or the outcome
+    label a task returned (see Task.on).
+    '''
+    if result == Task.success_state():
+        return 'success'
+    if result == Task.failure_state():
+        return 'failure'
+    return str(result)
+
+
+class Event(object):
+
+    __slots__ = ('kind', 'run_id', 'task', 'timestamp', 'result',
+                 'duration')
+
+    def __init__(self, kind, run_id, task, timestamp_ns, result=None,
+                 duration_ns=None):
+        self.kind = kind
+        self.run_id = run_id
+        # task name, None for run events
+        self.task = task
+        # seconds since the epoch
+        self.timestamp = timestamp_ns / 1e9
+        self.result = None if result is None else outcome_name(result)
+        # seconds, for task_finished and run_finished
+        self.duration = None if duration_ns is None else duration_ns / 1e9
+
+    def to_dict(self):
+        event = {'event': self.kind, 'run_id': self.run_id,
+                 'timestamp': self.timestamp}
+        if self.task is not None:
+            event['task'] = self.task
+        if self.result is not None:
+            event['result'] = self.result
+        if self.duration is not None:
+            event['duration'] = self.duration
+        return event
+
+
+class EventStream(Instrumentation):
+
+    cpu_time = False
+
+    def __init__(self, exporters, interval=0.5, maxlen=100000):
+        ''' Hand the events of every run to exporters every interval
+        seconds, keeping at most maxlen events in between.
+        '''
+        self._exporters = list(exporters)
+        # added to perf_counter_ns readings to get nanoseconds since the
+        # epoch
+        self._epoch_ns = time.time_ns() - time.perf_counter_ns()
+        self._interval = interval
+        self._buffer = deque(maxlen=maxlen)
+        self._append = self._buffer.append
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._writer = None
+
+    @property
+    def exporters(self):
+        return tuple(self._exporters)
+
+    def before_run(self, context):
+        if self._writer is None:
+            self._start_writer()
+        self._append((RUN_STARTED, context, None, time.perf_counter_ns()))
+
+    def after_run(self, context):
+        self._append((RUN_FINISHED, context, None, time.perf_counter_ns(),
+                      context.result, int(context.elapsed * 1e9)))
+
+    # the hooks keep the context and the node id; the run id and the task
+    # name are looked up on the writer thread
+
+    def before_task(self, context, node, parent):
+        now = time.perf_counter_ns()
+        self._append((TASK_STARTED, context, node, now))
+        # handed back to after_task as token
+        return now
+
+    def after_task(self, context, node, output, wall_ns, cpu_ns, token):
+        self._append((TASK_FINISHED, context, node, token + wall_ns,
+                      output[0], wall_ns))
+
+    def on_skip(self, context, node):
+        self._append((TASK_SKIPPED, context, node, time.perf_counter_ns()))
+
+    def on_short_circuit(self, context, nodes):
+        now = time.perf_counter_ns()
+        for node in nodes:
+            self._append((TASK_SHORT_CIRCUITED, context, node, now))
+
+    def flush(self):
+        ''' Hand every buffered event to the exporters now. '''
+        with self._flush_lock:
+            events = []
+            epoch_ns = self._epoch_ns
+            pop = self._buffer.popleft
+            while True:
+                try:
+                    kind, context, node, timestamp_ns, *rest = pop()
+                except IndexError:
+                    break
+                events.append(Event(
+                    kind, context.run_id,
+                    None if node is None else context.plan.names[node],
+                    timestamp_ns + epoch_ns, *rest))
+            if events:
+                for exporter in self._exporters:
+                    exporter.export(events)
+
+    def close(self):
+        ''' Export what is buffered, stop the writer and close the
+        exporters.
+        '''
+        self._closed.set()
+        if self._writer is not None:
+            self._writer.join()
+        self.flush()
+        for exporter in self._exporters:
+            exporter.close()
+
+    def _start_writer(self):
+        with self._lock:
+            if self._writer is None and not self._closed.is_set():
+                self._writer = threading.Thread(
+                    target=self._export_periodically, daemon=True,
+                    name='workflow-events')
+                self._writer.start()
+
+    def _export_periodically(self):
+        while not self._closed.wait(self._interval):
+            self.flush()
+
+
+class Exporter(object):
+
+    def export(self, events):
+        ''' Take a list of events, oldest first. '''
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class JsonLinesExporter(Exporter):
+
+    def __init__(self, fp):
+        ''' Write every event as a line of JSON to the text file object
+        fp; the file stays open.
+        '''
+        self._fp = fp
+
+    def export(self, events):
+        self._fp.write(''.join(json.dumps(event.to_dict()) + '\n'
+                               for event in events))
+        self._fp.flush()
+
+
+# seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram(object):
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # observations per bucket, the last one above every bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class PrometheusExporter(Exporter):
+
+    def __init__(self, path=None, buckets=DEFAULT_BUCKETS, prefix='workflow'):
+        ''' Keep metrics of the events in the Prometheus text format.
+
+        With a path, the metrics are written to it after every export.
+        buckets are the upper bounds, in seconds, of the latency
+        histograms and prefix starts every metric name.
+        '''
+        self._path = path
+        self._buckets = tuple(sorted(buckets))
+        self._prefix = prefix
+        self._runs = defaultdict(int)
+        self._run_latency = Histogram(self._buckets)
+        self._tasks = defaultdict(int)
+        self._skipped = defaultdict(int)
+        self._short_circuited = defaultdict(int)
+        self._task_latency = {}
+        self._lock = threading.Lock()
+
+    def export(self, events):
+        with self._lock:
+            for event in events:
+                kind = event.kind
+                if kind == TASK_FINISHED:
+                    self._tasks[event.task, event.result] += 1
+                    latency = self._task_latency.get(event.task)
+                    if latency is None:
+                        latency = self._task_latency[event.task] = (
+                            Histogram(self._buckets))
+                    latency.observe(event.duration)
+                elif kind == TASK_SKIPPED:
+                    self._skipped[event.task] += 1
+                elif kind == TASK_SHORT_CIRCUITED:
+                    self._short_circuited[event.task] += 1
+                elif kind == RUN_FINISHED:
+                    self._runs[event.result] += 1
+                    self._run_latency.observe(event.duration)
+        if self._path is not None:
+            self.write(self._path)
+
+    def render(self):
+        ''' Every metric in the Prometheus text exposition format. '''
+        prefix = self._prefix
+        lines = []
+        with self._lock:
+            _counter(lines, prefix + '_runs_total', 'Finished runs.',
+                     (({'result': result}, count)
+                      for result, count in sorted(self._runs.items())))
+            _histogram(lines, prefix + '_run_duration_seconds',
+                       'Wall clock seconds of a run.',
+                       [({}, self._run_latency)])
+            _counter(lines, prefix + '_task_runs_total',
+                     'Executed tasks by result.',
+                     (({'task': task, 'result': result}, count)
+                      for (task, result), count in sorted(
+                          self._tasks.items())))
+            _counter(lines, prefix + '_task_skipped_total',
+                     'Tasks not run because they just ran.',
+                     (({'task': task}, count)
+                      for task, count in sorted(self._skipped.items())))
+            _counter(lines, prefix + '_task_short_circuited_total',
+                     'Tasks not run because an earlier task failed.',
+                     (({'task': task}, count) for task, count in sorted(
+                         self._short_circuited.items())))
+            _histogram(lines, prefix + '_task_duration_seconds',
+                       'Wall clock seconds of a task.',
+                       [({'task': task}, latency) for task, latency in
+                        sorted(self._task_latency.items())])
+        return ''.join(line + '\n' for line in lines)
+
+    def write(self, path):
+        ''' Replace the file at path with the metrics, atomically. '''
+        temporary = '%s.%d.tmp' % (path, os.getpid())
+        with open(temporary, 'w') as fp:
+            fp.write(self.render())
+        os.replace(temporary, path)
+
+    def serve(self, port, host='127.0.0.1'):
+        ''' Answer scrapes on host:port from a background thread.
+
+        Returns the server; call its shutdown() to stop it.
+        '''
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                body = exporter.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type',
+                                 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True,
+                         name='workflow-metrics').start()
+        return server
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (name, str(value).replace('\\', r'\\')
+                     .replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels.items())
+
+
+def _counter(lines, name, help_text, samples):
+    lines.append('# HELP %s %s' % (name, help_text))
+    lines.append('# TYPE %s counter' % name)
+    for labels, count in samples:
+        lines.append('%s%s %d' % (name, _labels(labels), count))
+
+
+def _histogram(lines, name, help_text, samples):
+    lines.append('# HELP %s %s' % (name, help_text))
+    lines.append('# TYPE %s histogram' % name)
+    for labels, histogram in samples:
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + (float('inf'),),
+                                histogram.counts):
+            cumulative += count
+            lines.append('%s_bucket%s %d' % (name, _labels(dict(
+                labels, le='+Inf' if bound == float('inf') else repr(bound))),
+                cumulative))
+        lines.append('%s_sum%s %r' % (name, _labels(labels), histogram.sum))
+        lines.append('%s_count%s %d' % (name, _labels(labels),
+                                        histogram.count))
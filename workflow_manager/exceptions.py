@@ -0,0 +1,17 @@
+'''Errors raised by the workflow manager.'''
+
+
+class WorkflowError(Exception):
+    ''' Base class for every error raised by the workflow manager. '''
+
+
+class InvalidWorkflowError(WorkflowError):
+    ''' The registered task graph can not be executed. '''
+
+
+class TaskTimeoutError(WorkflowError):
+    ''' A task did not finish within the timeout of its policy. '''
+
+
+class TaskCancelledError(WorkflowError):
+    ''' The run was cancelled while the task was executing. '''
@@ -0,0 +1,140 @@
+'''Where a run records the tasks it executed.
+
+Every run records an entry per executed task, {'name': ..., 'parameters':
+...}, into a history of its own.  Which history is used is up to the
+manager:
+
+ListHistory    keeps every entry of the run (the default)
+RingHistory    keeps the last maxlen entries only
+NullHistory    keeps nothing
+StreamHistory  keeps nothing and hands every entry to a callback or a
+               generator as soon as it is recorded
+
+Example:
+
+manager = Manager(task, history=lambda: RingHistory(100))
+manager = Manager(task, history=NullHistory)
+manager = Manager(task, history=lambda: StreamHistory(log.debug))
+'''
+from collections import deque
+from collections.abc import Sequence
+
+
+class HistoryView(Sequence):
+    ''' Read-only view of the entries a history keeps.
+
+    The view is not a copy; it follows the history as more entries are
+    recorded.  It compares equal to a list or tuple of the same entries.
+    '''
+
+    def __init__(self, entries):
+        self._entries = entries
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self._entries)[index]
+        return self._entries[index]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            mine == theirs for mine, theirs in zip(self, other))
+
+    def __repr__(self):
+        return repr(list(self._entries))
+
+
+_EMPTY = ()
+
+
+class ListHistory(object):
+    ''' Keeps every entry recorded. '''
+
+    def __init__(self):
+        self._entries = []
+        self.last = None
+        # the task of the last entry, set by the walk
+        self.last_task = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def append(self, entry):
+        self._entries.append(entry)
+        self.last = entry
+
+    def merge(self, history):
+        ''' Record every entry of history, a branch of this run. '''
+        self._entries.extend(history)
+        if history.last is not None:
+            self.last = history.last
+            self.last_task = history.last_task
+
+    def branch(self):
+        ''' History for a parallel branch, merged back once it is done. '''
+        return ListHistory()
+
+    def view(self):
+        return HistoryView(self._entries)
+
+
+class RingHistory(ListHistory):
+    ''' Keeps the last maxlen entries recorded. '''
+
+    def __init__(self, maxlen):
+        super().__init__()
+        self._entries = deque(maxlen=maxlen)
+
+
+class NullHistory(ListHistory):
+    ''' Keeps no entries; only the last one, which the walk needs. '''
+
+    def __init__(self):
+        super().__init__()
+        self._entries = _EMPTY
+
+    def append(self, entry):
+        self.last = entry
+
+    def merge(self, history):
+        if history.last is not None:
+            self.last = history.last
+            self.last_task = history.last_task
+
+    def branch(self):
+        return NullHistory()
+
+
+class StreamHistory(NullHistory):
+    ''' Keeps no entries and hands each one to consumer right away.
+
+    consumer is a callable taking the entry or a started generator that
+    entries are sent to.
+    '''
+
+    def __init__(self, consumer):
+        super().__init__()
+        self._consume = getattr(consumer, 'send', consumer)
+
+    def append(self, entry):
+        self.last = entry
+        self._consume(entry)
+
+    def merge(self, history):
+        for entry in history:
+            self.append(entry)
+        if history.last is not None:
+            self.last_task = history.last_task
+
+    def branch(self):
+        return ListHistory()
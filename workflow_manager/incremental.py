@@ -0,0 +1,116 @@
+'''Reuse the outputs of earlier runs for tasks whose inputs did not change.
+
+A manager given an OutputStore fingerprints the inputs of every task it
+is about to execute: the task's class and name, the keyword arguments
+it gets and the parameters the task before it returned.  If an earlier
+run recorded an output under the same fingerprint, the task does not
+execute and the walk takes the recorded output instead; otherwise the
+task executes and its output is recorded.  Fixing the input of a failed
+run and running it again thus only executes the tasks whose inputs
+changed and everything downstream of them, as their inputs change in
+turn.
+
+Only outputs that are not failures are recorded, so failed tasks always
+execute again.  Tasks with pass_context = True or memoize = True are
+never reused through the store, nor are tasks that set incremental =
+False, e.g. because they read the clock or state outside the workflow.
+Inputs or outputs that can not be pickled are not recorded either.
+Fingerprints of equal inputs whose pickles differ (e.g. sets of strings
+in different processes) do not match, which only costs an execution.
+
+A task whose code changed still matches its old outputs: call
+invalidate(name) to forget them, or invalidate() to forget everything.
+
+The outputs are kept in a checkpoint.CheckpointStore, in memory by
+default, so FileStore or SQLiteStore share them between processes and
+keep them across restarts.  Outputs are pickled; only use a store you
+trust.
+
+Example:
+
+outputs = OutputStore(SQLiteStore('/var/lib/workflows/outputs.db'))
+manager = Manager(task, incremental=outputs)
+manager.run(path='data.csv')    # executes every task
+manager.run(path='data.csv')    # executes nothing but failed tasks
+'''
+import hashlib
+import pickle
+import threading
+
+from workflow_manager.cache import MISSING
+from workflow_manager.checkpoint import MemoryStore
+from workflow_manager.task import Task
+
+
+class OutputStore(object):
+
+    def __init__(self, store=None):
+        ''' Record outputs in store, a checkpoint.CheckpointStore, a
+        MemoryStore if not given.
+        '''
+        self._store = MemoryStore() if store is None else store
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        return self._store
+
+    @property
+    def hits(self):
+        ''' Tasks that took a recorded output instead of executing. '''
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+    def key(self, task, kwargs, params):
+        ''' Fingerprint of task getting kwargs after params, None if the
+        inputs can not be pickled.
+        '''
+        cls = type(task)
+        try:
+            inputs = pickle.dumps(
+                ('%s:%s' % (cls.__module__, cls.__qualname__), task.name,
+                 kwargs, params), pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return None
+        return '%s-%s' % (_name_digest(task.name),
+                          hashlib.sha256(inputs).hexdigest())
+
+    def recall(self, key):
+        ''' Output recorded under key, MISSING if there is none. '''
+        data = None if key is None else self._store.load(key)
+        with self._lock:
+            if data is None:
+                self._misses += 1
+                return MISSING
+            self._hits += 1
+        return pickle.loads(data)
+
+    def record(self, key, output):
+        if key is None or output[0] == Task.failure_state():
+            return
+        try:
+            data = pickle.dumps(output, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return
+        self._store.save(key, data)
+
+    def invalidate(self, name=None):
+        ''' Forget the outputs recorded for the task called name, or for
+        every task.
+        '''
+        prefix = '' if name is None else _name_digest(name) + '-'
+        for key in self._store.run_ids():
+            if key.startswith(prefix):
+                self._store.delete(key)
+
+    def close(self):
+        self._store.close()
+
+
+def _name_digest(name):
+    return hashlib.sha256(name.encode('utf-8')).hexdigest()[:16]
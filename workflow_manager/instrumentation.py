@@ -0,0 +1,182 @@
+'''Hooks into the execution of a workflow.
+
+Give a manager an Instrumentation and it calls the hooks below for every
+run and every task; without one the manager does no bookkeeping at all.
+Hooks are called from whichever thread walks the flow, so parallel
+branches call them concurrently.
+
+TimingInstrumentation records the wall and CPU time of every task and
+attaches a RunMetrics to each run's context:
+
+manager = Manager(task, instrumentation=TimingInstrumentation())
+context = manager.run()
+context.metrics.summary()
+'''
+import heapq
+import time
+
+
+class Instrumentation(object):
+    ''' Base class for instrumentation; every hook does nothing. '''
+
+    # set to False if after_task does not use cpu_ns: the walk then
+    # skips reading the thread's CPU clock, the costliest part of timing
+    # a task, and passes cpu_ns=None
+    cpu_time = True
+
+    def before_run(self, context):
+        pass
+
+    def after_run(self, context):
+        pass
+
+    def before_task(self, context, node, parent):
+        ''' Called before node executes.
+
+        parent is what before_task returned for the task whose success
+        or failure list node is part of (None for the first task).  The
+        value returned here is handed to after_task and, as parent, to
+        the hooks of the tasks that run after this one.
+        '''
+        return None
+
+    def after_task(self, context, node, output, wall_ns, cpu_ns, token):
+        ''' Called once node returned output, with the time it took.
+
+        wall_ns is measured with time.perf_counter_ns from right after
+        before_task returned.  cpu_ns is the CPU time of the thread
+        walking the flow, None unless cpu_time is set; for tasks awaited
+        by AsyncManager it includes whatever else ran on the event loop
+        meanwhile.
+        '''
+        pass
+
+    def on_skip(self, context, node):
+        ''' node was not run because it just ran. '''
+        pass
+
+    def on_short_circuit(self, context, nodes):
+        ''' nodes were not run because an earlier success task failed. '''
+        pass
+
+
+class TaskTiming(object):
+    ''' One execution of a task. '''
+
+    __slots__ = ('node', 'name', 'parent', 'wall_ns', 'cpu_ns', 'result',
+                 'path_ns')
+
+    def __init__(self, node, name, parent):
+        self.node = node
+        self.name = name
+        self.parent = parent
+        self.wall_ns = 0
+        self.cpu_ns = 0
+        self.result = None
+        # wall time of this task plus all the tasks it descends from
+        self.path_ns = 0
+
+
+class RunMetrics(object):
+    ''' Timings of a single run. '''
+
+    def __init__(self):
+        self._timings = []
+        self._skipped = 0
+        self._short_circuited = 0
+        self._start_ns = time.perf_counter_ns()
+        self._total_ns = None
+
+    @property
+    def timings(self):
+        ''' TaskTiming of every execution, in the order tasks started. '''
+        return self._timings
+
+    @property
+    def skipped(self):
+        return self._skipped
+
+    @property
+    def short_circuited(self):
+        return self._short_circuited
+
+    @property
+    def total_ns(self):
+        return self._total_ns
+
+    def add(self, timing):
+        self._timings.append(timing)
+
+    def skip(self, count=1):
+        self._skipped += count
+
+    def short_circuit(self, count):
+        self._short_circuited += count
+
+    def finish(self):
+        self._total_ns = time.perf_counter_ns() - self._start_ns
+
+    def critical_path(self):
+        ''' Chain of executions that took the longest, first task first.
+
+        Tasks of a chain run one after another, so with parallel branches
+        this is the chain that bounds the run's latency.
+        '''
+        if not self._timings:
+            return []
+        timing = max(self._timings, key=lambda timing: timing.path_ns)
+        path = []
+        while timing is not None:
+            path.append(timing)
+            timing = timing.parent
+        path.reverse()
+        return path
+
+    def slowest(self, count=5):
+        return heapq.nlargest(count, self._timings,
+                              key=lambda timing: timing.wall_ns)
+
+    def summary(self, count=5):
+        critical_path = self.critical_path()
+        return {
+            'total_ns': self._total_ns,
+            'tasks': len(self._timings),
+            'task_wall_ns': sum(timing.wall_ns for timing in self._timings),
+            'task_cpu_ns': sum(timing.cpu_ns for timing in self._timings),
+            'skipped': self._skipped,
+            'short_circuited': self._short_circuited,
+            'critical_path': [timing.name for timing in critical_path],
+            'critical_path_ns': (critical_path[-1].path_ns
+                                 if critical_path else 0),
+            'slowest': [(timing.name, timing.wall_ns)
+                        for timing in self.slowest(count)]
+            }
+
+
+class TimingInstrumentation(Instrumentation):
+    ''' Times every task and keeps a RunMetrics on context.metrics. '''
+
+    def before_run(self, context):
+        context.metrics = RunMetrics()
+
+    def after_run(self, context):
+        context.metrics.finish()
+
+    def before_task(self, context, node, parent):
+        timing = TaskTiming(node, context.plan.names[node], parent)
+        context.metrics.add(timing)
+        return timing
+
+    def after_task(self, context, node, output, wall_ns, cpu_ns, token):
+        token.wall_ns = wall_ns
+        token.cpu_ns = cpu_ns
+        token.result = output[0]
+        token.path_ns = wall_ns
+        if token.parent is not None:
+            token.path_ns += token.parent.path_ns
+
+    def on_skip(self, context, node):
+        context.metrics.skip()
+
+    def on_short_circuit(self, context, nodes):
+        context.metrics.short_circuit(len(nodes))
@@ -0,0 +1,210 @@
+'''Build workflows from declarative definitions.
+
+A definition maps task names to importable Task classes and their
+flows, in JSON or, when PyYAML is installed, YAML:
+
+{
+  "initial": "fetch",
+  "tasks": {
+    "fetch": {"type": "myapp.tasks:Fetch",
+              "on_success": ["parse", "audit"], "parallel": true,
+              "on_failure": ["cleanup"]},
+    "parse": {"type": "myapp.tasks:Parse", "on_failure": ["cleanup"],
+              "routes": {"partial": ["audit"]}},
+    "audit": {"type": "myapp.tasks:Audit", "args": ["audit", "db"]},
+    "cleanup": {"type": "myapp.tasks:Cleanup"}
+  }
+}
+
+Each task is built with type(*args, **kwargs); without either the name
+is the only argument.  "routes" maps outcome labels of a task to the
+tasks they route to, see Task.on; labels are strings, so in YAML quote
+the ones it would read as booleans ("yes", "no", "on", "off").  A task
+spec with any other key is rejected.  load() returns a validated,
+compiled Plan ready for Manager.register_plan.
+
+Given a cache_dir, load() also stores the compiled form of the
+definition there, keyed by a hash of its content.  Loading the same
+definition again (another worker, a restart) then only builds the
+tasks and takes the node ids, flows and topological order from the
+cache: no resolving of names and no validation.
+'''
+import hashlib
+import json
+import os
+import tempfile
+
+from workflow_manager.exceptions import InvalidWorkflowError
+from workflow_manager.plan import Plan
+from workflow_manager.serialization import import_type
+from workflow_manager.task import Task
+
+try:
+    import yaml
+except ImportError:  # pragma: no cover - depends on the environment
+    yaml = None
+
+
+CACHE_VERSION = 3
+
+# every key a task spec may have
+_SPEC_KEYS = frozenset(('type', 'args', 'kwargs', 'parallel', 'on_success',
+                        'on_failure', 'routes'))
+
+
+def parse(text, yaml_format=False):
+    ''' Definition mapping from the text of a JSON or YAML file. '''
+    if yaml_format:
+        if yaml is None:
+            raise InvalidWorkflowError(
+                'PyYAML is required to load YAML definitions')
+        return yaml.safe_load(text)
+    return json.loads(text)
+
+
+def load(path, cache_dir=None):
+    ''' Compiled Plan of the definition file at path. '''
+    with open(path, 'rb') as source:
+        content = source.read()
+    yaml_format = os.path.splitext(path)[1].lower() in ('.yaml', '.yml')
+
+    cache_path = None
+    if cache_dir is not None:
+        digest = hashlib.sha256(content).hexdigest()
+        cache_path = os.path.join(cache_dir, '%s.json' % digest)
+        compiled = _read_cache(cache_path)
+        if compiled is not None:
+            return _from_compiled(compiled)
+
+    compiled = compile_definition(parse(content.decode('utf-8'),
+                                        yaml_format))
+    if cache_path is not None:
+        _write_cache(cache_path, compiled)
+    return _from_compiled(compiled)
+
+
+def load_definition(definition):
+    ''' Compiled Plan of a definition mapping. '''
+    return _from_compiled(compile_definition(definition))
+
+
+def compile_definition(definition):
+    ''' Validate definition and resolve it to node ids.
+
+    Returns the compiled form kept in the cache: the task of every node,
+    in node id order with the initial task first, the success and
+    failure lists of node ids and the topological order.
+    '''
+    try:
+        initial = definition['initial']
+        specs = definition['tasks']
+    except (KeyError, TypeError):
+        raise InvalidWorkflowError(
+            'a definition needs "initial" and "tasks"')
+    if initial not in specs:
+        raise InvalidWorkflowError('initial task %r is not defined' % (
+            initial,))
+
+    keys = [initial] + [key for key in specs if key != initial]
+    ids = {key: node for node, key in enumerate(keys)}
+    nodes = []
+    success = []
+    failure = []
+    for key in keys:
+        spec = specs[key]
+        if 'type' not in spec:
+            raise InvalidWorkflowError('task %r has no type' % (key,))
+        unknown = set(spec) - _SPEC_KEYS
+        if unknown:
+            raise InvalidWorkflowError('task %r has unknown keys: %s' % (
+                key, ', '.join(sorted(map(repr, unknown)))))
+        node = {'key': key, 'type': spec['type']}
+        for option in ('args', 'kwargs', 'parallel'):
+            if option in spec:
+                node[option] = spec[option]
+        nodes.append(node)
+        try:
+            for flow, lists in (('on_success', success),
+                                ('on_failure', failure)):
+                lists.append([ids[target] for target in spec.get(flow, ())])
+            if spec.get('routes'):
+                node['routes'] = {
+                    _label(key, outcome): [ids[target] for target in targets]
+                    for outcome, targets in spec['routes'].items()}
+        except KeyError as error:
+            raise InvalidWorkflowError(
+                'task %r refers to undefined task %s' % (key, error))
+
+    compiled = {
+        'version': CACHE_VERSION,
+        'nodes': nodes,
+        'success': success,
+        'failure': failure
+        }
+    plan = _from_compiled(compiled)
+    plan.validate()
+    compiled['topological_order'] = list(plan.topological_order)
+    return compiled
+
+
+def _label(key, outcome):
+    # YAML reads a bare yes, no, on or off as a boolean, which Task.on
+    # would take for the success or failure list; JSON keys are strings
+    if not isinstance(outcome, str):
+        raise InvalidWorkflowError(
+            'task %r routes outcome %r: labels must be strings, quote it'
+            % (key, outcome))
+    return outcome
+
+
+def _build(node):
+    task_type = import_type(node['type'])
+    if not (isinstance(task_type, type) and issubclass(task_type, Task)):
+        raise InvalidWorkflowError('%r is not a Task type' % (node['type'],))
+    args = node.get('args')
+    kwargs = node.get('kwargs')
+    if args is None and kwargs is None:
+        args = [node['key']]
+    return task_type(*(args or ()), **(kwargs or {}))
+
+
+def _from_compiled(compiled):
+    nodes = compiled['nodes']
+    tasks = [_build(node) for node in nodes]
+    for task, node, success, failure in zip(
+            tasks, nodes, compiled['success'], compiled['failure']):
+        task.on_success(*[tasks[target] for target in success],
+                        parallel=node.get('parallel', False))
+        task.on_failure(*[tasks[target] for target in failure])
+        for outcome, targets in node.get('routes', {}).items():
+            task.on(outcome, *[tasks[target] for target in targets])
+    return Plan.from_lists(tasks, compiled['success'], compiled['failure'],
+                           True, compiled.get('topological_order'),
+                           [node.get('routes') for node in nodes])
+
+
+def _read_cache(path):
+    try:
+        with open(path) as source:
+            compiled = json.load(source)
+    except (OSError, ValueError):
+        return None
+    if compiled.get('version') != CACHE_VERSION or \
+            'topological_order' not in compiled:
+        return None
+    return compiled
+
+
+def _write_cache(path, compiled):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # write to a temporary file first so concurrent workers never read a
+    # half written cache entry
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'w') as output:
+            json.dump(compiled, output)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
@@ -20,83 +20,710 @@ task 7 does nothing regradless of result
 We will register each task object into the flow and call Manager.run() method.
 Depending on result, the flow will take the right path.
 '''
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 import copy
 import json
+import os
+import threading
+import time
+from workflow_manager.cache import MISSING
+from workflow_manager.context import RunContext, RunStats, SubflowContext
+from workflow_manager import policy
+from workflow_manager.exceptions import (
+    TaskCancelledError, TaskTimeoutError, WorkflowError)
+from workflow_manager.history import HistoryView, ListHistory
+from workflow_manager.plan import Plan
 from workflow_manager.task import Task
 
+# policies for a task the walk reaches again in a run, see Manager(visits=)
+CONSECUTIVE = 'consecutive'
+ONCE_PER_RUN = 'once_per_run'
+ONCE_PER_PATH = 'once_per_path'
+ALWAYS = 'always'
+VISIT_POLICIES = (CONSECUTIVE, ONCE_PER_RUN, ONCE_PER_PATH, ALWAYS)
+
 
 class Manager(object):
 
-    def __init__(self, initial_task=None):
+    def __init__(self, initial_task=None, executor=None, max_workers=None,
+                 result_cache=None, history=None, instrumentation=None,
+                 checkpointer=None, backend=None, incremental=None,
+                 visits=CONSECUTIVE):
         ''' Constructor for manager.
         If an initial task is passed in, use that; else, the client can
         register initial task with the manager.
+
+        Success branches registered with on_success(..., parallel=True)
+        run on executor.  Without one, the manager starts its own thread
+        pool of max_workers threads the first time a parallel branch runs
+        and shuts it down in close().
+
+        Tasks with memoize = True execute once per run.  With a
+        result_cache (a cache.ResultCache) their outputs are reused
+        across runs as well.
+
+        history is called to get the history every run records its
+        executed tasks into, history.ListHistory by default; pass e.g.
+        history.NullHistory or lambda: history.RingHistory(100) to bound
+        what a run keeps.
+
+        instrumentation (an instrumentation.Instrumentation) is told
+        about every run and task; without it the walk does no timing.
+
+        With a checkpointer (a checkpoint.Checkpointer) every run keeps a
+        checkpoint of its progress, which resume() continues from.
+
+        With a backend (a backends.Backend) tasks execute wherever the
+        backend sends them, e.g. on worker processes; the manager still
+        walks the flow.
+
+        With incremental (an incremental.OutputStore) tasks whose inputs
+        did not change since an earlier run take the output that run
+        recorded instead of executing.
+
+        visits says what happens when the walk reaches a task that
+        already executed in the run, e.g. a cleanup task shared by
+        several failure lists:
+
+        consecutive    skip it only if it is the very task object that
+                       just executed (the default)
+        once_per_run   execute every task at most once per run
+        once_per_path  execute every task at most once along each path
+                       of the run; the branches of a parallel list each
+                       start from what executed before the list and do
+                       not skip tasks because another branch ran them
+        always         execute it every time it is reached
+
+        once_per_run and once_per_path keep an index of the task objects
+        executed, so checking a task costs a dict lookup whatever the
+        size of the flow, and a task generated by Task.generate_success
+        counts as visited however many flows it is part of.
         '''
+        if visits not in VISIT_POLICIES:
+            raise WorkflowError('visits must be one of %s, not %r' % (
+                ', '.join(VISIT_POLICIES), visits))
+        self._task = None
+        self._plan = None
+        self._history = history or ListHistory
+        self._last_run = None
+        self._instrumentation = instrumentation
+        self._checkpointer = checkpointer
+        self._backend = backend
+        self._incremental = incremental
+        self._visits = visits
         if initial_task:
-            self._task = initial_task
-        else:
-            self._task = None
-        self._flow_path = []
+            self.register_initial_task(initial_task)
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._max_workers = max_workers
+        self._executor_lock = threading.Lock()
+        self._result_cache = result_cache
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        ''' Shut down the thread pool the manager started, if any, and
+        write the pending checkpoints.
+        '''
+        if self._checkpointer is not None:
+            self._checkpointer.flush()
+        with self._executor_lock:
+            executor = self._executor
+            if self._owns_executor:
+                self._executor = None
+        if self._owns_executor and executor is not None:
+            executor.shutdown()
 
     def register_initial_task(self, task):
+        ''' Register task as the start of the flow.
+
+        The flow is validated and compiled right away, so a graph that
+        can not run raises InvalidWorkflowError here, at startup, instead
+        of under load.  See plan.Plan.validate.
+        '''
         self._task = task
+        self._plan = None
+        self.compile()
+
+    def register_plan(self, plan):
+        ''' Register an already compiled and validated plan, e.g. one
+        produced by loader.load, skipping validation.
+        '''
+        self._task = plan.tasks[0]
+        self._plan = plan
+
+    def compile(self):
+        ''' Validate the registered flow and freeze it into a Plan.
+
+        run() compiles on first use and reuses the plan afterwards; it is
+        compiled again only if the flow of one of its tasks changed in the
+        meantime.  Calling compile() up front moves that cost (and any
+        validation error) to startup.
+        '''
+        self._plan = Plan.compile(self._task)
+        return self._plan
 
     def show_flow(self):
         return copy.deepcopy(self._task)
 
     def show_executed_flow(self):
-        # show the flow here
-        return copy.deepcopy(self._flow_path)
+        ''' Read-only view of what the last finished run executed. '''
+        if self._last_run is None:
+            return HistoryView(())
+        return self._last_run.flow_path
 
-    def run(self):
+    def run(self, **inputs):
         ''' Run the flow.
 
+            inputs are passed to the initial task's execute as keyword
+            arguments.  Every run keeps its state in a RunContext of its
+            own, which is returned, so concurrent runs of one manager do
+            not interfere.
+
             Execution algorithm:
             1. take node and execute it = return result,*params
             2. if result == success
-            3.  success_node = node.success_flow.pop
-            4.  result,*params = success_node.execute
+            3.  for success_node in node.success_flow
+            4.      result,*params = success_node.execute
             5. elif result == failure
-            3.  failure_node = node.failure_flow.pop
-            4.  result,*params = failure_node.execute
+            3.  for failure_node in node.failure_flow
+            4.      result,*params = failure_node.execute
+
+            A result that is a label registered with node.on(label, ...)
+            takes that route like a success list instead; any other
+            result is a failure.
         '''
-        temp_task = self._task
-        # default to success
-        self._execute_run(temp_task, Task.success_state())
-
-    def _execute_run(self, current_task, result, *params):
-        failure_result = result == Task.failure_state()
-        self._flow_path.append({
-            'name': current_task.name,
-            'parameters': params
-        })
-        result, *params = current_task.execute()
-        if result == Task.success_state():
-            success_flow = current_task.success_flow()
-            while len(success_flow) > 0:
-                success_task = success_flow.pop(0)
-                # optimization.  check if success_task == previous task.  Skip!
-                if (len(self._flow_path) > 0 and
-                   self._flow_path[-1]['name'] == success_task.name):
-                    continue
-                result, params = self._execute_run(
-                    success_task, result, params)
-                if result == Task.failure_state():
-                    break
+        return self._run(*self._start_run(inputs))
+
+    def resume(self, run_id):
+        ''' Continue the run run_id from its last checkpoint.
+
+        The run goes on with the same inputs and run id; tasks the
+        checkpoint recorded are not executed again.  Returns the
+        RunContext of the whole run.  Raises WorkflowError if there is no
+        checkpoint of the run, e.g. because it finished.
+        '''
+        return self._run(*self._resume_run(run_id))
+
+    def run_many(self, inputs, workers=None):
+        ''' Run one instance of the flow for every item of inputs.
+
+        Each item is a mapping of keyword arguments for the initial task.
+        At most workers instances run at a time, all sharing the compiled
+        plan.  Returns RunStats with the RunContext of every instance, in
+        the order of inputs, and the aggregate throughput.
+        '''
+        if workers is None:
+            workers = min(32, (os.cpu_count() or 1) + 4)
+        items = enumerate(inputs)
+        items_lock = threading.Lock()
+        runs = {}
+
+        def work():
+            while True:
+                with items_lock:
+                    item = next(items, None)
+                if item is None:
+                    return
+                index, kwargs = item
+                runs[index] = self.run(**kwargs)
+
+        self._current_plan()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(workers) as pool:
+            for future in [pool.submit(work) for _ in range(workers)]:
+                future.result()
+        return RunStats([runs[index] for index in range(len(runs))],
+                        time.perf_counter() - start, start)
+
+    def _current_plan(self):
+        plan = self._plan
+        if plan is None or plan.is_stale():
+            plan = self.compile()
+        return plan
+
+    def _run(self, context, trace):
+        try:
+            # default to success
+            result, params = self._execute_run(
+                context, 0, Task.success_state(), (), context.history,
+                trace=trace)
+        except BaseException:
+            self._abort_run(context, trace)
+            raise
+        self._finish_run(context, result, params)
+        return context
+
+    def _start_run(self, inputs, run_id=None, entries=None, data=None):
+        ''' RunContext of a new run and the Trace its walk records into,
+        if the manager keeps checkpoints.
+        '''
+        context = RunContext(self._current_plan(), inputs, run_id,
+                             history=self._history(), data=data)
+        trace = None
+        if self._checkpointer is not None:
+            trace = self._checkpointer.track(context, entries)
+        if self._instrumentation is not None:
+            self._instrumentation.before_run(context)
+        return context, trace
+
+    def _resume_run(self, run_id):
+        if self._checkpointer is None:
+            raise WorkflowError('resume needs a manager with a checkpointer')
+        inputs, entries, data = self._checkpointer.load(
+            run_id, self._current_plan().names)
+        return self._start_run(inputs, run_id, entries, data)
+
+    def _abort_run(self, context, trace):
+        if trace is not None:
+            self._checkpointer.release(context.run_id)
+
+    def _finish_run(self, context, result, params):
+        context.finish(result, params, time.perf_counter() - context.started)
+        if self._checkpointer is not None:
+            self._checkpointer.finish(context.run_id)
+        if self._instrumentation is not None:
+            self._instrumentation.after_run(context)
+        self._last_run = context
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self._max_workers)
+            return self._executor
+
+    def _execute_parallel(self, context, branches, result, params, kwargs,
+                          parent, traces, visits, history):
+        ''' Run the branches of a parallel success list and join them.
+
+        Every branch walks its part of the flow into a history of its
+        own; those are merged into history in declaration order once all
+        branches are done, so the executed flow does not depend on which
+        branch finished first.
+        '''
+        executor = self._get_executor()
+        paths = [history.branch() for _ in branches]
+        if traces is None:
+            traces = [None] * len(branches)
+        if visits is None:
+            visits = [None] * len(branches)
+        futures = [None] + [
+            executor.submit(self._execute_run, context, branch, result,
+                            (params,), path, kwargs, parent, trace, visited)
+            for branch, path, trace, visited in zip(
+                branches[1:], paths[1:], traces[1:], visits[1:])]
+        outcomes = []
+        for branch, path, trace, visited, future in zip(
+                branches, paths, traces, visits, futures):
+            # run the branch here if no worker picked it up yet, so
+            # nested parallel lists can not starve the pool
+            if future is None or future.cancel():
+                outcomes.append(self._execute_run(
+                    context, branch, result, (params,), path, kwargs,
+                    parent, trace, visited))
+            else:
+                outcomes.append(future.result())
+        for path in paths:
+            history.merge(path)
+        return _join(outcomes)
+
+    def _execute_run(self, context, node, result, params, history,
+                     kwargs=None, parent=None, trace=None, visited=None):
+        ''' Execute the tasks the walk asks for, in this thread or, with
+        a backend, wherever it sends them.
+        '''
+        tasks = context.plan.tasks
+        policies = context.plan.policies
+        local = context.plan.pass_context if self._backend else None
+        walk = self._walk(context, node, result, params, history, kwargs,
+                          parent, trace, visited)
+        try:
+            request = next(walk)
+            while True:
+                if request[0].__class__ is int:
+                    node, kwargs = request
+                    if policies[node] is not None:
+                        output = self._execute_with_policy(
+                            context, node, kwargs, policies[node])
+                    elif local is None or local[node]:
+                        output = tasks[node].execute(**kwargs)
+                    else:
+                        output = self._backend.submit(tasks[node],
+                                                      kwargs).result()
+                    request = walk.send(output)
+                elif request[0].__class__ is SubflowContext:
+                    subflow, result, params = request[:3]
+                    request = walk.send(self._execute_run(
+                        subflow, 0, result, (params,), history,
+                        *request[3:]))
+                else:
+                    request = walk.send(self._execute_parallel(
+                        context, *request, history))
+        except StopIteration as stop:
+            return stop.value
+
+    def _execute_with_policy(self, context, node, kwargs, task_policy):
+        ''' Execute node within the timeout of task_policy, retrying it
+        as the policy says.  See policy.Policy.
+        '''
+        failure_state = Task.failure_state()
+        attempt = 0
+        while True:
+            try:
+                output = self._attempt(context, node, kwargs,
+                                       task_policy.timeout)
+            except TaskCancelledError as error:
+                return failure_state, error
+            except TaskTimeoutError as error:
+                # a timeout fails the task whatever retry_on says
+                output = (failure_state, error)
+            except task_policy.retry_on as error:
+                output = (failure_state, error)
+            else:
+                if not (task_policy.retry_failures and
+                        output[0] == failure_state):
+                    return output
+            if attempt >= task_policy.retries or context.cancelled:
+                return output
+            cancelled = threading.Event()
+            context.on_cancel(cancelled.set)
+            try:
+                if cancelled.wait(task_policy.delay(attempt)):
+                    return output
+            finally:
+                context.remove_on_cancel(cancelled.set)
+            attempt += 1
+
+    def _attempt(self, context, node, kwargs, timeout):
+        plan = context.plan
+        task = plan.tasks[node]
+        if self._backend is not None and not plan.pass_context[node]:
+            future = self._backend.submit(task, kwargs)
+        elif timeout is not None:
+            future = policy.call(task.execute, kwargs)
         else:
-            failure_result = True
-            failure_flow = current_task.failure_flow()
-            while len(failure_flow) > 0:
-                failure_task = failure_flow.pop(0)
-                # optimization.  check if failure_task == previous task.  Skip!
-                if (len(self._flow_path) > 0 and
-                   self._flow_path[-1]['name'] == failure_task.name):
+            return task.execute(**kwargs)
+        return policy.wait(context, future, timeout, task.name)
+
+    def _recall(self, context, key):
+        output = context.memoized.get(key, MISSING)
+        if output is MISSING and self._result_cache is not None:
+            output = self._result_cache.get(key)
+            if output is not MISSING:
+                context.memoized[key] = output
+        return output
+
+    def _remember(self, context, key, output):
+        if output[0] == Task.success_state():
+            context.memoized[key] = output
+            if self._result_cache is not None:
+                self._result_cache.put(key, output)
+
+    def _walk(self, context, node, result, params, history, kwargs=None,
+              parent=None, trace=None, visited=None):
+        ''' Walk the plan of context starting at node.
+
+        The walk decides what runs next and records it in history but
+        never executes a task itself.  It yields (node id, kwargs) for
+        every node to execute and expects the task's (result, *params)
+        output sent back; for a parallel success list it yields
+        (branches, result, params, kwargs, token, traces, visits) and
+        expects the joined (result, params) of the branches; traces and
+        visits have the Trace and the visited index of every branch, if
+        any.  The walk returns the (result, params) of the whole flow.
+        This way the same walk drives synchronous, asynchronous and remote
+        execution.
+
+        With a trace (a checkpoint.Trace) the walk takes the outputs the
+        trace recorded before instead of asking for them, and records
+        every output it gets afterwards.  The manager's incremental
+        OutputStore likewise stands in for tasks whose inputs it has an
+        output for.
+
+        kwargs are passed to the first node; without them the initial
+        task of the run gets the run's inputs.  parent is the
+        instrumentation token of the task whose list node is part of.
+        visited is the index of the tasks executed so far, a dict keyed
+        by task, when the manager executes tasks once per run or path.
+
+        Tasks generated by Task.generate_success are not part of the
+        plan: for each of them the walk yields (SubflowContext, result,
+        params, kwargs, token, trace, visited) and expects the (result,
+        params) of walking the flow of the SubflowContext's plan.
+
+        Semantically the walk is the same as recursing into every
+        successor, but the recursion is kept on an explicit stack, so the
+        depth of the flow is not limited by the Python stack.  Every frame
+        on the stack is a task that already executed and whose success or
+        failure list is being walked:
+
+        [targets, index, end, success mode, failure result, kwargs, token,
+         generator]
+
+        targets[index:end] are the node ids still to visit, kwargs the
+        keyword arguments they get from the task's output and token what
+        the instrumentation returned for the task, if any.  generator is
+        the task, if it generates successors once its success list is
+        done.
+        '''
+        plan = context.plan
+        if kwargs is None:
+            kwargs = context.inputs if node == 0 else _NO_ARGUMENTS
+        success_state = Task.success_state()
+        failure_state = Task.failure_state()
+        names = plan.names
+        tasks = plan.tasks
+        success_offsets = plan.success_offsets
+        success_targets = plan.success_targets
+        failure_offsets = plan.failure_offsets
+        failure_targets = plan.failure_targets
+        parallel = plan.parallel
+        routes = plan.routes
+        route_targets = plan.route_targets
+        pass_context = plan.pass_context
+        memoize = plan.memoize
+        generators = plan.generators
+        outputs = self._incremental
+        incremental = plan.incremental if outputs is not None else None
+        hooks = self._instrumentation
+        cpu_time = hooks is not None and hooks.cpu_time
+        once = self._visits == ONCE_PER_RUN or self._visits == ONCE_PER_PATH
+        always = self._visits == ALWAYS
+        if once:
+            if visited is None:
+                visited = {}
+            visited.setdefault(tasks[node], True)
+        token = None
+        stack = []
+        while True:
+            failure_result = result == failure_state
+            history.append({
+                'name': names[node],
+                'parameters': params
+            })
+            history.last_task = tasks[node]
+            output = MISSING if trace is None else trace.replay()
+            if output is not MISSING:
+                # executed before the run was resumed
+                token = None
+                if memoize[node]:
+                    task = tasks[node]
+                    self._remember(context, (task, task.memo_key(kwargs)),
+                                   output)
+            else:
+                if hooks is not None:
+                    token = hooks.before_task(context, node, parent)
+                    wall = time.perf_counter_ns()
+                    if cpu_time:
+                        cpu = time.thread_time_ns()
+                if memoize[node]:
+                    task = tasks[node]
+                    key = (task, task.memo_key(kwargs))
+                    output = self._recall(context, key)
+                    if output is MISSING:
+                        if pass_context[node]:
+                            kwargs = dict(kwargs, context=context)
+                        output = yield node, kwargs
+                        self._remember(context, key, output)
+                elif incremental is not None and incremental[node]:
+                    key = outputs.key(tasks[node], kwargs, params)
+                    output = outputs.recall(key)
+                    if output is MISSING:
+                        output = yield node, kwargs
+                        outputs.record(key, output)
+                else:
+                    if pass_context[node]:
+                        kwargs = dict(kwargs, context=context)
+                    output = yield node, kwargs
+                if hooks is not None:
+                    wall = time.perf_counter_ns() - wall
+                    hooks.after_task(context, node, output, wall,
+                                     time.thread_time_ns() - cpu if cpu_time
+                                     else None, token)
+                if (context.cancelled and output[0] == success_state and
+                        (not stack or stack[-1][3])):
+                    # cancelled while it executed: fail it, so its
+                    # failure list cleans up
+                    output = (failure_state, TaskCancelledError(
+                        'run %s was cancelled while %r executed' % (
+                            context.run_id, names[node])))
+                if trace is not None:
+                    trace.record(output)
+                    if pass_context[node]:
+                        trace.record_data(context.data)
+            result, *params = output
+            # a task returning (result, mapping) hands the mapping to its
+            # successors as keyword arguments; the values are passed on by
+            # reference, never copied
+            if len(params) == 1 and (params[0].__class__ is dict or
+                                     isinstance(params[0], Mapping)):
+                kwargs = params[0]
+            else:
+                kwargs = _NO_ARGUMENTS
+            if result == success_state:
+                index = success_offsets[node]
+                end = success_offsets[node + 1]
+                if context.cancelled:
+                    # nothing more starts on success once cancelled
+                    index = end
+                elif parallel[node] and end - index > 1:
+                    branches = []
+                    per_path = once and self._visits == ONCE_PER_PATH
+                    # branches claim their task in the run's index, or
+                    # in a copy of the path's when every branch is a
+                    # path of its own; otherwise every branch runs, as
+                    # none of them can be the task that just ran
+                    claims = dict(visited) if per_path else visited
+                    for branch in success_targets[index:end]:
+                        if once:
+                            marker = object()
+                            if claims.setdefault(tasks[branch],
+                                                 marker) is not marker:
+                                if hooks is not None:
+                                    hooks.on_skip(context, branch)
+                                continue
+                        branches.append(branch)
+                    if branches:
+                        traces = visits = None
+                        if trace is not None:
+                            traces = trace.branch(len(branches))
+                        if per_path:
+                            visits = [dict(visited) for _ in branches]
+                        elif once:
+                            visits = [visited] * len(branches)
+                        result, params = yield (tuple(branches), result,
+                                                params, kwargs, token,
+                                                traces, visits)
+                        if per_path:
+                            for branch_visited in visits:
+                                visited.update(branch_visited)
+                    index = end
+                stack.append([success_targets, index, end, True,
+                              failure_result, kwargs, token,
+                              tasks[node] if generators[node] else None])
+            elif routes[node] is not None and result in routes[node]:
+                # a routed outcome is a success that takes its own list
+                index, end = routes[node][result]
+                result = success_state
+                if context.cancelled:
+                    index = end
+                stack.append([route_targets, index, end, True,
+                              failure_result, kwargs, token, None])
+            else:
+                stack.append([failure_targets, failure_offsets[node],
+                              failure_offsets[node + 1], False, True,
+                              kwargs, token, None])
+
+            # find the next node to run, returning from every frame whose
+            # list is exhausted on the way
+            while True:
+                frame = stack[-1]
+                targets, index, end = frame[0], frame[1], frame[2]
+                if frame[3] and index < end and context.cancelled:
+                    if hooks is not None:
+                        hooks.on_short_circuit(
+                            context, tuple(targets[index:end]))
+                    index = end
+                node = None
+                while index < end:
+                    candidate = targets[index]
+                    index += 1
+                    if once:
+                        # claim the task; whoever claims it first runs it
+                        marker = object()
+                        if visited.setdefault(tasks[candidate],
+                                              marker) is marker:
+                            node = candidate
+                            break
+                    # optimization.  check if task == previous task.  Skip!
+                    elif always or history.last_task is not tasks[candidate]:
+                        node = candidate
+                        break
+                    if hooks is not None:
+                        hooks.on_skip(context, candidate)
+                frame[1] = index
+                if node is not None:
+                    kwargs = frame[5]
+                    parent = frame[6]
+                    break
+                if frame[7] is not None:
+                    # the declared list is done; what the task generates
+                    # is the rest of it
+                    generator, frame[7] = frame[7], None
+                    if result != failure_state and not context.cancelled:
+                        result, params = yield from self._walk_generated(
+                            context, generator, frame[5], frame[6], result,
+                            params, history, trace, visited)
+                stack.pop()
+                # we always return failure status if it failed even once
+                # during our workflow to short circuit the flow
+                if frame[4]:
+                    result = failure_state
+                if not stack:
+                    if context.cancelled:
+                        result = failure_state
+                    return result, params
+                frame = stack[-1]
+                if frame[3] and result == failure_state:
+                    # short circuit the rest of the success list
+                    if hooks is not None and frame[1] < frame[2]:
+                        hooks.on_short_circuit(
+                            context, tuple(frame[0][frame[1]:frame[2]]))
+                    frame[1] = frame[2]
+            params = (params,)
+
+    def _walk_generated(self, context, task, kwargs, token, result, params,
+                        history, trace, visited):
+        ''' Walk the tasks task.generate_success(**kwargs) generates as
+        the rest of task's success list.
+
+        Each one is compiled with its flow when it is taken and walked as
+        a subflow; the list stops at the first one that fails or when the
+        run is cancelled.  Returns the (result, params) of the list.
+        '''
+        failure_state = Task.failure_state()
+        generated = iter(task.generate_success(**kwargs))
+        try:
+            for successor in generated:
+                if context.cancelled:
+                    break
+                if visited is not None:
+                    marker = object()
+                    if visited.setdefault(successor, marker) is not marker:
+                        continue
+                # optimization.  check if task == previous task.  Skip!
+                elif (self._visits == CONSECUTIVE and
+                      history.last_task is successor):
                     continue
-                result, params = self._execute_run(
-                    failure_task, result, params)
-        # we always return failure status if it failed even once during
-        # our workflow to short circuit the flow
-        if failure_result:
-            return Task.failure_state(), params
-        else:
-            return result, params
+                subflow = SubflowContext(context, Plan.compile(successor))
+                subtrace = None if trace is None else trace.branch(1)[0]
+                result, params = yield (subflow, result, params, kwargs,
+                                        token, subtrace, visited)
+                if result == failure_state:
+                    break
+        finally:
+            close = getattr(generated, 'close', None)
+            if close is not None:
+                close()
+        return result, params
+
+
+_NO_ARGUMENTS = {}
+
+
+def _join(outcomes):
+    ''' Combine the (result, params) of parallel branches.
+
+    The list fails if any branch failed; params come from the last
+    branch, as they would have when running the branches in order.
+    '''
+    failure_state = Task.failure_state()
+    for result, params in outcomes:
+        if result == failure_state:
+            break
+    return result, outcomes[-1][1]
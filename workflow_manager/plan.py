@@ -0,0 +1,395 @@
+'''Flat, index based execution plan for a task graph.
+
+Compiling walks the graph reachable from the initial task exactly once,
+gives every distinct task an integer node id (the initial task is
+always node 0) and freezes the success and failure lists into compact
+arrays:
+
+tasks            task object for every node id
+success_offsets  success_targets[success_offsets[n]:success_offsets[n + 1]]
+                 are the node ids to run, in order, when node n succeeds
+failure_offsets  same for failure_targets when node n fails
+parallel         parallel[n] is 1 when the success list of node n runs its
+                 branches concurrently
+coroutines       coroutines[n] is 1 when node n has an async execute
+pass_context     pass_context[n] is 1 when node n wants the RunContext
+memoize          memoize[n] is 1 when the output of node n is reused
+generators       generators[n] is 1 when node n generates successors
+                 as it runs (see Task.generate_success)
+incremental      incremental[n] is 1 when node n may take an output an
+                 earlier run recorded (see incremental.OutputStore)
+policies         policies[n] is the policy.Policy of node n, None without
+routes           routes[n] maps the outcome labels of node n (see Task.on)
+                 to (start, end) of its node ids in route_targets; None
+                 for a node without any, so dispatching is a dict lookup
+
+The manager executes the plan instead of the live task objects, so
+repeated runs of the same workflow skip all graph traversal setup.
+
+Compiling also validates the graph: every task must be reachable from
+the initial task, names must be unique and the graph must not have a
+cycle.  The topological order found on the way is kept on the plan.
+'''
+from array import array
+import inspect
+
+from workflow_manager.exceptions import InvalidWorkflowError
+from workflow_manager.task import Task, _Graph
+
+
+class Plan(object):
+
+    def __init__(self, tasks, success_offsets, success_targets,
+                 failure_offsets, failure_targets, graph=None,
+                 topological_order=None, routes=None, route_targets=None,
+                 parallel=None):
+        self._tasks = tuple(tasks)
+        self._names = tuple(task.name for task in self._tasks)
+        # parallel, one flag per node, replaces the tasks' own
+        # parallel_success for a plan whose flows are not on its tasks
+        if parallel is None:
+            parallel = (task.parallel_success for task in self._tasks)
+        self._parallel = bytes(parallel)
+        self._coroutines = bytes(inspect.iscoroutinefunction(task.execute)
+                                 for task in self._tasks)
+        self._pass_context = bytes(bool(task.pass_context)
+                                   for task in self._tasks)
+        self._memoize = bytes(bool(task.memoize) for task in self._tasks)
+        self._generators = bytes(
+            type(task).generate_success is not Task.generate_success
+            for task in self._tasks)
+        self._incremental = bytes(
+            bool(task.incremental and not task.pass_context and
+                 not task.memoize) for task in self._tasks)
+        self._policies = tuple(task.policy for task in self._tasks)
+        self._success_offsets = success_offsets
+        self._success_targets = success_targets
+        self._failure_offsets = failure_offsets
+        self._failure_targets = failure_targets
+        self._routes = routes or (None,) * len(self._tasks)
+        self._route_targets = route_targets or array('l')
+        # the plan follows the flows of its tasks through graph, see
+        # is_stale
+        self._graph = graph
+        self._revision = None if graph is None else graph.revision
+        self._topological_order = topological_order
+
+    @classmethod
+    def compile(cls, initial_task):
+        ''' Validate the graph reachable from initial_task and flatten it.
+
+        Every task is visited once, shared tasks included, so compiling is
+        linear in the number of tasks and edges.  Raises
+        InvalidWorkflowError for a graph that can not run.
+        '''
+        if initial_task is None:
+            raise InvalidWorkflowError('no initial task registered')
+        _check_task(initial_task, None)
+
+        ids = {id(initial_task): 0}
+        tasks = [initial_task]
+
+        def number(flow, parent):
+            targets = []
+            for child in flow:
+                child_id = ids.get(id(child))
+                if child_id is None:
+                    _check_task(child, parent)
+                    child_id = ids[id(child)] = len(tasks)
+                    tasks.append(child)
+                targets.append(child_id)
+            return targets
+
+        success_lists = []
+        failure_lists = []
+        route_lists = []
+        # tasks are numbered in the order they are discovered, so walking
+        # the list while appending to it is a breadth first traversal
+        node = 0
+        while node < len(tasks):
+            task = tasks[node]
+            success_lists.append(number(task.success_flow(), task))
+            failure_lists.append(number(task.failure_flow(), task))
+            routes = task.routes()
+            route_lists.append({
+                outcome: number(flow, task)
+                for outcome, flow in routes.items()} if routes else None)
+            node += 1
+
+        plan = cls.from_lists(tasks, success_lists, failure_lists, True,
+                              route_lists=route_lists)
+        plan.validate()
+        return plan
+
+    @classmethod
+    def from_lists(cls, tasks, success_lists, failure_lists, track=False,
+                   topological_order=None, route_lists=None):
+        ''' Plan from per node lists of successor ids, not validated.
+
+        With track=True the lists are the flows of tasks and the plan goes
+        stale once one of them changes, see is_stale.  A plan built from
+        an already validated graph can pass the cached topological_order
+        along.  route_lists has, for every node, None or a dict of outcome
+        labels to lists of node ids.
+        '''
+        success_offsets, success_targets = _flatten(success_lists)
+        failure_offsets, failure_targets = _flatten(failure_lists)
+        routes = route_targets = None
+        if route_lists is not None and any(route_lists):
+            routes, route_targets = _flatten_routes(route_lists)
+        if topological_order is not None:
+            topological_order = array('l', topological_order)
+        return cls(tasks, success_offsets, success_targets, failure_offsets,
+                   failure_targets, _track(tasks) if track else None,
+                   topological_order, routes, route_targets)
+
+    @property
+    def tasks(self):
+        return self._tasks
+
+    @property
+    def names(self):
+        return self._names
+
+    @property
+    def parallel(self):
+        return self._parallel
+
+    @property
+    def coroutines(self):
+        return self._coroutines
+
+    @property
+    def pass_context(self):
+        return self._pass_context
+
+    @property
+    def memoize(self):
+        return self._memoize
+
+    @property
+    def generators(self):
+        return self._generators
+
+    @property
+    def incremental(self):
+        return self._incremental
+
+    @property
+    def policies(self):
+        return self._policies
+
+    @property
+    def routes(self):
+        return self._routes
+
+    @property
+    def route_targets(self):
+        return self._route_targets
+
+    @property
+    def success_offsets(self):
+        return self._success_offsets
+
+    @property
+    def success_targets(self):
+        return self._success_targets
+
+    @property
+    def failure_offsets(self):
+        return self._failure_offsets
+
+    @property
+    def failure_targets(self):
+        return self._failure_targets
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def success(self, node):
+        ''' Node ids to run, in order, when node succeeds. '''
+        offsets = self._success_offsets
+        return tuple(self._success_targets[offsets[node]:offsets[node + 1]])
+
+    def failure(self, node):
+        ''' Node ids to run, in order, when node fails. '''
+        offsets = self._failure_offsets
+        return tuple(self._failure_targets[offsets[node]:offsets[node + 1]])
+
+    def route(self, node, outcome):
+        ''' Node ids to run, in order, when node returns outcome; None if
+        outcome is not routed.
+        '''
+        routes = self._routes[node]
+        if routes is None or outcome not in routes:
+            return None
+        start, end = routes[outcome]
+        return tuple(self._route_targets[start:end])
+
+    def routed(self, node):
+        ''' Node ids of every route of node, in the order they were
+        registered.
+        '''
+        routes = self._routes[node]
+        if routes is None:
+            return ()
+        # the routes of a node are stored next to each other
+        spans = routes.values()
+        return tuple(self._route_targets[min(start for start, _ in spans):
+                                         max(end for _, end in spans)])
+
+    @property
+    def topological_order(self):
+        ''' Node ids ordered so that every task comes before its
+        successors; None until the plan was validated.
+        '''
+        return self._topological_order
+
+    def successors(self, node):
+        ''' Node ids of the success list, the failure list and then the
+        routes.
+        '''
+        return self.success(node) + self.failure(node) + self.routed(node)
+
+    def validate(self):
+        ''' Check the plan can run, in time linear in its size.
+
+        Raises InvalidWorkflowError if two tasks share a name, if a task
+        can not be reached from node 0 or if the graph has a cycle.
+        Caches the topological order found on the way.
+        '''
+        count = len(self._tasks)
+        seen = {}
+        for node, name in enumerate(self._names):
+            if seen.setdefault(name, node) != node:
+                raise InvalidWorkflowError(
+                    'more than one task is named %r' % (name,))
+
+        indegree = [0] * count
+        for targets in (self._success_targets, self._failure_targets,
+                        self._route_targets):
+            for target in targets:
+                indegree[target] += 1
+        # Kahn's algorithm from node 0: whatever is never freed either can
+        # not be reached or sits on a cycle.  Node 0 starts out freed, so
+        # any edge into it has to be checked on its own.
+        order = array('l')
+        ready = []
+        back_to_start = False
+        if count:
+            ready.append(0)
+            back_to_start = indegree[0] > 0
+            indegree[0] += count + 1
+        while ready:
+            node = ready.pop()
+            order.append(node)
+            for offsets, targets in (
+                    (self._success_offsets, self._success_targets),
+                    (self._failure_offsets, self._failure_targets)):
+                for index in range(offsets[node], offsets[node + 1]):
+                    target = targets[index]
+                    indegree[target] -= 1
+                    if indegree[target] == 0:
+                        ready.append(target)
+            if self._routes[node] is not None:
+                for target in self.routed(node):
+                    indegree[target] -= 1
+                    if indegree[target] == 0:
+                        ready.append(target)
+        if len(order) < count:
+            ordered = set(order)
+            reached = set(order)
+            pending = list(order)
+            while pending:
+                for target in self.successors(pending.pop()):
+                    if target not in reached:
+                        reached.add(target)
+                        pending.append(target)
+            unreachable = [self._names[node] for node in range(count)
+                           if node not in reached]
+            if unreachable:
+                raise InvalidWorkflowError(
+                    'tasks can not be reached from %r: %s' % (
+                        self._names[0], ', '.join(map(repr, unreachable))))
+            raise InvalidWorkflowError('the flow has a cycle among: %s' % (
+                ', '.join(repr(self._names[node]) for node in range(count)
+                          if node not in ordered)))
+        if back_to_start:
+            raise InvalidWorkflowError(
+                'the flow has a cycle back to %r' % (self._names[0],))
+        self._topological_order = order
+
+    def is_stale(self):
+        ''' True once the flows of one of the plan's tasks changed after
+        compiling.
+
+        The tasks of a compiled graph share one revision that every
+        change to their flows bumps, so this is one comparison and changes
+        to other graphs never make the plan stale.  Compiling a graph with
+        tasks of graphs compiled before merges their revisions into one,
+        which makes plans of those graphs stale once.  A plan that does not
+        follow the flows of its tasks, e.g. one built by
+        builder.FlowBuilder, is never stale.
+        '''
+        graph = self._graph
+        return graph is not None and graph.revision != self._revision
+
+
+def _track(tasks):
+    ''' _Graph the tasks share from now on.
+
+    Tasks without one join the graph the others already share.  The
+    graphs of tasks compiled apart are merged into the first one found
+    and bumped, so plans following them compile again and pick it up.
+    '''
+    graph = None
+    for task in tasks:
+        other = task._graph
+        if other is None:
+            continue
+        other = other.root()
+        if graph is None:
+            graph = other
+        elif other is not graph:
+            other.merged = graph
+            other.revision += 1
+    if graph is None:
+        graph = _Graph()
+    for task in tasks:
+        task._graph = graph
+    return graph
+
+
+def _check_task(task, parent):
+    if not isinstance(task, Task):
+        if parent is None:
+            raise InvalidWorkflowError(
+                'initial task %r is not a Task' % (task,))
+        raise InvalidWorkflowError(
+            'task %r has a successor that is not a Task: %r' % (
+                parent.name, task))
+
+
+def _flatten_routes(route_lists):
+    routes = []
+    targets = array('l')
+    for node_routes in route_lists:
+        if not node_routes:
+            routes.append(None)
+            continue
+        spans = {}
+        for outcome, node_targets in node_routes.items():
+            start = len(targets)
+            targets.extend(node_targets)
+            spans[outcome] = (start, len(targets))
+        routes.append(spans)
+    return tuple(routes), targets
+
+
+def _flatten(lists):
+    offsets = array('l', [0])
+    targets = array('l')
+    for node_targets in lists:
+        targets.extend(node_targets)
+        offsets.append(len(targets))
+    return offsets, targets
@@ -0,0 +1,131 @@
+'''How the manager executes a single task.
+
+A task whose policy attribute is a Policy gets:
+
+timeout   seconds the task may take; a task that takes longer is given
+          up on and fails with TaskTimeoutError.  A synchronous task
+          can not be stopped, so it is left to finish in a thread of its
+          own while the flow carries on.
+retries   times the task is executed again after it failed, i.e.
+          raised one of retry_on or, with retry_failures, returned the
+          failure state
+backoff   seconds to wait before the first retry, doubled for every
+          further one up to max_backoff; jitter (0 to 1) is the part of
+          every wait that is random, so retries of many runs spread out
+
+A task that still raises one of retry_on or times out after its last
+attempt fails with the error as its parameter, (failure_state, error),
+and the flow goes on with its failure list.  Other errors are raised
+from run() as without a policy.
+
+Example:
+
+class FetchTask(Task):
+    policy = Policy(timeout=2, retries=3, backoff=0.1)
+'''
+from concurrent.futures import Future, InvalidStateError, TimeoutError
+import random
+import threading
+
+from workflow_manager.exceptions import TaskCancelledError, TaskTimeoutError
+
+
+class Policy(object):
+
+    def __init__(self, timeout=None, retries=0, backoff=0.1,
+                 max_backoff=10.0, jitter=0.5, retry_on=(Exception,),
+                 retry_failures=True):
+        self._timeout = timeout
+        self._retries = retries
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._jitter = jitter
+        self._retry_on = tuple(retry_on)
+        self._retry_failures = retry_failures
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @property
+    def retries(self):
+        return self._retries
+
+    @property
+    def retry_on(self):
+        return self._retry_on
+
+    @property
+    def retry_failures(self):
+        return self._retry_failures
+
+    def delay(self, attempt, random=random.random):
+        ''' Seconds to wait before retrying after attempt (0 based). '''
+        delay = min(self._max_backoff, self._backoff * 2 ** attempt)
+        return delay * (1 - self._jitter * random())
+
+    def __repr__(self):
+        return ('Policy(timeout=%r, retries=%r, backoff=%r, '
+                'max_backoff=%r, jitter=%r)' % (
+                    self._timeout, self._retries, self._backoff,
+                    self._max_backoff, self._jitter))
+
+
+def call(execute, kwargs):
+    ''' Future of execute(**kwargs), run on a thread of its own. '''
+    future = Future()
+
+    def run():
+        try:
+            output = execute(**kwargs)
+        except BaseException as error:
+            _settle(future, error=error)
+        else:
+            _settle(future, output)
+
+    threading.Thread(target=run, daemon=True,
+                     name='workflow-task-attempt').start()
+    return future
+
+
+def wait(context, future, timeout, name):
+    ''' Output of future, waiting at most timeout seconds and no longer
+    than until the run of context is cancelled.
+    '''
+    waiter = Future()
+    future.add_done_callback(lambda done: _copy(done, waiter))
+
+    def cancel():
+        _settle(waiter, error=TaskCancelledError(
+            'run %s was cancelled while %r executed' % (context.run_id,
+                                                        name)))
+
+    context.on_cancel(cancel)
+    try:
+        return waiter.result(timeout)
+    except TimeoutError:
+        raise TaskTimeoutError('%r did not finish within %s seconds' % (
+            name, timeout))
+    finally:
+        context.remove_on_cancel(cancel)
+
+
+def _copy(source, target):
+    if source.cancelled():
+        _settle(target, error=TaskCancelledError('task was cancelled'))
+    elif source.exception() is not None:
+        _settle(target, error=source.exception())
+    else:
+        _settle(target, source.result())
+
+
+def _settle(future, output=None, error=None):
+    # whichever of the task, its timeout and a cancellation comes first
+    # settles the future; the others find it done
+    try:
+        if error is None:
+            future.set_result(output)
+        else:
+            future.set_exception(error)
+    except InvalidStateError:
+        pass
@@ -0,0 +1,146 @@
+'''Compact graph serialization of a workflow.
+
+Task.to_dict() expands the flow as a tree, repeating a shared task once
+for every path that reaches it.  The graph format lists every task once
+in a node table and the flows as lists of node ids, so its size and the
+time to produce it are linear in the size of the graph:
+
+{
+  "format": "workflow-graph",
+  "version": 1,
+  "nodes": [
+    {"name": "task 1", "type": "tasks:SuccessTask"},
+    {"name": "task 2", "type": "tasks:SuccessTask", "parallel": true},
+    {"name": "task 3", "type": "tasks:Review", "routes": {"retry": [4]}},
+    ...
+  ],
+  "success": [[1, 2], ...],
+  "failure": [[3], ...]
+}
+
+Node 0 is the initial task; "type" is the importable module:class of
+the task and "routes" the node ids of its outcome labels (Task.on),
+which have to be strings.  dump() streams the graph to a file object
+one line per task and per list, which also keeps diffs of two
+workflows readable.  load() builds the tasks again, calling
+factory(name, type) for every node; the default factory imports the
+class and calls it with the name.
+'''
+import importlib
+import io
+import json
+
+from workflow_manager.exceptions import InvalidWorkflowError
+from workflow_manager.plan import Plan
+
+
+FORMAT = 'workflow-graph'
+VERSION = 1
+
+
+def type_name(task):
+    cls = type(task)
+    return '%s:%s' % (cls.__module__, cls.__qualname__)
+
+
+def import_type(name):
+    module_name, _, qualname = name.partition(':')
+    try:
+        target = importlib.import_module(module_name)
+        for attribute in qualname.split('.'):
+            target = getattr(target, attribute)
+    except (ImportError, AttributeError, ValueError) as error:
+        raise InvalidWorkflowError(
+            'can not import task type %r: %s' % (name, error))
+    return target
+
+
+def default_factory(name, task_type):
+    return import_type(task_type)(name)
+
+
+def _plan(flow):
+    if isinstance(flow, Plan):
+        return flow
+    return Plan.compile(flow)
+
+
+def _node(plan, node):
+    entry = {'name': plan.names[node], 'type': type_name(plan.tasks[node])}
+    if plan.parallel[node]:
+        entry['parallel'] = True
+    if plan.routes[node] is not None:
+        entry['routes'] = {}
+        for outcome in plan.routes[node]:
+            if not isinstance(outcome, str):
+                raise InvalidWorkflowError(
+                    'outcome %r of task %r is not a string' % (
+                        outcome, plan.names[node]))
+            entry['routes'][outcome] = list(plan.route(node, outcome))
+    return entry
+
+
+def to_graph(flow):
+    ''' Graph format of flow, an initial task or a compiled Plan. '''
+    plan = _plan(flow)
+    nodes = range(len(plan))
+    return {
+        'format': FORMAT,
+        'version': VERSION,
+        'nodes': [_node(plan, node) for node in nodes],
+        'success': [list(plan.success(node)) for node in nodes],
+        'failure': [list(plan.failure(node)) for node in nodes]
+        }
+
+
+def dump(flow, fp):
+    ''' Write the graph format of flow to the text file object fp. '''
+    plan = _plan(flow)
+    nodes = range(len(plan))
+    fp.write('{\n"format": %s,\n"version": %d,\n"nodes": [' % (
+        json.dumps(FORMAT), VERSION))
+    for node in nodes:
+        fp.write('%s\n  %s' % (',' if node else '',
+                               json.dumps(_node(plan, node))))
+    for key, flow_of in (('success', plan.success),
+                         ('failure', plan.failure)):
+        fp.write('\n],\n"%s": [' % key)
+        for node in nodes:
+            fp.write('%s\n  %s' % (',' if node else '',
+                                   json.dumps(list(flow_of(node)))))
+    fp.write('\n]\n}\n')
+
+
+def dumps(flow):
+    output = io.StringIO()
+    dump(flow, output)
+    return output.getvalue()
+
+
+def from_graph(graph, factory=default_factory):
+    ''' Build the tasks of graph again and return the initial one. '''
+    if graph.get('format') != FORMAT or graph.get('version') != VERSION:
+        raise InvalidWorkflowError('not a version %d %s' % (VERSION, FORMAT))
+    nodes = graph['nodes']
+    flows = (graph['success'], graph['failure'])
+    if not nodes or any(len(flow) != len(nodes) for flow in flows):
+        raise InvalidWorkflowError('node table and flows do not match')
+    tasks = [factory(node['name'], node['type']) for node in nodes]
+    try:
+        for task, node, success, failure in zip(tasks, nodes, *flows):
+            task.on_success(*[tasks[target] for target in success],
+                            parallel=node.get('parallel', False))
+            task.on_failure(*[tasks[target] for target in failure])
+            for outcome, targets in node.get('routes', {}).items():
+                task.on(outcome, *[tasks[target] for target in targets])
+    except (IndexError, TypeError, AttributeError) as error:
+        raise InvalidWorkflowError('bad node id in flow: %s' % (error,))
+    return tasks[0]
+
+
+def load(fp, factory=default_factory):
+    return from_graph(json.load(fp), factory)
+
+
+def loads(text, factory=default_factory):
+    return from_graph(json.loads(text), factory)
@@ -32,16 +32,61 @@ task 3 on success does nothing on failure calls task 4 and task 5 in succession
 task 4 does nothing regardless of result
 task 5 does nothing regradless of result
 '''
-import copy
 import json
+from workflow_manager.exceptions import InvalidWorkflowError
+
+
+class _Graph(object):
+    ''' Revision shared by the tasks of compiled graphs, see Plan.is_stale.
+    '''
+
+    __slots__ = ('revision', 'merged')
+
+    def __init__(self):
+        self.revision = 0
+        # the graph this one was merged into, None while it is in use
+        self.merged = None
+
+    def root(self):
+        graph = self
+        while graph.merged is not None:
+            graph = graph.merged
+        return graph
 
 
 class Task(object):
 
+    # no per instance __dict__: a subclass that declares __slots__ of its
+    # own (__slots__ = () if it adds no attributes) keeps its tasks as
+    # small as possible, which matters for graphs of many thousand tasks
+    __slots__ = ('_name', '_success_tasks', '_failure_tasks',
+                 '_parallel_success', '_routes', '_graph')
+
+    # set to True to get the run's RunContext as the context keyword
+    # argument of execute; context.data is shared by every task of a run
+    pass_context = False
+
+    # set to True to execute the task at most once per run and reuse its
+    # successful output on later visits, see memo_key
+    memoize = False
+
+    # set to a policy.Policy to give the task a timeout and retries
+    policy = None
+
+    # set to False to execute the task in every run of a manager with an
+    # incremental.OutputStore, even when its inputs did not change
+    incremental = True
+
     def __init__(self, name='task'):
         self._name = name
-        self._success_list = []
-        self._failure_list = []
+        self._success_tasks = ()
+        self._failure_tasks = ()
+        self._parallel_success = False
+        # outcome label -> tuple of tasks, None until on() is called
+        self._routes = None
+        # _Graph shared with the other tasks of the graphs this task was
+        # compiled in; every change to its flows bumps the revision
+        self._graph = None
 
     @classmethod
     def success_state(self):
@@ -55,29 +100,140 @@ class Task(object):
     def name(self):
         return self._name
 
-    def on_success(self, *tasks):
-        for task in tasks:
-            self._success_list.append(task)
+    @property
+    def parallel_success(self):
+        return self._parallel_success
+
+    def on_success(self, *tasks, parallel=False):
+        ''' Run tasks, in order, when this task succeeds.
+
+        With parallel=True the success tasks are independent branches:
+        the manager runs them at the same time on its executor and joins
+        them before moving on.  The flag applies to the whole success list
+        of this task.
+        '''
+        self._success_tasks += tasks
+        if parallel:
+            self._parallel_success = True
+        self._changed()
 
     def on_failure(self, *tasks):
-        for task in tasks:
-            self._failure_list.append(task)
+        self._failure_tasks += tasks
+        self._changed()
+
+    def on(self, outcome, *tasks):
+        ''' Run tasks, in order, when this task returns outcome.
+
+        execute may return any hashable label as the first item of its
+        output, e.g. (Task.success_state() if ok else 'retry', ...).  A
+        label with tasks registered here counts as a success that takes
+        those tasks instead of the success list; a label without any
+        counts as a failure, as before.  on(success_state) and
+        on(failure_state) are on_success and on_failure.
+        '''
+        if outcome == Task.success_state():
+            return self.on_success(*tasks)
+        if outcome == Task.failure_state():
+            return self.on_failure(*tasks)
+        if self._routes is None:
+            self._routes = {}
+        self._routes[outcome] = self._routes.get(outcome, ()) + tasks
+        self._changed()
+
+    def routes(self):
+        ''' Outcome labels registered with on() and their tasks. '''
+        return dict(self._routes or ())
 
     def success_flow(self):
-        return copy.deepcopy(self._success_list)
+        ''' Immutable view of the tasks to run on success.
+
+        The tuple is shared with the task itself, so walking it is free
+        and nothing downstream gets copied.
+        '''
+        return self._success_tasks
 
     def failure_flow(self):
-        return copy.deepcopy(self._failure_list)
+        ''' Immutable view of the tasks to run on failure. '''
+        return self._failure_tasks
+
+    def _changed(self):
+        graph = self._graph
+        if graph is not None:
+            graph = self._graph = graph.root()
+            graph.revision += 1
 
     def execute(self, **kwargs):
         raise NotImplementedError()
 
+    def generate_success(self, **kwargs):
+        ''' Tasks to run, in order, after the success list, generated only
+        when this task succeeds.
+
+        Override it for successors that depend on what the task returned:
+        kwargs are what the success list gets.  It may be a generator; the
+        next task is taken only once the one before it is done, so a
+        failure stops the generator and tasks after it are never built.
+        Every task taken runs with the flow it declares (including tasks
+        it generates in turn) as a flow of its own, compiled when it is
+        taken, so nothing is built for branches the run does not take.
+        Wiring the flows of generated tasks leaves the run's own plan as
+        it is, as long as no task of that plan gets new successors.
+        '''
+        return ()
+
+    def execute_batch(self, batch):
+        ''' Outputs of executing the task once for every kwargs of the
+        batch list, in the same order.
+
+        batch.BatchManager calls this with every run of a cohort that
+        reached the task.  The default executes the items one at a time;
+        override it to handle the whole batch at once, e.g. with a single
+        database query.  Each output is a (result, *params) tuple as
+        execute returns, so every item takes its own path afterwards.
+        '''
+        return [self.execute(**kwargs) for kwargs in batch]
+
+    def memo_key(self, kwargs):
+        ''' Part of the inputs a memoized result depends on.
+
+        The default reuses one result whatever the keyword arguments;
+        return a hashable value derived from kwargs to memoize per input.
+        '''
+        return None
+
     def to_dict(self):
-        return {
+        return self._to_dict(set())
+
+    def _to_dict(self, active):
+        # active holds the tasks being expanded above this one; meeting
+        # one of them again means the flow loops
+        if id(self) in active:
+            raise InvalidWorkflowError(
+                'the flow has a cycle through %r' % (self.name,))
+        active.add(id(self))
+        flow = {
             'name': self.name,
-            'success_flow': [task.to_dict() for task in self._success_list],
-            'failure_flow': [task.to_dict() for task in self._failure_list]
+            'success_flow': [task._to_dict(active)
+                             for task in self._success_tasks],
+            'failure_flow': [task._to_dict(active)
+                             for task in self._failure_tasks]
             }
+        if self._routes:
+            flow['routes'] = {
+                outcome: [task._to_dict(active) for task in tasks]
+                for outcome, tasks in self._routes.items()}
+        active.discard(id(self))
+        return flow
+
+    def to_graph(self):
+        ''' The flow as a node table plus lists of node ids.
+
+        Unlike to_dict, a task shared by several paths is listed once, so
+        the result grows linearly with the graph.  See serialization.
+        '''
+        # imported here: serialization builds on this module
+        from workflow_manager import serialization
+        return serialization.to_graph(self)
 
     def __str__(self):
         return json.dumps(self.to_dict())